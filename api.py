@@ -1,24 +1,325 @@
 
-from flask import Flask, jsonify, request
-from datetime import datetime
-from usuarios import create_usuario, read_usuario, update_usuario, delete_usuario
-from modulos import create_modulo, read_modulo, update_modulo, delete_modulo
-from trilhas import create_trilha, read_trilha, update_trilha, delete_trilha
-from previsoes import create_previsao, read_previsao, update_previsao, delete_previsao
-from progressos import create_progresso, read_progresso, update_progresso, delete_progresso
-from sugestoes import create_sugestao, read_sugestao, update_sugestao, delete_sugestao
+from flask import Flask, Response, jsonify, make_response, request
+from itertools import islice
+import hashlib
+import time
+from datetime import datetime, timezone
+from usuarios import COLUNAS_USUARIO, create_usuario, create_usuario_many, upsert_usuario_many, read_usuario, read_usuario_by_id, read_usuario_pagina, read_usuario_colunas, iterar_usuarios, update_usuario, patch_usuario, delete_usuario, delete_usuario_many
+from modulos import COLUNAS_MODULO, create_modulo, create_modulo_many, upsert_modulo_many, read_modulo, read_modulo_by_id, read_modulo_pagina, read_modulo_colunas, iterar_modulos, update_modulo, patch_modulo, delete_modulo, delete_modulo_many
+from trilhas import COLUNAS_TRILHA, create_trilha, create_trilha_many, upsert_trilha_many, read_trilha, read_trilha_by_id, read_trilha_pagina, read_trilha_colunas, iterar_trilhas, update_trilha, patch_trilha, delete_trilha, delete_trilha_many
+from previsoes import COLUNAS_PREVISAO, create_previsao, create_previsao_many, upsert_previsao_many, read_previsao, read_previsao_by_id, read_previsao_pagina, read_previsao_colunas, iterar_previsoes, update_previsao, patch_previsao, delete_previsao, delete_previsao_many
+from progressos import COLUNAS_PROGRESSO, CONCLUIDO, JA_CONCLUIDO, USUARIO_NAO_ENCONTRADO, complete_module, fila_progressos, create_progresso, create_progresso_many, upsert_progresso_many, read_progresso, read_progresso_by_id, read_progresso_pagina, read_progresso_colunas, iterar_progressos, update_progresso, patch_progresso, delete_progresso, delete_progresso_many
+from sugestoes import COLUNAS_SUGESTAO, create_sugestao, create_sugestao_many, upsert_sugestao_many, read_sugestao, read_sugestao_by_id, read_sugestao_pagina, read_sugestao_colunas, iterar_sugestoes, update_sugestao, patch_sugestao, delete_sugestao, delete_sugestao_many
+from ranking import read_ranking
+from painel import read_painel_usuario, LIMITE_PAINEL
+from indice_trilhas import read_sugestoes_ao_vivo, TOP_K_AO_VIVO
+from busca import buscar, completar, LIMITE_BUSCA, TRILHA, MODULO
+from fila import estatisticas_filas
+from cache import estatisticas_caches, garantir_versao
+from utilitarios import ler_numero_env, estatisticas_pool, TAMANHO_LOTE_PADRAO, TAMANHO_BUSCA_PADRAO
 
 app = Flask(__name__)
 
+LIMITE_PADRAO_PAGINA = 50
+LIMITE_MAXIMO_PAGINA = 1000
+
+def pediu_ndjson():
+    """Indica se o cliente pediu a listagem em NDJSON (um registro JSON por linha)."""
+    return request.args.get('stream') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def pediu_stream():
+    """Indica se o cliente pediu a listagem em fluxo ('?stream=1', '?stream=ndjson' ou Accept NDJSON)."""
+    return pediu_ndjson() or request.args.get('stream', '0').lower() not in ('', '0', 'false')
+
+def responder_stream(iterar):
+    """
+    Responde uma listagem em fluxo, serializando os registros em blocos conforme saem do cursor.
+    Com 'Accept: application/x-ndjson' ou '?stream=ndjson' envia um JSON por linha;
+    com '?stream=1' envia um array JSON. A memória do worker não cresce com o tamanho da tabela.
+    """
+    ndjson = pediu_ndjson()
+    try:
+        registros = iterar()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        # Lê o primeiro registro antes de responder para que falhas de conexão virem um erro 500
+        primeiro = next(registros, None)
+    except Exception as e:
+        print(f'\n Erro ao iniciar a listagem em fluxo: {e}')
+        return jsonify({'error': 'Erro ao ler os dados'}), 500
+
+    def gerar():
+        if not ndjson:
+            yield '['
+        if primeiro is not None:
+            yield app.json.dumps(primeiro) + ('\n' if ndjson else '')
+        separador = '\n' if ndjson else ','
+        try:
+            while True:
+                bloco = list(islice(registros, TAMANHO_BUSCA_PADRAO))
+                if not bloco:
+                    break
+                texto = separador.join(app.json.dumps(r) for r in bloco)
+                yield (texto + '\n') if ndjson else (',' + texto)
+        except Exception as e:
+            # Cabeçalhos já enviados: só resta registrar e encerrar a resposta
+            print(f'\n Erro durante a listagem em fluxo: {e}')
+        if not ndjson:
+            yield ']'
+
+    return Response(gerar(), mimetype='application/x-ndjson' if ndjson else 'application/json')
+
+# Parâmetros da query string que não são filtros de coluna
+PARAMETROS_LISTAGEM = ('limit', 'cursor', 'stream', 'fields', 'format')
+
+def ler_filtros_e_campos():
+    """
+    Lê da query string os filtros de coluna (todo parâmetro fora de PARAMETROS_LISTAGEM, ex.: ?area=TI,
+    ?xp_total_min=100) e a projeção '?fields=a,b'. Retorna (filtros, campos), com None quando ausentes.
+    """
+    filtros = {nome: valor for nome, valor in request.args.items() if nome not in PARAMETROS_LISTAGEM}
+    campos = [c.strip() for c in request.args.get('fields', '').split(',') if c.strip()]
+    return filtros or None, campos or None
+
+def responder_colunas(ler_colunas, filtros, campos):
+    """
+    Responde a lista completa no formato compacto por colunas ('?format=columnar'):
+    {"columns": [nomes], "values": [[valores da 1ª coluna], ...], "count": n}. Os nomes não se repetem
+    a cada registro e os dados só viram JSON aqui, sem passar por um dicionário por linha.
+    """
+    if 'limit' in request.args or 'cursor' in request.args or pediu_stream():
+        return jsonify({'error': 'O formato columnar não pode ser combinado com paginação nem com fluxo'}), 400
+    try:
+        colunas = ler_colunas(filtros, campos)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if colunas is None:
+        return jsonify({'error': 'Erro ao ler os dados'}), 500
+    valores = list(colunas.values())
+    return jsonify({'columns': list(colunas), 'values': valores, 'count': len(valores[0]) if valores else 0})
+
+def responder_lista(ler_todos, ler_pagina, iterar=None, ler_colunas=None):
+    """
+    Responde uma listagem. Sem 'limit' e 'cursor' na query string devolve a lista completa;
+    com eles devolve uma página keyset no formato {"items": [...], "next": cursor ou null}.
+    Com '?stream=' ou 'Accept: application/x-ndjson' a lista completa é enviada em fluxo, e com
+    '?format=columnar' no formato por colunas (ver responder_colunas).
+    Filtros de coluna e '?fields=' são aplicados no banco em todos os modos (400 se forem inválidos).
+    """
+    filtros, campos = ler_filtros_e_campos()
+    formato = request.args.get('format')
+    if formato is not None:
+        if formato != 'columnar' or ler_colunas is None:
+            return jsonify({'error': "O parâmetro format aceita apenas 'columnar'"}), 400
+        return responder_colunas(ler_colunas, filtros, campos)
+    if iterar and pediu_stream():
+        return responder_stream(lambda: iterar(filtros=filtros, campos=campos))
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        try:
+            return jsonify(ler_todos(filtros, campos) or [])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    try:
+        limite = int(request.args.get('limit', LIMITE_PADRAO_PAGINA))
+    except ValueError:
+        return jsonify({'error': 'O parâmetro limit deve ser um número inteiro'}), 400
+    if not 1 <= limite <= LIMITE_MAXIMO_PAGINA:
+        return jsonify({'error': f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO_PAGINA}'}), 400
+    try:
+        pagina = ler_pagina(limite, request.args.get('cursor'), filtros, campos)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if pagina is None:
+        return jsonify({'error': 'Erro ao ler os dados'}), 500
+    itens, proximo_cursor = pagina
+    return jsonify({'items': itens, 'next': proximo_cursor})
+
+# Os validadores (ETag/Last-Modified) só mudam quando a versão do namespace muda. Escritas feitas fora
+# da aplicação devem publicar a invalidação ('python main.py invalidate <tabela>'). Com LEME_ETAG_JANELA > 0
+# eles também mudam a cada janela (em segundos), ao custo de uma resposta 200 completa por janela para
+# cada cliente mesmo sem escritas; 0 (padrão) desliga a janela.
+JANELA_VALIDADORES = ler_numero_env("LEME_ETAG_JANELA", 0.0)
+
+def responder_condicional(namespace, responder):
+    """
+    GET condicional: calcula ETag e Last-Modified a partir da versão de 'namespace' (que as funções de
+    escrita incrementam) e responde 304 a If-None-Match/If-Modified-Since sem consultar nem serializar
+    as linhas. Caso contrário chama responder() e acrescenta os validadores à resposta.
+    """
+    atual = garantir_versao(namespace)
+    if atual is None:
+        return responder()
+    janela = int(time.time() // JANELA_VALIDADORES) if JANELA_VALIDADORES else 0
+    etag = hashlib.sha1(repr((atual, janela, request.query_string, request.headers.get('Accept'))).encode()).hexdigest()[:20]
+    modificado_em = max(atual[2] // 1_000_000_000, int(janela * JANELA_VALIDADORES))
+    ultima_modificacao = datetime.fromtimestamp(modificado_em, timezone.utc)
+
+    if request.if_none_match:
+        nao_modificado = request.if_none_match.contains_weak(etag)
+    else:
+        nao_modificado = request.if_modified_since is not None and ultima_modificacao <= request.if_modified_since
+
+    resposta = Response(status=304) if nao_modificado else make_response(responder())
+    if resposta.status_code in (200, 304):
+        resposta.set_etag(etag)
+        resposta.vary.add('Accept')
+        # Last-Modified tem resolução de segundos: só é enviado depois que o segundo da última
+        # escrita terminou, senão outra escrita no mesmo segundo passaria despercebida
+        if modificado_em < int(time.time()):
+            resposta.last_modified = ultima_modificacao
+    return resposta
+
+def responder_item(registro, mensagem_nao_encontrado):
+    """Responde um único registro, ou 404 se ele não existir."""
+    if registro is None:
+        return jsonify({'error': mensagem_nao_encontrado}), 404
+    return jsonify(registro)
+
+TAMANHO_MAXIMO_LOTE = 10000
+
+def ler_lote(campos_necessarios, campo_data=None):
+    """
+    Lê e valida a lista JSON de registros de um endpoint /bulk.
+    Retorna (validos, indices, erros, tamanho_lote, None), ou uma resposta de erro no último item.
+    """
+    dados = request.get_json()
+    if not isinstance(dados, list) or not dados:
+        return None, None, None, None, (jsonify({'error': 'Envie uma lista JSON com os registros'}), 400)
+    try:
+        tamanho_lote = int(request.args.get('chunk_size', TAMANHO_LOTE_PADRAO))
+    except ValueError:
+        return None, None, None, None, (jsonify({'error': 'O parâmetro chunk_size deve ser um número inteiro'}), 400)
+    if not 1 <= tamanho_lote <= TAMANHO_MAXIMO_LOTE:
+        return None, None, None, None, (jsonify({'error': f'O parâmetro chunk_size deve estar entre 1 e {TAMANHO_MAXIMO_LOTE}'}), 400)
+
+    validos, indices, erros = [], [], []
+    for indice, registro in enumerate(dados):
+        if not isinstance(registro, dict) or not all(k in registro for k in campos_necessarios):
+            erros.append({'index': indice, 'error': 'Dados incompletos'})
+            continue
+        registro = {k: registro[k] for k in campos_necessarios}
+        if campo_data:
+            try:
+                registro[campo_data] = datetime.strptime(registro[campo_data], '%Y-%m-%d %H:%M:%S')
+            except (ValueError, TypeError):
+                erros.append({'index': indice, 'error': f'Formato de data inválido para {campo_data}. Use YYYY-MM-DD HH:MM:SS'})
+                continue
+        validos.append(registro)
+        indices.append(indice)
+    return validos, indices, erros, tamanho_lote, None
+
+def criar_em_lote(criar_varios, campos_necessarios, campo_data=None):
+    """
+    Recebe uma lista JSON de registros e os insere em lotes com criar_varios.
+    Registros inválidos ou rejeitados pelo banco são reportados em 'errors' sem interromper os demais.
+    """
+    validos, indices, erros, tamanho_lote, resposta = ler_lote(campos_necessarios, campo_data)
+    if resposta:
+        return resposta
+    resultado = criar_varios(validos, tamanho_lote) if validos else {'inseridos': 0, 'erros': []}
+    if resultado is None:
+        return jsonify({'error': 'Erro ao inserir os registros'}), 500
+    erros.extend({'index': indices[e['indice']], 'error': e['erro']} for e in resultado['erros'])
+    erros.sort(key=lambda e: e['index'])
+    return jsonify({'inserted': resultado['inseridos'], 'errors': erros}), 200
+
+def sincronizar_lote(sincronizar_varios, campos_necessarios, campo_data=None):
+    """
+    Recebe uma lista JSON de registros (um snapshot completo) e a grava com MERGE via sincronizar_varios
+    (upsert_*_many): insere os novos, atualiza os alterados e não regrava os iguais aos do banco.
+    """
+    validos, indices, erros, tamanho_lote, resposta = ler_lote(campos_necessarios, campo_data)
+    if resposta:
+        return resposta
+    chave = campos_necessarios[0]
+    for posicao in reversed(range(len(validos))):
+        if not isinstance(validos[posicao][chave], str):
+            erros.append({'index': indices.pop(posicao), 'error': f'{chave} deve ser um texto'})
+            del validos[posicao]
+    resultado = sincronizar_varios(validos, tamanho_lote) if validos else {'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'erros': []}
+    if resultado is None:
+        return jsonify({'error': 'Erro ao gravar os registros'}), 500
+    erros.extend({'index': indices[e['indice']], 'error': e['erro']} for e in resultado['erros'])
+    erros.sort(key=lambda e: e['index'])
+    return jsonify({'inserted': resultado['inseridos'], 'updated': resultado['atualizados'],
+                    'unchanged': resultado['inalterados'], 'errors': erros}), 200
+
+def atualizar_campos(atualizar, id_registro, mensagem_sucesso, mensagem_erro, campos_data=()):
+    """
+    Atualização parcial (PATCH): recebe um objeto JSON só com as colunas que mudam, com os nomes das
+    colunas (ex.: {"xp_total": 500}), e grava apenas elas com atualizar(id_registro, campos).
+    """
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not dados:
+        return jsonify({'error': 'Envie um objeto JSON com os campos a alterar'}), 400
+    for campo in campos_data:
+        if campo in dados:
+            try:
+                dados[campo] = datetime.strptime(dados[campo], '%Y-%m-%d %H:%M:%S')
+            except (ValueError, TypeError):
+                return jsonify({'error': f'Formato de data inválido para {campo}. Use YYYY-MM-DD HH:MM:SS'}), 400
+    try:
+        atualizado = atualizar(id_registro, dados)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if atualizado:
+        return jsonify({'message': mensagem_sucesso})
+    return jsonify({'error': mensagem_erro}), 404
+
+def pediu_cascata():
+    """Indica se o cliente pediu para excluir também os registros dependentes ('?cascade=1')."""
+    return request.args.get('cascade', '0').lower() not in ('', '0', 'false')
+
+def excluir_lote(excluir_varios, aceita_cascata=False):
+    """
+    Recebe uma lista JSON de ids e os exclui em uma única transação com excluir_varios (delete_*_many).
+    Nos recursos com registros dependentes (aceita_cascata), '?cascade=1' os exclui junto.
+    """
+    ids = request.get_json(silent=True)
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+        return jsonify({'error': 'Envie uma lista JSON com os ids a excluir'}), 400
+    if len(ids) > TAMANHO_MAXIMO_LOTE:
+        return jsonify({'error': f'Envie no máximo {TAMANHO_MAXIMO_LOTE} ids por requisição'}), 400
+    cascata = aceita_cascata and pediu_cascata()
+    resultado = excluir_varios(ids, cascata) if aceita_cascata else excluir_varios(ids)
+    if resultado is None:
+        dica = ' (se houver registros dependentes, use cascade=1)' if aceita_cascata and not cascata else ''
+        return jsonify({'error': f'Erro ao excluir os registros{dica}'}), 500
+    return jsonify({'deleted': resultado['excluidos'], 'not_found': resultado['nao_encontrados'],
+                    'dependents': resultado['dependentes']}), 200
+
+def excluir_com_dependentes(excluir_varios, id_registro, mensagem_sucesso, mensagem_erro):
+    """DELETE de um registro com '?cascade=1': exclui também os dependentes, na mesma transação."""
+    resultado = excluir_varios([id_registro], True)
+    if resultado is None or not resultado['excluidos']:
+        return jsonify({'error': mensagem_erro}), 404
+    return jsonify({'message': mensagem_sucesso, 'dependents': resultado['dependentes']})
+
 # Health check endpoint
 @app.route('/')
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+# Estatísticas do pool de conexões deste worker
+@app.route('/status/pool')
+def status_pool():
+    return jsonify(estatisticas_pool()), 200
+
+# Acertos, falhas e tamanho dos caches deste worker
+@app.route('/status/cache')
+def status_cache():
+    return jsonify(estatisticas_caches()), 200
+
+# Profundidade, contadores e latência das filas de escrita deste worker
+@app.route('/status/fila')
+def status_fila():
+    return jsonify(estatisticas_filas()), 200
+
 # --- Endpoints de USUÁRIOS ---
 @app.route('/usuarios', methods=['GET'])
 def get_usuarios():
-    return jsonify(read_usuario() or [])
+    return responder_lista(read_usuario, read_usuario_pagina, iterar_usuarios, read_usuario_colunas)
 
 @app.route('/usuarios', methods=['POST'])
 def post_usuario():
@@ -34,6 +335,43 @@ def post_usuario():
         return jsonify({'message': 'Usuário criado com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar usuário'}), 500
 
+@app.route('/usuarios/bulk', methods=['POST'])
+def post_usuarios_bulk():
+    return criar_em_lote(create_usuario_many, COLUNAS_USUARIO, 'data_cadastro')
+
+@app.route('/usuarios/bulk', methods=['PUT'])
+def put_usuarios_bulk():
+    return sincronizar_lote(upsert_usuario_many, COLUNAS_USUARIO, 'data_cadastro')
+
+@app.route('/usuarios/<string:id_usuario>', methods=['GET'])
+def get_usuario(id_usuario):
+    return responder_item(read_usuario_by_id(id_usuario), 'Usuário não encontrado')
+
+LIMITE_MAXIMO_PAINEL = 100
+
+@app.route('/usuarios/<string:id_usuario>/dashboard', methods=['GET'])
+def get_usuario_dashboard(id_usuario):
+    try:
+        limite = int(request.args.get('limit', LIMITE_PAINEL))
+    except ValueError:
+        return jsonify({'error': 'O parâmetro limit deve ser um número inteiro'}), 400
+    if not 1 <= limite <= LIMITE_MAXIMO_PAINEL:
+        return jsonify({'error': f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO_PAINEL}'}), 400
+    return responder_item(read_painel_usuario(id_usuario, limite), 'Usuário não encontrado')
+
+K_MAXIMO_SUGESTOES_AO_VIVO = 50
+
+# Recomendações calculadas na hora pelo índice em memória (as de /sugestoes são geradas em lote)
+@app.route('/usuarios/<string:id_usuario>/sugestoes/live', methods=['GET'])
+def get_usuario_sugestoes_ao_vivo(id_usuario):
+    try:
+        k = int(request.args.get('k', TOP_K_AO_VIVO))
+    except ValueError:
+        return jsonify({'error': 'O parâmetro k deve ser um número inteiro'}), 400
+    if not 1 <= k <= K_MAXIMO_SUGESTOES_AO_VIVO:
+        return jsonify({'error': f'O parâmetro k deve estar entre 1 e {K_MAXIMO_SUGESTOES_AO_VIVO}'}), 400
+    return responder_item(read_sugestoes_ao_vivo(id_usuario, k), 'Usuário não encontrado')
+
 @app.route('/usuarios/<string:id_usuario>', methods=['PUT'])
 def put_usuario(id_usuario):
     dados = request.get_json()
@@ -49,16 +387,26 @@ def put_usuario(id_usuario):
         return jsonify({'message': 'Usuário atualizado com sucesso'})
     return jsonify({'error': 'Usuário não encontrado ou erro na atualização'}), 404
 
+@app.route('/usuarios/<string:id_usuario>', methods=['PATCH'])
+def patch_usuario_endpoint(id_usuario):
+    return atualizar_campos(patch_usuario, id_usuario, 'Usuário atualizado com sucesso', 'Usuário não encontrado ou erro na atualização', ('data_cadastro',))
+
 @app.route('/usuarios/<string:id_usuario>', methods=['DELETE'])
 def delete_usuario_endpoint(id_usuario):
+    if pediu_cascata():
+        return excluir_com_dependentes(delete_usuario_many, id_usuario, 'Usuário deletado com sucesso', 'Usuário não encontrado ou erro ao deletar')
     if delete_usuario(id_usuario):
         return jsonify({'message': 'Usuário deletado com sucesso'})
     return jsonify({'error': 'Usuário não encontrado ou erro ao deletar'}), 404
 
+@app.route('/usuarios/delete', methods=['POST'])
+def post_usuarios_delete():
+    return excluir_lote(delete_usuario_many, aceita_cascata=True)
+
 # --- Endpoints de TRILHAS ---
 @app.route('/trilhas', methods=['GET'])
 def get_trilhas():
-    return jsonify(read_trilha() or [])
+    return responder_condicional('trilhas', lambda: responder_lista(read_trilha, read_trilha_pagina, iterar_trilhas, read_trilha_colunas))
 
 @app.route('/trilhas', methods=['POST'])
 def post_trilha():
@@ -74,6 +422,18 @@ def post_trilha():
         return jsonify({'message': 'Trilha criada com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar trilha'}), 500
 
+@app.route('/trilhas/bulk', methods=['POST'])
+def post_trilhas_bulk():
+    return criar_em_lote(create_trilha_many, COLUNAS_TRILHA, 'data_criacao')
+
+@app.route('/trilhas/bulk', methods=['PUT'])
+def put_trilhas_bulk():
+    return sincronizar_lote(upsert_trilha_many, COLUNAS_TRILHA, 'data_criacao')
+
+@app.route('/trilhas/<string:id_trilha>', methods=['GET'])
+def get_trilha(id_trilha):
+    return responder_condicional('trilhas', lambda: responder_item(read_trilha_by_id(id_trilha), 'Trilha não encontrada'))
+
 @app.route('/trilhas/<string:id_trilha>', methods=['PUT'])
 def put_trilha(id_trilha):
     dados = request.get_json()
@@ -88,16 +448,26 @@ def put_trilha(id_trilha):
         return jsonify({'message': 'Trilha atualizada com sucesso'})
     return jsonify({'error': 'Trilha não encontrada ou erro na atualização'}), 404
 
+@app.route('/trilhas/<string:id_trilha>', methods=['PATCH'])
+def patch_trilha_endpoint(id_trilha):
+    return atualizar_campos(patch_trilha, id_trilha, 'Trilha atualizada com sucesso', 'Trilha não encontrada ou erro na atualização', ('data_criacao',))
+
 @app.route('/trilhas/<string:id_trilha>', methods=['DELETE'])
 def delete_trilha_endpoint(id_trilha):
+    if pediu_cascata():
+        return excluir_com_dependentes(delete_trilha_many, id_trilha, 'Trilha deletada com sucesso', 'Trilha não encontrada ou erro ao deletar')
     if delete_trilha(id_trilha):
         return jsonify({'message': 'Trilha deletada com sucesso'})
     return jsonify({'error': 'Trilha não encontrada ou erro ao deletar'}), 404
 
+@app.route('/trilhas/delete', methods=['POST'])
+def post_trilhas_delete():
+    return excluir_lote(delete_trilha_many, aceita_cascata=True)
+
 # --- Endpoints de MÓDULOS ---
 @app.route('/modulos', methods=['GET'])
 def get_modulos():
-    return jsonify(read_modulo() or [])
+    return responder_condicional('modulos', lambda: responder_lista(read_modulo, read_modulo_pagina, iterar_modulos, read_modulo_colunas))
 
 @app.route('/modulos', methods=['POST'])
 def post_modulo():
@@ -109,6 +479,18 @@ def post_modulo():
         return jsonify({'message': 'Módulo criado com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar módulo'}), 500
 
+@app.route('/modulos/bulk', methods=['POST'])
+def post_modulos_bulk():
+    return criar_em_lote(create_modulo_many, COLUNAS_MODULO)
+
+@app.route('/modulos/bulk', methods=['PUT'])
+def put_modulos_bulk():
+    return sincronizar_lote(upsert_modulo_many, COLUNAS_MODULO)
+
+@app.route('/modulos/<string:id_modulo>', methods=['GET'])
+def get_modulo(id_modulo):
+    return responder_condicional('modulos', lambda: responder_item(read_modulo_by_id(id_modulo), 'Módulo não encontrado'))
+
 @app.route('/modulos/<string:id_modulo>', methods=['PUT'])
 def put_modulo(id_modulo):
     dados = request.get_json()
@@ -119,17 +501,31 @@ def put_modulo(id_modulo):
         return jsonify({'message': 'Módulo atualizado com sucesso'})
     return jsonify({'error': 'Módulo não encontrado ou erro na atualização'}), 404
 
+@app.route('/modulos/<string:id_modulo>', methods=['PATCH'])
+def patch_modulo_endpoint(id_modulo):
+    return atualizar_campos(patch_modulo, id_modulo, 'Módulo atualizado com sucesso', 'Módulo não encontrado ou erro na atualização')
+
 @app.route('/modulos/<string:id_modulo>', methods=['DELETE'])
 def delete_modulo_endpoint(id_modulo):
+    if pediu_cascata():
+        return excluir_com_dependentes(delete_modulo_many, id_modulo, 'Módulo deletado com sucesso', 'Módulo não encontrado ou erro ao deletar')
     if delete_modulo(id_modulo):
         return jsonify({'message': 'Módulo deletado com sucesso'})
     return jsonify({'error': 'Módulo não encontrado ou erro ao deletar'}), 404
 
+@app.route('/modulos/delete', methods=['POST'])
+def post_modulos_delete():
+    return excluir_lote(delete_modulo_many, aceita_cascata=True)
+
 # --- Endpoints de PROGRESSOS, SUGESTÕES, PREVISÕES (completos com PUT) ---
 
 @app.route('/progressos', methods=['GET'])
 def get_progressos():
-    return jsonify(read_progresso() or [])
+    return responder_lista(read_progresso, read_progresso_pagina, iterar_progressos, read_progresso_colunas)
+
+# Com LEME_PROGRESSOS_ASSINCRONO=1, POST /progressos só enfileira o registro (202) e uma thread
+# do worker grava os progressos em lote; com a fila cheia responde 503
+PROGRESSOS_ASSINCRONO = bool(ler_numero_env("LEME_PROGRESSOS_ASSINCRONO", 0))
 
 @app.route('/progressos', methods=['POST'])
 def post_progresso():
@@ -141,10 +537,43 @@ def post_progresso():
         dados['data_conclusao'] = datetime.strptime(dados['data_conclusao'], '%Y-%m-%d %H:%M:%S')
     except (ValueError, TypeError):
         return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD HH:MM:SS'}), 400
+    if PROGRESSOS_ASSINCRONO:
+        if fila_progressos.enfileirar(dados):
+            return jsonify({'message': 'Progresso recebido para gravação', 'id_progresso': dados['id_progresso']}), 202
+        resposta = jsonify({'error': 'Fila de progressos cheia, tente novamente em instantes'})
+        resposta.headers['Retry-After'] = '1'
+        return resposta, 503
     if create_progresso(**dados):
         return jsonify({'message': 'Progresso criado com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar progresso'}), 500
 
+@app.route('/progressos/bulk', methods=['POST'])
+def post_progressos_bulk():
+    return criar_em_lote(create_progresso_many, COLUNAS_PROGRESSO, 'data_conclusao')
+
+@app.route('/progressos/bulk', methods=['PUT'])
+def put_progressos_bulk():
+    return sincronizar_lote(upsert_progresso_many, COLUNAS_PROGRESSO, 'data_conclusao')
+
+# Conclui o módulo e soma o XP no usuário em uma transação; repetir a chamada não soma de novo
+@app.route('/usuarios/<string:id_usuario>/modulos/<string:id_modulo>/complete', methods=['POST'])
+def post_complete_module(id_usuario, id_modulo):
+    conclusao = complete_module(id_usuario, id_modulo)
+    if conclusao is None:
+        return jsonify({'error': 'Erro ao concluir o módulo'}), 500
+    resultado = conclusao.pop('resultado')
+    if resultado == CONCLUIDO:
+        return jsonify(conclusao), 201
+    if resultado == JA_CONCLUIDO:
+        return jsonify(conclusao), 200
+    if resultado == USUARIO_NAO_ENCONTRADO:
+        return jsonify({'error': 'Usuário não encontrado'}), 404
+    return jsonify({'error': 'Módulo não encontrado'}), 404
+
+@app.route('/progressos/<string:id_progresso>', methods=['GET'])
+def get_progresso(id_progresso):
+    return responder_item(read_progresso_by_id(id_progresso), 'Progresso não encontrado')
+
 @app.route('/progressos/<string:id_progresso>', methods=['PUT'])
 def put_progresso(id_progresso):
     dados = request.get_json()
@@ -159,15 +588,23 @@ def put_progresso(id_progresso):
         return jsonify({'message': 'Progresso atualizado com sucesso'})
     return jsonify({'error': 'Progresso não encontrado ou erro na atualização'}), 404
 
+@app.route('/progressos/<string:id_progresso>', methods=['PATCH'])
+def patch_progresso_endpoint(id_progresso):
+    return atualizar_campos(patch_progresso, id_progresso, 'Progresso atualizado com sucesso', 'Progresso não encontrado ou erro na atualização', ('data_conclusao',))
+
 @app.route('/progressos/<string:id_progresso>', methods=['DELETE'])
 def delete_progresso_endpoint(id_progresso):
     if delete_progresso(id_progresso):
         return jsonify({'message': 'Progresso deletado com sucesso'})
     return jsonify({'error': 'Progresso não encontrado ou erro ao deletar'}), 404
 
+@app.route('/progressos/delete', methods=['POST'])
+def post_progressos_delete():
+    return excluir_lote(delete_progresso_many)
+
 @app.route('/sugestoes', methods=['GET'])
 def get_sugestoes():
-    return jsonify(read_sugestao() or [])
+    return responder_condicional('sugestoes', lambda: responder_lista(read_sugestao, read_sugestao_pagina, iterar_sugestoes, read_sugestao_colunas))
 
 @app.route('/sugestoes', methods=['POST'])
 def post_sugestao():
@@ -183,6 +620,18 @@ def post_sugestao():
         return jsonify({'message': 'Sugestão criada com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar sugestão'}), 500
 
+@app.route('/sugestoes/bulk', methods=['POST'])
+def post_sugestoes_bulk():
+    return criar_em_lote(create_sugestao_many, COLUNAS_SUGESTAO, 'data_sugestao')
+
+@app.route('/sugestoes/bulk', methods=['PUT'])
+def put_sugestoes_bulk():
+    return sincronizar_lote(upsert_sugestao_many, COLUNAS_SUGESTAO, 'data_sugestao')
+
+@app.route('/sugestoes/<string:id_sugestao>', methods=['GET'])
+def get_sugestao(id_sugestao):
+    return responder_condicional('sugestoes', lambda: responder_item(read_sugestao_by_id(id_sugestao), 'Sugestão não encontrada'))
+
 @app.route('/sugestoes/<string:id_sugestao>', methods=['PUT'])
 def put_sugestao(id_sugestao):
     dados = request.get_json()
@@ -197,15 +646,23 @@ def put_sugestao(id_sugestao):
         return jsonify({'message': 'Sugestão atualizada com sucesso'})
     return jsonify({'error': 'Sugestão não encontrada ou erro na atualização'}), 404
 
+@app.route('/sugestoes/<string:id_sugestao>', methods=['PATCH'])
+def patch_sugestao_endpoint(id_sugestao):
+    return atualizar_campos(patch_sugestao, id_sugestao, 'Sugestão atualizada com sucesso', 'Sugestão não encontrada ou erro na atualização', ('data_sugestao',))
+
 @app.route('/sugestoes/<string:id_sugestao>', methods=['DELETE'])
 def delete_sugestao_endpoint(id_sugestao):
     if delete_sugestao(id_sugestao):
         return jsonify({'message': 'Sugestão deletada com sucesso'})
     return jsonify({'error': 'Sugestão não encontrada ou erro ao deletar'}), 404
 
+@app.route('/sugestoes/delete', methods=['POST'])
+def post_sugestoes_delete():
+    return excluir_lote(delete_sugestao_many)
+
 @app.route('/previsoes', methods=['GET'])
 def get_previsoes():
-    return jsonify(read_previsao() or [])
+    return responder_lista(read_previsao, read_previsao_pagina, iterar_previsoes, read_previsao_colunas)
 
 @app.route('/previsoes', methods=['POST'])
 def post_previsao():
@@ -221,6 +678,18 @@ def post_previsao():
         return jsonify({'message': 'Previsão criada com sucesso'}), 201
     return jsonify({'error': 'Erro ao criar previsão'}), 500
 
+@app.route('/previsoes/bulk', methods=['POST'])
+def post_previsoes_bulk():
+    return criar_em_lote(create_previsao_many, COLUNAS_PREVISAO, 'data_previsao')
+
+@app.route('/previsoes/bulk', methods=['PUT'])
+def put_previsoes_bulk():
+    return sincronizar_lote(upsert_previsao_many, COLUNAS_PREVISAO, 'data_previsao')
+
+@app.route('/previsoes/<string:id_previsao>', methods=['GET'])
+def get_previsao(id_previsao):
+    return responder_item(read_previsao_by_id(id_previsao), 'Previsão não encontrada')
+
 @app.route('/previsoes/<string:id_previsao>', methods=['PUT'])
 def put_previsao(id_previsao):
     dados = request.get_json()
@@ -235,11 +704,74 @@ def put_previsao(id_previsao):
         return jsonify({'message': 'Previsão atualizada com sucesso'})
     return jsonify({'error': 'Previsão não encontrada ou erro na atualização'}), 404
 
+@app.route('/previsoes/<string:id_previsao>', methods=['PATCH'])
+def patch_previsao_endpoint(id_previsao):
+    return atualizar_campos(patch_previsao, id_previsao, 'Previsão atualizada com sucesso', 'Previsão não encontrada ou erro na atualização', ('data_previsao',))
+
 @app.route('/previsoes/<string:id_previsao>', methods=['DELETE'])
 def delete_previsao_endpoint(id_previsao):
     if delete_previsao(id_previsao):
         return jsonify({'message': 'Previsão deletada com sucesso'})
     return jsonify({'error': 'Previsão não encontrada ou erro ao deletar'}), 404
 
+@app.route('/previsoes/delete', methods=['POST'])
+def post_previsoes_delete():
+    return excluir_lote(delete_previsao_many)
+
+# --- Endpoint de RANKING ---
+K_MAXIMO_RANKING = 100
+
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    try:
+        k = int(request.args.get('k', 10))
+    except ValueError:
+        return jsonify({'error': 'O parâmetro k deve ser um número inteiro'}), 400
+    if not 1 <= k <= K_MAXIMO_RANKING:
+        return jsonify({'error': f'O parâmetro k deve estar entre 1 e {K_MAXIMO_RANKING}'}), 400
+    ranking = read_ranking(request.args.get('area'), request.args.get('trilha'), k, request.args.get('id_usuario'))
+    if ranking is None:
+        return jsonify({'error': 'Erro ao ler o ranking'}), 500
+    return jsonify(ranking)
+
+LIMITE_MAXIMO_BUSCA = 100
+
+def ler_consulta_busca():
+    """Lê q e limit da busca. Retorna (q, limite, None) ou (None, None, resposta de erro)."""
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return None, None, (jsonify({'error': 'Informe o texto da busca no parâmetro q'}), 400)
+    try:
+        limite = int(request.args.get('limit', LIMITE_BUSCA))
+    except ValueError:
+        return None, None, (jsonify({'error': 'O parâmetro limit deve ser um número inteiro'}), 400)
+    if not 1 <= limite <= LIMITE_MAXIMO_BUSCA:
+        return None, None, (jsonify({'error': f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO_BUSCA}'}), 400)
+    return consulta, limite, None
+
+# Busca textual em trilhas e módulos pelo índice invertido em memória (não lê o conteúdo do banco)
+@app.route('/search', methods=['GET'])
+def get_search():
+    consulta, limite, erro = ler_consulta_busca()
+    if erro:
+        return erro
+    tipo = request.args.get('tipo')
+    if tipo not in (None, TRILHA, MODULO):
+        return jsonify({'error': f'O parâmetro tipo deve ser {TRILHA} ou {MODULO}'}), 400
+    resultado = buscar(consulta, limite, tipo)
+    if resultado is None:
+        return jsonify({'error': 'Erro ao buscar'}), 500
+    return jsonify(resultado)
+
+@app.route('/search/autocomplete', methods=['GET'])
+def get_search_autocomplete():
+    consulta, limite, erro = ler_consulta_busca()
+    if erro:
+        return erro
+    resultado = completar(consulta, limite)
+    if resultado is None:
+        return jsonify({'error': 'Erro ao completar a busca'}), 500
+    return jsonify(resultado)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -0,0 +1,211 @@
+import heapq
+import math
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import partial
+import oracledb
+from cache import IndiceIncremental
+from utilitarios import iterar_consulta, reler_alteradas, ler_numero_env, tokenizar
+
+# Busca textual em trilhas e módulos com um índice invertido em memória (termo -> documentos).
+# O texto é normalizado (minúsculas, sem acentos) antes de separar as palavras, então 'introducao'
+# encontra 'Introdução'. A relevância é BM25, com o título valendo mais que a descrição e o conteúdo.
+# A última palavra da consulta também casa com as palavras que começam com ela (busca enquanto digita),
+# e /search/autocomplete completa essa palavra a partir do vocabulário ordenado.
+# Como o índice de sugestões (indice_trilhas), é montado uma vez por worker e depois só as trilhas e
+# módulos alterados são relidos do banco, pelo registro de alterações do cache.
+BUSCA_TTL = ler_numero_env("LEME_BUSCA_TTL", 3600.0)  # segundos para remontar mesmo sem escritas
+LIMITE_BUSCA = 20
+MAXIMO_EXPANSOES = 50  # palavras do vocabulário usadas para completar a última palavra da consulta
+MAXIMO_CANDIDATOS = 1000  # palavras com o prefixo examinadas pelo autocompletar
+
+# Parâmetros do BM25 e peso de cada campo na frequência dos termos
+BM25_K1 = 1.2
+BM25_B = 0.75
+PESOS_CAMPOS = {'titulo': 3.0, 'descricao': 2.0, 'conteudo': 1.0}
+
+# Palavras comuns do português que não ajudam a diferenciar documentos
+PALAVRAS_VAZIAS = frozenset((
+    'a', 'o', 'as', 'os', 'um', 'uma', 'uns', 'umas', 'de', 'da', 'do', 'das', 'dos', 'e', 'ou', 'em', 'no',
+    'na', 'nos', 'nas', 'ao', 'aos', 'por', 'pelo', 'pela', 'para', 'com', 'sem', 'que', 'se', 'como', 'mais',
+))
+
+TRILHA = 'trilha'
+MODULO = 'modulo'
+SQL_TRILHAS_BUSCA = "SELECT id_trilha, titulo, descricao FROM LM_TRILHAS"
+SQL_MODULOS_BUSCA = "SELECT id_modulo, id_trilha, titulo, descricao, conteudo FROM LM_MODULOS"
+
+
+def termos(texto) -> list:
+    """Palavras normalizadas de 'texto' que entram no índice."""
+    return [palavra for palavra in tokenizar(texto) if palavra not in PALAVRAS_VAZIAS]
+
+
+class IndiceBusca:
+    """
+    Índice invertido: para cada termo, a frequência ponderada dele em cada documento. Um documento é
+    uma trilha ou um módulo, identificado por (tipo, id). O vocabulário fica também numa lista
+    ordenada, para completar prefixos com busca binária.
+    """
+
+    def __init__(self):
+        self.postings = {}     # termo -> {(tipo, id): frequência ponderada}
+        self.documentos = {}   # (tipo, id) -> {'termos': {termo: frequência}, 'dados'}
+        self.comprimentos = {}  # (tipo, id) -> soma das frequências (comprimento do documento no BM25)
+        self.vocabulario = []  # termos em ordem alfabética
+        self.comprimento_total = 0.0
+
+    def __len__(self):
+        return len(self.documentos)
+
+    def definir(self, tipo: str, id_documento, campos: dict, dados: dict) -> None:
+        """Inclui ou substitui o documento. 'campos' mapeia campo de PESOS_CAMPOS -> texto; 'dados' vai na resposta."""
+        self.remover(tipo, id_documento)
+        chave = (tipo, id_documento)
+        frequencias = {}
+        for campo, texto in campos.items():
+            peso = PESOS_CAMPOS[campo]
+            for termo, quantidade in Counter(termos(texto)).items():
+                frequencias[termo] = frequencias.get(termo, 0.0) + peso * quantidade
+        for termo, frequencia in frequencias.items():
+            documentos = self.postings.get(termo)
+            if documentos is None:
+                documentos = self.postings[termo] = {}
+                insort(self.vocabulario, termo)
+            documentos[chave] = frequencia
+        self.documentos[chave] = {'termos': frequencias, 'dados': dados}
+        self.comprimentos[chave] = sum(frequencias.values())
+        self.comprimento_total += self.comprimentos[chave]
+
+    def remover(self, tipo: str, id_documento) -> None:
+        documento = self.documentos.pop((tipo, id_documento), None)
+        if documento is None:
+            return
+        for termo in documento['termos']:
+            documentos = self.postings[termo]
+            del documentos[(tipo, id_documento)]
+            if not documentos:
+                del self.postings[termo]
+                del self.vocabulario[bisect_left(self.vocabulario, termo)]
+        self.comprimento_total -= self.comprimentos.pop((tipo, id_documento))
+
+    def expandir(self, prefixo: str, limite: int = MAXIMO_EXPANSOES) -> list:
+        """Termos do vocabulário que começam com 'prefixo', em ordem alfabética."""
+        encontrados = []
+        for termo in self.vocabulario[bisect_left(self.vocabulario, prefixo):]:
+            if not termo.startswith(prefixo) or len(encontrados) >= limite:
+                break
+            encontrados.append(termo)
+        return encontrados
+
+    def completar(self, prefixo: str, limite: int = 10) -> list:
+        """Completa 'prefixo' com os termos do vocabulário presentes em mais documentos."""
+        palavras = tokenizar(prefixo)
+        if not palavras:
+            return []
+        candidatos = self.expandir(palavras[-1], MAXIMO_CANDIDATOS)
+        return heapq.nsmallest(limite, candidatos, key=lambda termo: (-len(self.postings[termo]), termo))
+
+    def buscar(self, consulta: str, limite: int = LIMITE_BUSCA, tipo: str = None) -> list:
+        """
+        Retorna os 'limite' documentos mais relevantes para 'consulta' (BM25, qualquer termo casa)
+        como [(tipo, id, pontuacao, dados), ...]; com 'tipo', só trilhas ou só módulos.
+        """
+        palavras = tokenizar(consulta)
+        if not palavras or not self.documentos:
+            return []
+        # A última palavra pode estar incompleta: usa também os termos que começam com ela. Ela é
+        # separada antes de tirar as palavras vazias, como em completar ('de' a caminho de 'desenvolvimento')
+        ultima = palavras[-1]
+        pesquisados = {palavra: 1.0 for palavra in palavras[:-1] if palavra not in PALAVRAS_VAZIAS}
+        for termo in self.expandir(ultima):
+            pesquisados.setdefault(termo, 1.0 if termo == ultima else 0.5)
+        if ultima not in PALAVRAS_VAZIAS:
+            pesquisados.setdefault(ultima, 1.0)
+
+        total = len(self.documentos)
+        # BM25: idf * f * (k1 + 1) / (f + k1 * (1 - b + b * comprimento / media)), com as constantes fora do laço
+        fixo = BM25_K1 * (1 - BM25_B)
+        por_comprimento = BM25_K1 * BM25_B * total / self.comprimento_total if self.comprimento_total else 0.0
+        comprimentos = self.comprimentos
+        pontuacoes = {}
+        for termo, peso in pesquisados.items():
+            documentos = self.postings.get(termo)
+            if not documentos:
+                continue
+            idf = math.log(1 + (total - len(documentos) + 0.5) / (len(documentos) + 0.5))
+            escala = peso * idf * (BM25_K1 + 1)
+            for chave, frequencia in documentos.items():
+                if tipo is not None and chave[0] != tipo:
+                    continue
+                parcial = escala * frequencia / (frequencia + fixo + por_comprimento * comprimentos[chave])
+                pontuacoes[chave] = pontuacoes.get(chave, 0.0) + parcial
+        melhores = heapq.nlargest(limite, pontuacoes.items(), key=lambda item: (item[1], item[0]))
+        return [(chave[0], chave[1], pontuacao, self.documentos[chave]['dados']) for chave, pontuacao in melhores]
+
+
+def definir_trilha(indice: IndiceBusca, trilha: dict) -> None:
+    indice.definir(TRILHA, trilha['id_trilha'], {'titulo': trilha['titulo'], 'descricao': trilha['descricao']},
+                   {'titulo': trilha['titulo']})
+
+
+def definir_modulo(indice: IndiceBusca, modulo: dict) -> None:
+    indice.definir(MODULO, modulo['id_modulo'],
+                   {'titulo': modulo['titulo'], 'descricao': modulo['descricao'], 'conteudo': modulo['conteudo']},
+                   {'titulo': modulo['titulo'], 'id_trilha': modulo['id_trilha']})
+
+
+def montar_indice_busca(trilhas, modulos) -> IndiceBusca:
+    """Monta o índice a partir das linhas de SQL_TRILHAS_BUSCA e SQL_MODULOS_BUSCA."""
+    indice = IndiceBusca()
+    for trilha in trilhas:
+        definir_trilha(indice, trilha)
+    for modulo in modulos:
+        definir_modulo(indice, modulo)
+    return indice
+
+
+def aplicar_alteracoes(indice: IndiceBusca, trilhas, modulos) -> None:
+    """Relê do banco só as trilhas e os módulos alterados e os atualiza (ou remove) no índice."""
+    reler_alteradas(SQL_TRILHAS_BUSCA, 'id_trilha', trilhas, partial(definir_trilha, indice), partial(indice.remover, TRILHA))
+    reler_alteradas(SQL_MODULOS_BUSCA, 'id_modulo', modulos, partial(definir_modulo, indice), partial(indice.remover, MODULO))
+
+
+_indice = IndiceIncremental(
+    ('trilhas', 'modulos'),
+    lambda: montar_indice_busca(iterar_consulta(SQL_TRILHAS_BUSCA), iterar_consulta(SQL_MODULOS_BUSCA)),
+    aplicar_alteracoes, BUSCA_TTL)
+
+
+def aquecer_busca() -> None:
+    """Monta o índice antes do primeiro pedido (chamado ao iniciar cada worker do gunicorn)."""
+    try:
+        with _indice.usar():
+            pass
+    except oracledb.Error as e:
+        print(f'\n Erro ao montar o índice de busca: {e}')
+
+
+def buscar(consulta: str, limite: int = LIMITE_BUSCA, tipo: str = None):
+    """
+    Busca 'consulta' nos títulos, descrições e conteúdos de trilhas e módulos. Retorna
+    {'items': [{'tipo', 'id', 'titulo', 'pontuacao'[, 'id_trilha']}, ...]}, ou None em caso de erro.
+    """
+    try:
+        with _indice.usar() as indice:
+            resultados = indice.buscar(consulta, limite, tipo)
+    except oracledb.Error as e:
+        print(f'\n Erro ao buscar: {e}')
+        return None
+    return {'items': [dict(dados, tipo=tipo_doc, id=id_documento, pontuacao=round(pontuacao, 4))
+                      for tipo_doc, id_documento, pontuacao, dados in resultados]}
+
+
+def completar(prefixo: str, limite: int = 10):
+    """Retorna {'sugestoes': [termo, ...]} para completar a última palavra de 'prefixo', ou None em caso de erro."""
+    try:
+        with _indice.usar() as indice:
+            return {'sugestoes': indice.completar(prefixo, limite)}
+    except oracledb.Error as e:
+        print(f'\n Erro ao completar a busca: {e}')
+        return None
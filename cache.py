@@ -0,0 +1,287 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from utilitarios import ler_numero_env
+
+# Tempo de vida padrão (segundos) e quantidade máxima de entradas de cada cache
+CACHE_TTL = ler_numero_env("LEME_CACHE_TTL", 60.0)
+CACHE_TAMANHO = ler_numero_env("LEME_CACHE_TAMANHO", 256)
+
+# Todos os caches criados, por nome, para expor as estatísticas
+CACHES = {}
+
+# --- Barramento de invalidação entre processos ---
+# Cada namespace (ex.: 'trilhas') tem um arquivo de versão em LEME_CACHE_DIR. Quem grava dados
+# acrescenta 1 byte ao arquivo (O_APPEND é atômico entre processos); cada worker compara o
+# (inode, tamanho, mtime) do arquivo com o que viu por último e limpa o cache local se mudou.
+# Assim todos os workers do gunicorn deixam de servir dados antigos após uma escrita em qualquer um deles.
+DIRETORIO_VERSOES = os.getenv("LEME_CACHE_DIR", os.path.join(tempfile.gettempdir(), "leme_cache"))
+TAMANHO_MAXIMO_VERSAO = 1 << 20  # bytes; o arquivo é zerado ao passar disso
+
+
+def _arquivo_versao(namespace: str) -> str:
+    return os.path.join(DIRETORIO_VERSOES, f"{namespace}.versao")
+
+
+def versao(namespace: str):
+    """Retorna a versão atual de 'namespace' no barramento (None se nunca houve escrita)."""
+    try:
+        st = os.stat(_arquivo_versao(namespace))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def garantir_versao(namespace: str):
+    """Como versao(), mas cria o arquivo vazio se ele ainda não existir, para sempre haver uma versão."""
+    atual = versao(namespace)
+    if atual is not None:
+        return atual
+    try:
+        os.makedirs(DIRETORIO_VERSOES, exist_ok=True)
+        os.close(os.open(_arquivo_versao(namespace), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666))
+    except OSError as e:
+        print(f'Aviso: não foi possível criar o arquivo de versão de {namespace}: {e}')
+    return versao(namespace)
+
+
+def publicar_invalidacao(namespace: str) -> None:
+    """Avisa todos os processos que os dados de 'namespace' mudaram."""
+    try:
+        os.makedirs(DIRETORIO_VERSOES, exist_ok=True)
+        descritor = os.open(_arquivo_versao(namespace), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(descritor, b'.')
+            if os.fstat(descritor).st_size > TAMANHO_MAXIMO_VERSAO:
+                os.ftruncate(descritor, 0)
+        finally:
+            os.close(descritor)
+    except OSError as e:
+        # Sem o barramento os outros workers ainda expiram os dados pelo TTL
+        print(f'Aviso: não foi possível publicar a invalidação de {namespace}: {e}')
+
+
+# --- Registro de alterações ---
+# Índices em memória (ex.: indice_trilhas) não podem ser remontados a cada escrita. Para eles, as
+# funções de escrita também acrescentam as chaves alteradas, uma linha JSON por chave, ao arquivo
+# <namespace>.alteracoes; cada worker lê só o trecho novo e relê do banco apenas essas linhas.
+# Ao passar de TAMANHO_MAXIMO_VERSAO o arquivo é trocado por um vazio e os leitores remontam tudo.
+def _arquivo_alteracoes(namespace: str) -> str:
+    return os.path.join(DIRETORIO_VERSOES, f"{namespace}.alteracoes")
+
+
+def registrar_alteracoes(namespace: str, chaves) -> None:
+    """Acrescenta 'chaves' ao registro de alterações de 'namespace'."""
+    linhas = ''.join(json.dumps(chave) + '\n' for chave in chaves)
+    if not linhas:
+        return
+    arquivo = _arquivo_alteracoes(namespace)
+    try:
+        os.makedirs(DIRETORIO_VERSOES, exist_ok=True)
+        descritor = os.open(arquivo, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(descritor, linhas.encode())
+            cheio = os.fstat(descritor).st_size > TAMANHO_MAXIMO_VERSAO
+        finally:
+            os.close(descritor)
+        if cheio:
+            descritor, temporario = tempfile.mkstemp(dir=DIRETORIO_VERSOES)
+            os.close(descritor)
+            os.chmod(temporario, 0o666)
+            os.replace(temporario, arquivo)
+    except OSError as e:
+        # Sem o registro, os leitores só percebem a escrita pela versão e remontam tudo
+        print(f'Aviso: não foi possível registrar as alterações de {namespace}: {e}')
+
+
+class LeitorAlteracoes:
+    """Lê, a cada chamada de novas(), as chaves acrescentadas ao registro de 'namespace' desde a última leitura."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._visto = None  # (inode, posição já lida)
+        self._versao = None
+
+    def _fim(self):
+        try:
+            st = os.stat(_arquivo_alteracoes(self.namespace))
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def marcar(self) -> None:
+        """Considera lido tudo o que já está no registro. Chamado antes de montar o índice a partir do banco."""
+        self._versao = versao(self.namespace)
+        self._visto = self._fim()
+
+    def novas(self):
+        """
+        Retorna a lista de chaves alteradas desde a última leitura, ou None se o registro foi trocado
+        ou não acompanha a versão do namespace (escrita sem chaves, ou falha ao registrar): nesse caso
+        o índice precisa ser remontado.
+        """
+        if self._visto is None:
+            return None
+        atual = versao(self.namespace)
+        inode, tamanho = self._fim()
+        inode_visto, posicao = self._visto
+        if inode_visto is None:
+            inode_visto = inode
+        if inode != inode_visto or tamanho < posicao:
+            return None
+        if tamanho == posicao:
+            # Nada registrado: se a versão mudou, houve uma escrita que não registrou chaves
+            return [] if atual == self._versao else None
+        with open(_arquivo_alteracoes(self.namespace), 'rb') as f:
+            f.seek(posicao)
+            bloco = f.read(tamanho - posicao)
+        completo = bloco[:bloco.rfind(b'\n') + 1]
+        self._visto = (inode, posicao + len(completo))
+        self._versao = atual
+        return [json.loads(linha) for linha in completo.splitlines()]
+
+
+class IndiceIncremental:
+    """
+    Índice em memória (ex.: busca, indice_trilhas) montado uma vez por worker e depois mantido pelo
+    registro de alterações de 'namespaces'. montar() lê tudo do banco e retorna um índice novo;
+    aplicar(indice, *chaves) recebe as chaves alteradas de cada namespace, na mesma ordem, e relê só elas.
+    Depois de 'ttl' segundos o índice é remontado mesmo sem escritas, corrigindo o que foi alterado direto
+    no banco. Os erros de montar() e aplicar() chegam ao chamador, e o próximo uso remonta o índice.
+    """
+
+    def __init__(self, namespaces, montar, aplicar, ttl: float):
+        self._leitores = [LeitorAlteracoes(namespace) for namespace in namespaces]
+        self._montar = montar
+        self._aplicar = aplicar
+        self.ttl = ttl
+        self._indice = None
+        self._montado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _sincronizar(self):
+        """Retorna o índice atualizado, montando-o se necessário. Chamado com _lock adquirido."""
+        if self._indice is not None and time.monotonic() - self._montado_em < self.ttl:
+            alteracoes = [leitor.novas() for leitor in self._leitores]
+            if all(chaves is not None for chaves in alteracoes):
+                if any(alteracoes):
+                    indice, self._indice = self._indice, None  # se a releitura falhar, o próximo uso remonta
+                    self._aplicar(indice, *alteracoes)
+                    self._indice = indice
+                return self._indice
+        # As alterações registradas a partir daqui serão aplicadas sobre o resultado das consultas
+        self._indice = None
+        for leitor in self._leitores:
+            leitor.marcar()
+        self._indice = self._montar()
+        self._montado_em = time.monotonic()
+        return self._indice
+
+    @contextmanager
+    def usar(self):
+        """Fornece o índice atualizado a um bloco 'with', com o lock adquirido até o fim do bloco."""
+        with self._lock:
+            yield self._sincronizar()
+
+
+class CacheTTL:
+    """
+    Cache em memória com tempo de vida (TTL) e limite de tamanho com descarte LRU.
+    Os valores guardados são compartilhados entre os chamadores e não devem ser alterados.
+    Com 'namespace', o cache também é limpo quando outro processo publica uma invalidação dele.
+    """
+
+    def __init__(self, nome: str, ttl: float = CACHE_TTL, tamanho_maximo: int = CACHE_TAMANHO, namespace: str = None):
+        self.nome = nome
+        self.namespace = namespace
+        self._versao = versao(namespace) if namespace else None
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._dados = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self._geracao = 0  # muda a cada invalidação, para descartar cargas que começaram antes dela
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.invalidacoes = 0
+        CACHES[nome] = self
+
+    def obter(self, chave, carregar):
+        """
+        Retorna o valor de 'chave'. Se ele não estiver no cache ou tiver expirado, chama carregar()
+        e guarda o resultado (resultados None, que indicam erro, não são guardados).
+        """
+        atual = versao(self.namespace) if self.namespace else None
+        agora = time.monotonic()
+        with self._lock:
+            if atual != self._versao:
+                self._dados.clear()
+                self._geracao += 1
+                self._versao = atual
+            item = self._dados.get(chave)
+            if item is not None and item[0] > agora:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+            geracao = self._geracao
+
+        valor = carregar()
+        if valor is not None:
+            with self._lock:
+                if geracao == self._geracao:
+                    self._dados[chave] = (time.monotonic() + self.ttl, valor)
+                    self._dados.move_to_end(chave)
+                    while len(self._dados) > self.tamanho_maximo:
+                        self._dados.popitem(last=False)
+                        self.descartes += 1
+        return valor
+
+    def invalidar(self, chave=None):
+        """Remove 'chave' do cache, ou todas as entradas se nenhuma chave for informada."""
+        with self._lock:
+            self._geracao += 1
+            self.invalidacoes += 1
+            if chave is None:
+                self._dados.clear()
+            else:
+                self._dados.pop(chave, None)
+
+    def estatisticas(self) -> dict:
+        """Retorna os contadores de uso do cache."""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._dados),
+                'tamanho_maximo': self.tamanho_maximo,
+                'ttl_s': self.ttl,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / consultas, 4) if consultas else None,
+                'descartes': self.descartes,
+                'invalidacoes': self.invalidacoes,
+            }
+
+
+def estatisticas_caches() -> dict:
+    """Retorna as estatísticas de todos os caches do processo."""
+    return {nome: cache.estatisticas() for nome, cache in CACHES.items()}
+
+
+def invalidar(namespace: str, chaves=None) -> None:
+    """
+    Invalida os dados de 'namespace' em todos os workers: publica no barramento e
+    limpa na hora os caches locais desse namespace. Chamado pelas funções de escrita.
+    Com 'chaves', registra também quais linhas mudaram (ver registrar_alteracoes).
+    """
+    publicar_invalidacao(namespace)
+    for cache in list(CACHES.values()):
+        if cache.namespace == namespace:
+            cache.invalidar()
+    # Depois da versão, para que quem ler as chaves já encontre os caches por id invalidados
+    if chaves is not None:
+        registrar_alteracoes(namespace, chaves)
@@ -0,0 +1,221 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import oracledb
+from datetime import datetime, timedelta
+from utilitarios import converter_hora, obter_scn, ler_numero_env
+
+# Formatos de exportação:
+#   'indentado' -> array JSON com indentação de 4 espaços (formato original dos arquivos)
+#   'compacto'  -> array JSON sem espaços
+#   'ndjson'    -> um registro JSON por linha
+FORMATOS_EXPORTACAO = ('indentado', 'compacto', 'ndjson')
+
+
+def _serializar(registro: dict, formato: str) -> str:
+    """Serializa um registro no formato pedido (sem o separador entre registros)."""
+    if formato == 'indentado':
+        texto = json.dumps(registro, ensure_ascii=False, indent=4, default=converter_hora)
+        return '\n'.join('    ' + linha for linha in texto.splitlines())
+    return json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=converter_hora)
+
+
+def exportar_registros(registros, caminho: str, formato: str = 'indentado', compactar: bool = False,
+                       gravar_vazio: bool = False):
+    """
+    Grava 'registros' (qualquer iterável de dicionários, como os geradores iterar_*) em 'caminho'
+    conforme vão sendo lidos, sem montar a lista na memória. Com 'compactar' o arquivo é gravado
+    com gzip (e recebe a extensão .gz). A escrita é feita em um arquivo temporário no mesmo
+    diretório, renomeado para o destino só no final, então um arquivo anterior nunca fica pela metade.
+    Se não houver registros nenhum arquivo é criado, a não ser com 'gravar_vazio' (array vazio ou NDJSON
+    sem linhas), que substitui um arquivo anterior com o mesmo nome.
+    Retorna (quantidade, caminho_final). Lança OSError/TypeError em falhas de escrita.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato inválido: {formato}. Use um de {', '.join(FORMATOS_EXPORTACAO)}.")
+    if compactar and not caminho.endswith('.gz'):
+        caminho += '.gz'
+
+    registros = iter(registros)
+    primeiro = next(registros, None)
+    if primeiro is None and not gravar_vazio:
+        return 0, caminho
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.' + os.path.basename(caminho) + '.', suffix='.tmp')
+    os.close(descritor)
+    os.chmod(temporario, 0o644)
+
+    quantidade = 0
+    try:
+        abrir = gzip.open if compactar else open
+        with abrir(temporario, 'wt', encoding='utf-8') as f:
+            if formato == 'ndjson':
+                separador, inicio, fim = '\n', '', '\n'
+            elif formato == 'indentado':
+                separador, inicio, fim = ',\n', '[\n', '\n]'
+            else:
+                separador, inicio, fim = ',', '[', ']'
+
+            if primeiro is None:
+                f.write('' if formato == 'ndjson' else '[]')
+            else:
+                f.write(inicio)
+                f.write(_serializar(primeiro, formato))
+                quantidade = 1
+                for registro in registros:
+                    f.write(separador)
+                    f.write(_serializar(registro, formato))
+                    quantidade += 1
+                f.write(fim)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+    return quantidade, caminho
+
+
+# --- Exportação incremental (delta) ---
+DIRETORIO_EXPORTACAO = os.getenv('LEME_DIRETORIO_EXPORTACAO', 'exportacoes')
+# Segundos relidos antes da marca d'água nas execuções incrementais. As marcas usam a data do próprio
+# registro (data_conclusao, ...), não a hora do commit: linhas gravadas com atraso (fila assíncrona,
+# cargas em lote, transações longas) podem ter data anterior à marca da última execução.
+MARGEM_INCREMENTAL = ler_numero_env("LEME_MARGEM_INCREMENTAL", 300)
+
+
+def gravar_json_atomico(caminho: str, dados) -> None:
+    """Grava 'dados' como JSON em 'caminho' via arquivo temporário + rename."""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.' + os.path.basename(caminho) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=4, default=converter_hora)
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def ler_marcas(arquivo_marcas: str) -> dict:
+    """Lê as marcas d'água (último timestamp exportado por tabela). Retorna {} se o arquivo não existir."""
+    try:
+        with open(arquivo_marcas, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _sha256_arquivo(caminho: str) -> str:
+    """Calcula o SHA-256 de um arquivo em blocos."""
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def exportar_incremental(tabela: str, iterar, coluna_data: str, diretorio: str = DIRETORIO_EXPORTACAO,
+                         formato: str = 'ndjson', compactar: bool = False, margem_segundos: int = MARGEM_INCREMENTAL,
+                         arquivo_marcas: str = None):
+    """
+    Exporta apenas as linhas de 'tabela' com 'coluna_data' posterior à marca d'água da última execução.
+    'iterar' é o gerador da tabela (ex.: iterar_progressos), chamado com desde=<marca>.
+    Cada execução grava em 'diretorio' um arquivo delta e um manifesto (<delta>.manifest.json) com a
+    quantidade, as marcas anterior e nova e o SHA-256 do arquivo. A marca só avança depois que o delta
+    foi gravado. 'margem_segundos' reexporta uma janela antes da marca para pegar linhas gravadas com
+    atraso, então deltas seguidos se sobrepõem e o destino deve deduplicar pela chave primária. Linhas
+    com data anterior à marca menos a margem (ex.: importações retroativas) só saem na exportação completa.
+    Retorna o manifesto, ou None em caso de erro.
+    """
+    arquivo_marcas = arquivo_marcas or os.path.join(diretorio, 'marcas.json')
+    try:
+        marcas = ler_marcas(arquivo_marcas)
+        marca_anterior = datetime.fromisoformat(marcas[tabela]) if marcas.get(tabela) else None
+        desde = marca_anterior - timedelta(seconds=margem_segundos) if marca_anterior else None
+
+        maior = [marca_anterior]
+        def acompanhar(registros):
+            for registro in registros:
+                valor = registro[coluna_data]
+                if valor is not None and (maior[0] is None or valor > maior[0]):
+                    maior[0] = valor
+                yield registro
+
+        inicio = datetime.now()
+        extensao = 'ndjson' if formato == 'ndjson' else 'json'
+        caminho = os.path.join(diretorio, f'{tabela}_delta_{inicio:%Y%m%dT%H%M%S%f}.{extensao}')
+        quantidade, destino = exportar_registros(acompanhar(iterar(desde=desde)), caminho, formato, compactar)
+
+        manifesto = {
+            'tabela': tabela,
+            'arquivo': os.path.basename(destino) if quantidade else None,
+            'registros': quantidade,
+            'formato': formato,
+            'compactado': compactar,
+            'marca_anterior': marca_anterior,
+            'marca_nova': maior[0],
+            'margem_segundos': margem_segundos,
+            'inicio': inicio,
+            'fim': datetime.now(),
+            'sha256': _sha256_arquivo(destino) if quantidade else None,
+        }
+        gravar_json_atomico(os.path.join(diretorio, f'{tabela}_delta_{inicio:%Y%m%dT%H%M%S%f}.manifest.json'), manifesto)
+
+        if quantidade:
+            marcas[tabela] = maior[0].isoformat()
+            gravar_json_atomico(arquivo_marcas, marcas)
+        return manifesto
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler {tabela} para a exportação incremental: {e}')
+        return None
+    except (IOError, TypeError, ValueError) as e:
+        print(f'\n Erro ao gravar a exportação incremental de {tabela}: {e}')
+        return None
+
+
+# --- Exportação paralela de várias tabelas ---
+def _exportar_tabela(tabela: str, iterar, scn, diretorio: str, formato: str, compactar: bool) -> dict:
+    """
+    Exporta uma tabela no SCN informado e mede o tempo. Executado em um worker do pool de threads.
+    O arquivo é sempre gravado, mesmo vazio, para não deixar no diretório o de uma exportação anterior.
+    """
+    inicio = time.perf_counter()
+    extensao = 'ndjson' if formato == 'ndjson' else 'json'
+    quantidade, destino = exportar_registros(iterar(scn=scn), os.path.join(diretorio, f'{tabela}.{extensao}'), formato,
+                                             compactar, gravar_vazio=True)
+    return {'tabela': tabela, 'registros': quantidade, 'arquivo': destino, 'segundos': time.perf_counter() - inicio}
+
+
+def exportar_em_paralelo(tabelas, diretorio: str = DIRETORIO_EXPORTACAO, formato: str = 'ndjson',
+                         compactar: bool = False, trabalhadores: int = 4):
+    """
+    Exporta várias tabelas ao mesmo tempo em um pool limitado de 'trabalhadores' threads.
+    'tabelas' é uma sequência de (nome, gerador iterar_*). Cada worker usa a sua própria conexão do pool
+    (ORACLE_POOL_MAX deve ser pelo menos 'trabalhadores'), e todas as tabelas são lidas no mesmo SCN,
+    então os arquivos formam um retrato consistente do banco.
+    Retorna (scn, lista de resultados por tabela), com 'erro' preenchido nas tabelas que falharam,
+    ou None se não foi possível obter o SCN.
+    """
+    try:
+        scn = obter_scn()
+    except oracledb.Error as e:
+        print(f'\n Erro ao obter o SCN para a exportação: {e}')
+        return None
+
+    resultados = []
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        futuros = {executor.submit(_exportar_tabela, tabela, iterar, scn, diretorio, formato, compactar): tabela
+                   for tabela, iterar in tabelas}
+        for futuro in as_completed(futuros):
+            try:
+                resultados.append(futuro.result())
+            except (oracledb.Error, IOError, TypeError, ValueError) as e:
+                resultados.append({'tabela': futuros[futuro], 'erro': str(e)})
+    return scn, resultados
@@ -0,0 +1,196 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from utilitarios import ler_numero_env
+
+# Padrões das filas de escrita (podem ser ajustados por variável de ambiente)
+FILA_TAMANHO = ler_numero_env("LEME_FILA_TAMANHO", 10000)         # registros aguardando gravação
+FILA_LOTE = ler_numero_env("LEME_FILA_LOTE", 500)                 # registros por executemany
+FILA_INTERVALO = ler_numero_env("LEME_FILA_INTERVALO", 0.5)       # segundos até gravar um lote incompleto
+FILA_ESPERA = ler_numero_env("LEME_FILA_ESPERA", 0.1)             # segundos esperando vaga com a fila cheia
+FILA_TENTATIVAS = ler_numero_env("LEME_FILA_TENTATIVAS", 3)       # tentativas de gravar um lote se o banco falhar
+FILA_ENCERRAMENTO = ler_numero_env("LEME_FILA_ENCERRAMENTO", 30.0)  # segundos para esvaziar a fila ao encerrar
+
+# Colocado na fila por encerrar() só para acordar a thread que espera registros
+_ACORDAR = object()
+
+# Todas as filas criadas, por nome, para expor as estatísticas e esvaziá-las no encerramento
+FILAS = {}
+
+
+class FilaEscrita:
+    """
+    Fila de escrita em segundo plano (write-behind) limitada a 'tamanho_maximo' registros.
+    enfileirar() apenas guarda o registro e retorna; uma thread do processo junta os registros e
+    chama gravar(lote) quando o lote chega a 'tamanho_lote' ou 'intervalo' segundos depois do
+    primeiro registro. 'gravar' recebe uma lista de dicionários e retorna {'inseridos', 'erros'}
+    (como os create_*_many), ou None se o banco falhou, caso em que o lote é tentado de novo.
+    Erros com 'falha_do_lote' (o banco falhou no meio, ver _executar_em_lote) também são tentados de novo;
+    só as linhas rejeitadas pelo banco são descartadas na hora.
+    Os registros ficam só na memória: o que não foi gravado se perde se o processo morrer sem encerrar().
+    """
+
+    def __init__(self, nome: str, gravar, tamanho_maximo: int = FILA_TAMANHO, tamanho_lote: int = FILA_LOTE,
+                 intervalo: float = FILA_INTERVALO, espera: float = FILA_ESPERA, tentativas: int = FILA_TENTATIVAS):
+        self.nome = nome
+        self.gravar = gravar
+        self.tamanho_maximo = tamanho_maximo
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.espera = espera
+        self.tentativas = tentativas
+        self._reiniciar()
+        FILAS[nome] = self
+
+    def _reiniciar(self) -> None:
+        """Cria a fila, a trava e os contadores (também usado no processo filho após um fork)."""
+        self._fila = queue.Queue(self.tamanho_maximo)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.enfileirados = 0
+        self.rejeitados = 0
+        self.gravados = 0
+        self.erros = 0
+        self.descartados = 0
+        self.lotes = 0
+        self._latencia_ultima = self._latencia_soma = self._latencia_maxima = 0.0
+
+    def enfileirar(self, registro) -> bool:
+        """
+        Coloca 'registro' na fila. Se ela estiver cheia, espera até 'espera' segundos por uma vaga
+        e retorna False (o chamador deve pedir ao cliente que tente mais tarde).
+        """
+        if self._parar.is_set():
+            return False
+        self._iniciar()
+        try:
+            self._fila.put(registro, timeout=self.espera)
+        except queue.Full:
+            with self._lock:
+                self.rejeitados += 1
+            return False
+        with self._lock:
+            self.enfileirados += 1
+        return True
+
+    def _iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name=f'fila-{self.nome}', daemon=True)
+                self._thread.start()
+
+    def _coletar(self) -> list:
+        """Espera o primeiro registro e junta os seguintes até completar o lote ou vencer o intervalo."""
+        try:
+            lote = [self._fila.get_nowait() if self._parar.is_set() else self._fila.get(timeout=self.intervalo)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = 0 if self._parar.is_set() else limite - time.monotonic()
+            try:
+                lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return [registro for registro in lote if registro is not _ACORDAR]
+
+    def _executar(self) -> None:
+        while True:
+            lote = self._coletar()
+            if lote:
+                self._gravar(lote)
+            elif self._parar.is_set():
+                return
+
+    def _gravar(self, lote: list) -> None:
+        for tentativa in range(1, self.tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                resultado = self.gravar(lote)
+            except Exception as e:
+                print(f'\n Erro ao gravar o lote da fila {self.nome}: {e}')
+                resultado = None
+            duracao = time.perf_counter() - inicio
+            pendentes = lote
+            if resultado is not None:
+                pendentes = [lote[erro['indice']] for erro in resultado['erros'] if erro.get('falha_do_lote')]
+                rejeitados = [erro for erro in resultado['erros'] if not erro.get('falha_do_lote')]
+            with self._lock:
+                self.lotes += 1
+                self._latencia_ultima = duracao
+                self._latencia_soma += duracao
+                self._latencia_maxima = max(self._latencia_maxima, duracao)
+                if resultado is not None:
+                    self.gravados += resultado['inseridos']
+                    self.erros += len(rejeitados)
+            if resultado is not None:
+                for erro in rejeitados:
+                    print(f"\n Registro rejeitado na fila {self.nome}: {lote[erro['indice']]} ({erro['erro']})")
+                if not pendentes:
+                    return
+                falha = next(erro['erro'] for erro in resultado['erros'] if erro.get('falha_do_lote'))
+                print(f'\n Erro ao gravar {len(pendentes)} registros da fila {self.nome}: {falha}')
+                lote = pendentes
+            if tentativa < self.tentativas:
+                time.sleep(min(2 ** tentativa * 0.1, 5))
+        with self._lock:
+            self.descartados += len(lote)
+        print(f'\n Fila {self.nome}: {len(lote)} registros descartados após {self.tentativas} tentativas.')
+
+    def encerrar(self, timeout: float = FILA_ENCERRAMENTO) -> None:
+        """Para de aceitar registros e espera a thread gravar o que ainda está na fila."""
+        self._parar.set()
+        if self._thread is not None:
+            try:
+                self._fila.put_nowait(_ACORDAR)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print(f'\n Fila {self.nome}: {self._fila.qsize()} registros não foram gravados antes do encerramento.')
+
+    def estatisticas(self) -> dict:
+        """Retorna a profundidade da fila, os contadores e a latência dos lotes gravados."""
+        with self._lock:
+            return {
+                'profundidade': self._fila.qsize(),
+                'capacidade': self.tamanho_maximo,
+                'enfileirados': self.enfileirados,
+                'rejeitados_fila_cheia': self.rejeitados,
+                'gravados': self.gravados,
+                'erros': self.erros,
+                'descartados': self.descartados,
+                'lotes': self.lotes,
+                'latencia_ultima_ms': round(self._latencia_ultima * 1000, 2),
+                'latencia_media_ms': round(self._latencia_soma / self.lotes * 1000, 2) if self.lotes else None,
+                'latencia_maxima_ms': round(self._latencia_maxima * 1000, 2),
+                'ativa': self._thread is not None and self._thread.is_alive(),
+            }
+
+
+def estatisticas_filas() -> dict:
+    """Retorna as estatísticas de todas as filas do processo."""
+    return {nome: fila.estatisticas() for nome, fila in FILAS.items()}
+
+
+def encerrar_filas() -> None:
+    """Esvazia todas as filas do processo (chamado ao encerrar a aplicação ou o worker)."""
+    for fila in list(FILAS.values()):
+        fila.encerrar()
+
+
+def _descartar_filas_herdadas() -> None:
+    """No processo filho após um fork, as filas recomeçam vazias e sem thread (elas são do processo pai)."""
+    for fila in FILAS.values():
+        fila._reiniciar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_filas_herdadas)
+# Registrado depois de fechar_pool (utilitarios), então roda antes dele e ainda tem conexões
+atexit.register(encerrar_filas)
@@ -0,0 +1,22 @@
+# Configuração do gunicorn para a API Leme.
+# Uso: gunicorn api:app
+import os
+from busca import aquecer_busca
+from fila import encerrar_filas
+from indice_trilhas import aquecer_indice
+from utilitarios import fechar_pool
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8080")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+
+
+def post_worker_init(worker):
+    """Monta os índices da busca e das sugestões ao vivo antes de o worker receber pedidos."""
+    aquecer_busca()
+    aquecer_indice()
+
+
+def worker_exit(server, worker):
+    """Grava o que ainda está nas filas de escrita e devolve as sessões do pool ao Oracle quando um worker é encerrado."""
+    encerrar_filas()
+    fechar_pool()
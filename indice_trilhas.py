@@ -0,0 +1,249 @@
+import zlib
+import numpy as np
+import oracledb
+from cache import IndiceIncremental
+from recomendacao import precisa_adaptacao
+from usuarios import read_usuario_by_id
+from utilitarios import iterar_consulta, reler_alteradas, ler_numero_env, normalizar_texto, tokenizar
+
+# Índice em memória do catálogo para as sugestões ao vivo. Cada trilha vira um vetor de termos
+# (palavras do título e da descrição da trilha e dos seus módulos, tipo dos módulos e área_foco),
+# com os termos espalhados por hashing em DIMENSOES_INDICE colunas. O índice é montado uma vez por
+# worker e depois só as trilhas e módulos gravados são relidos (pelo registro de alterações do cache).
+# No pedido, o perfil do usuário é a soma dos vetores dos módulos que ele concluiu e todas as trilhas
+# são pontuadas de uma vez com um produto matriz x vetor; nenhuma tabela é lida inteira.
+DIMENSOES_INDICE = ler_numero_env("LEME_INDICE_DIMENSOES", 1024)
+# Intervalo (segundos) para remontar o índice mesmo sem escritas, corrigindo o que foi alterado direto no banco
+INDICE_TTL = ler_numero_env("LEME_INDICE_TTL", 3600.0)
+TOP_K_AO_VIVO = ler_numero_env("LEME_SUGESTOES_AO_VIVO_K", 5)
+
+# Peso de cada sinal na pontuação ao vivo (todos vão de 0 a 1)
+PESOS_AO_VIVO = {
+    'conteudo': 1.0,         # cosseno entre o vetor da trilha e o perfil do usuário
+    'andamento': 0.4,        # fração da trilha já concluída (trilhas em andamento sobem)
+    'area': 0.5,             # area_foco da trilha igual à área do usuário
+    'acessibilidade': 0.3,   # proporção de módulos adaptados, para quem informou necessidade de acessibilidade
+}
+# Peso do termo de área_foco e da média dos módulos no vetor da trilha (o texto da trilha tem peso 1)
+PESO_TERMO_AREA = 2.0
+PESO_MODULOS = 1.0
+
+SQL_TRILHAS_INDICE = "SELECT id_trilha, titulo, descricao, area_foco FROM LM_TRILHAS"
+SQL_MODULOS_INDICE = "SELECT id_modulo, id_trilha, titulo, descricao, tipo, adaptacao_necessaria FROM LM_MODULOS"
+SQL_CONCLUIDOS_USUARIO = "SELECT DISTINCT id_modulo FROM LM_PROGRESSOS WHERE id_usuario = :id_usuario"
+
+
+def _area(valor) -> str:
+    return normalizar_texto(valor).strip()
+
+
+class IndiceTrilhas:
+    """
+    Matriz trilha x termo (linhas normalizadas) mais os atributos usados na pontuação, alinhados pela
+    linha da trilha. Linhas de trilhas excluídas ficam livres e são reaproveitadas.
+    """
+
+    def __init__(self, dimensoes: int = DIMENSOES_INDICE):
+        self.dimensoes = dimensoes
+        self.trilhas = []       # id_trilha de cada linha (None se livre)
+        self.posicao = {}       # id_trilha -> linha
+        self._livres = []
+        self.matriz = np.zeros((0, dimensoes), dtype=np.float32)
+        self.areas = np.zeros(0, dtype=object)
+        self.modulos_total = np.zeros(0)
+        self.adaptados = np.zeros(0)
+        self.ativas = np.zeros(0, dtype=bool)
+        self.dados = {}         # id_trilha -> {'titulo', 'area_foco'} para a resposta
+        self._base = {}         # id_trilha -> vetor do texto e da área da trilha
+        self._modulos = {}      # id_modulo -> (id_trilha, vetor, adaptado)
+        self._modulos_da_trilha = {}
+
+    def __len__(self):
+        return len(self.posicao)
+
+    def vetorizar(self, termos: dict) -> np.ndarray:
+        """Espalha {termo: peso} nas colunas por hashing (crc32, igual em todos os processos) e normaliza."""
+        vetor = np.zeros(self.dimensoes, dtype=np.float32)
+        for termo, peso in termos.items():
+            vetor[zlib.crc32(termo.encode()) % self.dimensoes] += peso
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma > 0 else vetor
+
+    @staticmethod
+    def _contar(termos: dict, texto) -> None:
+        for palavra in tokenizar(texto):
+            if len(palavra) > 2:
+                termos[palavra] = termos.get(palavra, 0.0) + 1.0
+
+    def _linha_livre(self) -> int:
+        if self._livres:
+            return self._livres.pop()
+        linha = len(self.trilhas)
+        if linha == len(self.matriz):
+            capacidade = max(16, 2 * linha)
+            self.matriz = np.vstack([self.matriz, np.zeros((capacidade - linha, self.dimensoes), dtype=np.float32)])
+            self.areas = np.concatenate([self.areas, np.full(capacidade - linha, '', dtype=object)])
+            self.modulos_total = np.concatenate([self.modulos_total, np.zeros(capacidade - linha)])
+            self.adaptados = np.concatenate([self.adaptados, np.zeros(capacidade - linha)])
+            self.ativas = np.concatenate([self.ativas, np.zeros(capacidade - linha, dtype=bool)])
+        self.trilhas.append(None)
+        return linha
+
+    def definir_trilha(self, trilha: dict) -> None:
+        """Inclui ou atualiza uma trilha (id_trilha, titulo, descricao, area_foco)."""
+        id_trilha = trilha['id_trilha']
+        termos = {}
+        self._contar(termos, trilha['titulo'])
+        self._contar(termos, trilha['descricao'])
+        if trilha['area_foco']:
+            termos['area:' + _area(trilha['area_foco'])] = PESO_TERMO_AREA
+        self._base[id_trilha] = self.vetorizar(termos)
+        self.dados[id_trilha] = {'titulo': trilha['titulo'], 'area_foco': trilha['area_foco']}
+        linha = self.posicao.get(id_trilha)
+        if linha is None:
+            linha = self._linha_livre()
+            self.posicao[id_trilha] = linha
+            self.trilhas[linha] = id_trilha
+        self.areas[linha] = _area(trilha['area_foco'])
+        self._recalcular(id_trilha)
+
+    def remover_trilha(self, id_trilha) -> None:
+        linha = self.posicao.pop(id_trilha, None)
+        self._base.pop(id_trilha, None)
+        self.dados.pop(id_trilha, None)
+        if linha is None:
+            return
+        self.trilhas[linha] = None
+        self.ativas[linha] = False
+        self.matriz[linha] = 0
+        self._livres.append(linha)
+
+    def definir_modulo(self, modulo: dict, recalcular: bool = True) -> None:
+        """
+        Inclui ou atualiza um módulo (id_modulo, id_trilha, titulo, descricao, tipo, adaptacao_necessaria).
+        Sem 'recalcular', a linha da trilha só é refeita depois, por _recalcular (usado na montagem).
+        """
+        anterior = self._modulos.get(modulo['id_modulo'])
+        termos = {}
+        self._contar(termos, modulo['titulo'])
+        self._contar(termos, modulo['descricao'])
+        if modulo['tipo']:
+            termos['tipo:' + _area(modulo['tipo'])] = 1.0
+        self._modulos[modulo['id_modulo']] = (modulo['id_trilha'], self.vetorizar(termos),
+                                              precisa_adaptacao(modulo['adaptacao_necessaria']))
+        self._modulos_da_trilha.setdefault(modulo['id_trilha'], set()).add(modulo['id_modulo'])
+        if anterior is not None and anterior[0] != modulo['id_trilha']:
+            self._modulos_da_trilha[anterior[0]].discard(modulo['id_modulo'])
+            self._recalcular(anterior[0])
+        if recalcular:
+            self._recalcular(modulo['id_trilha'])
+
+    def remover_modulo(self, id_modulo) -> None:
+        anterior = self._modulos.pop(id_modulo, None)
+        if anterior is not None:
+            self._modulos_da_trilha[anterior[0]].discard(id_modulo)
+            self._recalcular(anterior[0])
+
+    def _recalcular(self, id_trilha) -> None:
+        """Refaz a linha da trilha: texto e área mais a média dos vetores dos módulos, normalizado."""
+        linha = self.posicao.get(id_trilha)
+        if linha is None:
+            return  # módulo de uma trilha que (ainda) não está no índice
+        modulos = [self._modulos[m] for m in self._modulos_da_trilha.get(id_trilha, ())]
+        vetor = self._base[id_trilha].copy()
+        if modulos:
+            vetor += PESO_MODULOS * np.mean([m[1] for m in modulos], axis=0)
+        norma = np.linalg.norm(vetor)
+        self.matriz[linha] = vetor / norma if norma > 0 else vetor
+        self.modulos_total[linha] = len(modulos)
+        self.adaptados[linha] = sum(m[2] for m in modulos) / len(modulos) if modulos else 0.0
+        self.ativas[linha] = True
+
+    def recomendar(self, concluidos, area=None, acessibilidade=None, k: int = TOP_K_AO_VIVO) -> list:
+        """
+        Pontua todas as trilhas para um usuário que concluiu os módulos 'concluidos' e retorna as k
+        melhores como [(id_trilha, pontuacao), ...]. Trilhas já concluídas não são sugeridas.
+        """
+        n = len(self.trilhas)
+        if not self.posicao or k <= 0:
+            return []
+        perfil = np.zeros(self.dimensoes, dtype=np.float32)
+        feitos = np.zeros(n)
+        for id_modulo in concluidos:
+            modulo = self._modulos.get(id_modulo)
+            if modulo is None:
+                continue
+            perfil += modulo[1]
+            linha = self.posicao.get(modulo[0])
+            if linha is not None:
+                feitos[linha] += 1
+        norma = np.linalg.norm(perfil)
+        conteudo = self.matriz[:n] @ (perfil / norma) if norma > 0 else np.zeros(n)
+
+        total = self.modulos_total[:n]
+        andamento = np.divide(feitos, total, out=np.zeros(n), where=total > 0)
+        pontuacao = (PESOS_AO_VIVO['conteudo'] * conteudo
+                     + PESOS_AO_VIVO['andamento'] * andamento
+                     + PESOS_AO_VIVO['area'] * (self.areas[:n] == _area(area)) * (area is not None)
+                     + PESOS_AO_VIVO['acessibilidade'] * precisa_adaptacao(acessibilidade) * self.adaptados[:n])
+        pontuacao[~self.ativas[:n] | (andamento >= 1.0)] = -np.inf
+
+        k = min(k, n)
+        melhores = np.argpartition(-pontuacao, k - 1)[:k]
+        melhores = melhores[np.argsort(-pontuacao[melhores], kind='stable')]
+        return [(self.trilhas[j], float(pontuacao[j])) for j in melhores if np.isfinite(pontuacao[j])]
+
+
+def montar_indice(trilhas, modulos) -> IndiceTrilhas:
+    """Monta o índice a partir das linhas de SQL_TRILHAS_INDICE e SQL_MODULOS_INDICE."""
+    indice = IndiceTrilhas()
+    for trilha in trilhas:
+        indice.definir_trilha(trilha)
+    for modulo in modulos:
+        indice.definir_modulo(modulo, recalcular=False)
+    for id_trilha in indice.posicao:
+        indice._recalcular(id_trilha)
+    return indice
+
+
+def aplicar_alteracoes(indice: IndiceTrilhas, trilhas, modulos) -> None:
+    """Relê do banco só as trilhas e os módulos alterados e os atualiza (ou remove) no índice."""
+    reler_alteradas(SQL_TRILHAS_INDICE, 'id_trilha', trilhas, indice.definir_trilha, indice.remover_trilha)
+    reler_alteradas(SQL_MODULOS_INDICE, 'id_modulo', modulos, indice.definir_modulo, indice.remover_modulo)
+
+
+_indice = IndiceIncremental(
+    ('trilhas', 'modulos'),
+    lambda: montar_indice(iterar_consulta(SQL_TRILHAS_INDICE), iterar_consulta(SQL_MODULOS_INDICE)),
+    aplicar_alteracoes, INDICE_TTL)
+
+
+def aquecer_indice() -> None:
+    """Monta o índice antes do primeiro pedido (chamado ao iniciar cada worker do gunicorn)."""
+    try:
+        with _indice.usar():
+            pass
+    except oracledb.Error as e:
+        print(f'\n Erro ao montar o índice de trilhas: {e}')
+
+
+def read_sugestoes_ao_vivo(id_usuario, k: int = TOP_K_AO_VIVO):
+    """
+    Calcula na hora as k trilhas recomendadas para o usuário, já considerando os módulos que ele acabou
+    de concluir. Retorna {'id_usuario', 'items': [{'posicao', 'id_trilha', 'titulo', 'area_foco',
+    'pontuacao'}, ...]}, ou None se o usuário não existir ou houver erro.
+    """
+    usuario = read_usuario_by_id(id_usuario)
+    if usuario is None:
+        return None
+    try:
+        concluidos = [linha['id_modulo'] for linha in iterar_consulta(SQL_CONCLUIDOS_USUARIO, {'id_usuario': id_usuario})]
+        with _indice.usar() as indice:
+            melhores = indice.recomendar(concluidos, usuario['area'], usuario['acessibilidade'], k)
+            itens = [{'posicao': posicao, 'id_trilha': id_trilha, 'titulo': indice.dados[id_trilha]['titulo'],
+                      'area_foco': indice.dados[id_trilha]['area_foco'], 'pontuacao': round(pontuacao, 4)}
+                     for posicao, (id_trilha, pontuacao) in enumerate(melhores, start=1)]
+    except oracledb.Error as e:
+        print(f'\n Erro ao calcular as sugestões ao vivo: {e}')
+        return None
+    return {'id_usuario': id_usuario, 'items': itens}
@@ -1,11 +1,91 @@
-from usuarios import main_usuario
-from trilhas import main_trilha
-from modulos import main_modulo
-from progressos import main_progresso
-from sugestoes import main_sugestao
-from previsoes import main_previsao
+import argparse
+import sys
+from usuarios import main_usuario, iterar_usuarios
+from trilhas import main_trilha, iterar_trilhas
+from modulos import main_modulo, iterar_modulos
+from progressos import main_progresso, iterar_progressos
+from sugestoes import main_sugestao, iterar_sugestoes
+from previsoes import main_previsao, iterar_previsoes
+from pontuacao import pontuar_previsoes
+from recomendacao import gerar_sugestoes, TOP_N_RECOMENDACAO
+from exportacao import exportar_incremental, exportar_em_paralelo, DIRETORIO_EXPORTACAO, FORMATOS_EXPORTACAO
+from cache import invalidar
 from utilitarios import validar_inteiro
 
+TABELAS_EXPORTACAO = (
+    ('usuarios', iterar_usuarios),
+    ('trilhas', iterar_trilhas),
+    ('modulos', iterar_modulos),
+    ('progressos', iterar_progressos),
+    ('sugestoes', iterar_sugestoes),
+    ('previsoes', iterar_previsoes),
+)
+
+# Tabelas com timestamp que permitem exportação incremental: (nome, gerador, coluna da marca d'água)
+TABELAS_INCREMENTAIS = (
+    ('progressos', iterar_progressos, 'data_conclusao'),
+    ('sugestoes', iterar_sugestoes, 'data_sugestao'),
+    ('previsoes', iterar_previsoes, 'data_previsao'),
+)
+
+# Namespaces do barramento de versões que 'invalidate' pode publicar (caches, ETags, índices e ranking)
+NAMESPACES_INVALIDACAO = ('usuarios', 'trilhas', 'modulos', 'sugestoes', 'ranking')
+
+def exportacao_incremental():
+    """Exporta os registros novos de cada tabela com timestamp desde a última execução."""
+    print('\n*** Exportação incremental ***')
+    for tabela, iterar, coluna_data in TABELAS_INCREMENTAIS:
+        manifesto = exportar_incremental(tabela, iterar, coluna_data)
+        if manifesto is None:
+            print(f' {tabela}: falha na exportação.')
+        elif manifesto['registros'] == 0:
+            print(f' {tabela}: nenhum registro novo.')
+        else:
+            print(f" {tabela}: {manifesto['registros']} registros em {manifesto['arquivo']} (até {manifesto['marca_nova']}).")
+
+def exportacao_completa(diretorio=DIRETORIO_EXPORTACAO, formato='ndjson', compactar=False, trabalhadores=4):
+    """Exporta as seis tabelas em paralelo, no mesmo SCN, e mostra tempo, linhas e vazão de cada uma."""
+    print(f'\n*** Exportando todas as tabelas ({trabalhadores} workers) ***')
+    resultado = exportar_em_paralelo(TABELAS_EXPORTACAO, diretorio, formato, compactar, trabalhadores)
+    if resultado is None:
+        print(' Falha na exportação.')
+        return False
+    scn, tabelas = resultado
+    print(f' Retrato consistente no SCN {scn}:')
+    sucesso = True
+    for r in sorted(tabelas, key=lambda r: r['tabela']):
+        if 'erro' in r:
+            sucesso = False
+            print(f" {r['tabela']:<11} ERRO: {r['erro']}")
+        else:
+            vazao = r['registros'] / r['segundos'] if r['segundos'] else 0
+            print(f" {r['tabela']:<11} {r['registros']:>10} linhas {r['segundos']:>8.2f}s {vazao:>12.0f} linhas/s  {r['arquivo'] or '-'}")
+    return sucesso
+
+def recalcular_previsoes(incremental=False):
+    """Recalcula taxa_sucesso e categoria dos usuários (todos ou só os com progresso novo) e mostra o resumo."""
+    print(f"\n*** Recalculando previsões ({'incremental' if incremental else 'completo'}) ***")
+    resultado = pontuar_previsoes(incremental)
+    if resultado is None:
+        print(' Falha ao recalcular as previsões.')
+        return False
+    print(f" {resultado['usuarios']} usuários calculados, {resultado['gravados']} previsões gravadas em {resultado['segundos']:.2f}s.")
+    for erro in resultado['erros'][:10]:
+        print(f" Linha {erro['indice']}: {erro['erro']}")
+    return not resultado['erros']
+
+def recalcular_sugestoes(incremental=False, n=TOP_N_RECOMENDACAO):
+    """Gera as n trilhas sugeridas para cada usuário (todos ou só os com progresso novo) e mostra o resumo."""
+    print(f"\n*** Gerando sugestões ({'incremental' if incremental else 'completo'}) ***")
+    resultado = gerar_sugestoes(incremental, n)
+    if resultado is None:
+        print(' Falha ao gerar as sugestões.')
+        return False
+    print(f" {resultado['usuarios']} usuários processados, {resultado['gravados']} sugestões gravadas em {resultado['segundos']:.2f}s.")
+    for erro in resultado['erros'][:10]:
+        print(f" Linha {erro['indice']}: {erro['erro']}")
+    return not resultado['erros']
+
 def exibir_menu():
     """Exibe as opções do menu principal."""
     print("\n" + "="*40)
@@ -17,6 +97,10 @@ def exibir_menu():
     print("4.  Gerenciar Progressos.")
     print("5.  Gerenciar Sugestoes.")
     print("6.  Gerenciar Previsoes.")
+    print("7.  Exportação incremental (Progressos, Sugestoes, Previsoes).")
+    print("8.  Exportar todas as tabelas (em paralelo).")
+    print("9.  Recalcular previsões (incremental).")
+    print("10. Gerar sugestões de trilhas (incremental).")
     print("0. Sair: Encerra o Sistema.")
     print("="*40)
 
@@ -24,7 +108,7 @@ def main():
     while True:
         exibir_menu()
         
-        opcao = validar_inteiro("Escolha uma opção de 0 a 6: ")
+        opcao = validar_inteiro("Escolha uma opção de 0 a 10: ")
 
         if opcao == 1:
             main_usuario()
@@ -38,12 +122,52 @@ def main():
             main_sugestao()
         elif opcao == 6:
             main_previsao()
+        elif opcao == 7:
+            exportacao_incremental()
+        elif opcao == 8:
+            exportacao_completa()
+        elif opcao == 9:
+            recalcular_previsoes(incremental=True)
+        elif opcao == 10:
+            recalcular_sugestoes(incremental=True)
         elif opcao == 0:
             print("\nEncerrando o sistema... até logo!")
             break
         else:
-            print("\nOpção inválida. Tente novamente com um número inteiro entre 0 e 6.")
+            print("\nOpção inválida. Tente novamente com um número inteiro entre 0 e 10.")
+
+
+def executar_comando(argumentos):
+    """Executa os comandos não interativos, ex.: python main.py export-all --formato ndjson --gzip"""
+    parser = argparse.ArgumentParser(prog='main.py')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    exportar = subcomandos.add_parser('export-all', help='Exporta as seis tabelas em paralelo, no mesmo SCN.')
+    exportar.add_argument('--diretorio', default=DIRETORIO_EXPORTACAO)
+    exportar.add_argument('--formato', choices=FORMATOS_EXPORTACAO, default='ndjson')
+    exportar.add_argument('--gzip', action='store_true', help='Compacta os arquivos com gzip.')
+    exportar.add_argument('--workers', type=int, default=4)
+    pontuar = subcomandos.add_parser('score-previsoes', help='Recalcula taxa_sucesso e categoria dos usuários.')
+    pontuar.add_argument('--incremental', action='store_true', help='Só os usuários com progresso desde a última execução.')
+    recomendar = subcomandos.add_parser('recommend', help='Gera as trilhas sugeridas para cada usuário em LM_SUGESTOES.')
+    recomendar.add_argument('--incremental', action='store_true', help='Só os usuários com progresso desde a última execução.')
+    recomendar.add_argument('--top', type=int, default=TOP_N_RECOMENDACAO, help='Sugestões por usuário.')
+    invalidacao = subcomandos.add_parser('invalidate', help='Publica a invalidação das tabelas alteradas direto no banco.')
+    invalidacao.add_argument('namespaces', nargs='+', choices=NAMESPACES_INVALIDACAO)
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'export-all':
+        return 0 if exportacao_completa(args.diretorio, args.formato, args.gzip, args.workers) else 1
+    if args.comando == 'score-previsoes':
+        return 0 if recalcular_previsoes(args.incremental) else 1
+    if args.comando == 'recommend':
+        return 0 if recalcular_sugestoes(args.incremental, args.top) else 1
+    if args.comando == 'invalidate':
+        for namespace in args.namespaces:
+            invalidar(namespace)
+        return 0
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(executar_comando(sys.argv[1:]))
     main()
\ No newline at end of file
@@ -1,99 +1,207 @@
 import oracledb
-import json
-from utilitarios import getConnection, validar_string, validar_inteiro, validar_id
+from cache import CacheTTL, invalidar
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_string, validar_inteiro, validar_id
+
+COLUNAS_MODULO = ('id_modulo', 'id_trilha', 'titulo', 'descricao', 'tipo', 'conteudo', 'xp_recompensa', 'adaptacao_necessaria')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_MODULO = {'id_trilha': 'texto', 'tipo': 'texto', 'adaptacao_necessaria': 'texto', 'xp_recompensa': 'numero'}
+
+# Linhas que dependem do módulo, excluídas antes dele com cascade
+DEPENDENTES_MODULO = (
+    ('progressos', "DELETE FROM LM_PROGRESSOS WHERE id_modulo = :1"),
+)
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_modulos = Repositorio('LM_MODULOS', COLUNAS_MODULO, 'titulo', FILTROS_MODULO, DEPENDENTES_MODULO)
+
+# Cache da listagem completa (catálogo muda pouco e é lido o tempo todo)
+cache_modulos = CacheTTL('modulos', namespace='modulos')
+cache_modulos_por_id = CacheTTL('modulos_por_id', namespace='modulos')
 
 def create_modulo(id_modulo, id_trilha, titulo, descricao, tipo, conteudo, xp_recompensa, adaptacao_necessaria):
     """Insere um novo modulo no banco e retorna True em caso de sucesso."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_MODULOS (id_modulo, id_trilha, titulo, descricao, tipo, conteudo, xp_recompensa, adaptacao_necessaria)
-                    VALUES (:id_modulo, :id_trilha, :titulo, :descricao, :tipo, :conteudo, :xp_recompensa, :adaptacao_necessaria)
-                """
-                cursor.execute(sql, {
-                    'id_modulo': id_modulo, 'id_trilha': id_trilha, 'titulo': titulo, 'descricao': descricao, 'tipo': tipo,
-                    'conteudo': conteudo, 'xp_recompensa': xp_recompensa, 'adaptacao_necessaria': adaptacao_necessaria
-                })
-                conn.commit()
-                return True
+        repositorio_modulos.inserir(dict(zip(COLUNAS_MODULO, (id_modulo, id_trilha, titulo, descricao, tipo, conteudo, xp_recompensa, adaptacao_necessaria))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Modulo: {e}')
         return False
+    invalidar('modulos', [id_modulo])
+    return True
+
+def create_modulo_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere vários modulos (dicionários com as mesmas chaves de create_modulo) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_modulos.inserir_lote(registros, tamanho_lote)
+        if resultado['inseridos']:
+            rejeitados = {erro['indice'] for erro in resultado['erros']}
+            invalidar('modulos', [r['id_modulo'] for i, r in enumerate(registros) if i not in rejeitados])
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Modulos em lote: {e}')
+        return None
+
+def upsert_modulo_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza vários modulos (dicionários com as mesmas chaves de create_modulo) com MERGE em lotes,
+    sem regravar os que chegaram iguais aos do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_modulos.sincronizar_lote(registros, tamanho_lote)
+        if resultado['chaves_gravadas']:
+            invalidar('modulos', resultado['chaves_gravadas'])
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Modulos em lote: {e}')
+        return None
+
+def _read_modulo_banco():
+    """Lê direto do banco e retorna uma lista de todos os modulos."""
+    try:
+        return repositorio_modulos.listar()
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Modulos: {e}')
+        return None
+
+def read_modulo(filtros=None, campos=None):
+    """
+    Lê e retorna uma lista de todos os modulos, passando pelo cache do catálogo.
+    Com 'filtros' ou 'campos' (ver read_modulo_pagina) a consulta é feita no banco, sem cache.
+    """
+    if filtros or campos:
+        try:
+            return repositorio_modulos.listar(filtros, campos)
+        except oracledb.Error as e:
+            print(f'\n Erro ao ler Modulos: {e}')
+            return None
+    return cache_modulos.obter('todos', _read_modulo_banco)
+
+def _read_modulo_by_id_banco(id_modulo):
+    """Lê o modulo pelo id direto do banco."""
+    try:
+        return repositorio_modulos.por_id(id_modulo)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Modulo {id_modulo}: {e}')
+        return None
 
-def read_modulo():
-    """Lê e retorna uma lista de todos os modulos do banco."""
+def read_modulo_by_id(id_modulo):
+    """Lê o modulo pelo id (passando pelo cache) e retorna um dicionário, ou None se não existir ou houver erro."""
+    return cache_modulos_por_id.obter(id_modulo, lambda: _read_modulo_by_id_banco(id_modulo))
+
+def read_modulo_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página dos modulos ordenada por titulo e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_MODULO e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_modulos.pagina(limite, cursor, filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Modulos: {e}')
+        return None
+
+def read_modulo_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê os módulos (mesma ordem, filtros e campos de read_modulo) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "SELECT id_modulo, id_trilha, titulo, descricao, tipo, conteudo, xp_recompensa, adaptacao_necessaria FROM LM_MODULOS ORDER BY titulo"
-                cursor.execute(sql)
-                modulos = []
-                for row in cursor.fetchall():
-                    modulos.append({
-                        'id_modulo': row[0], 'id_trilha': row[1], 'titulo': row[2], 'descricao': row[3], 'tipo': row[4],
-                        'conteudo': row[5], 'xp_recompensa': row[6], 'adaptacao_necessaria': row[7]
-                    })
-                return modulos
+        return repositorio_modulos.listar_colunas(filtros, campos, tamanho_lote)
     except oracledb.Error as e:
         print(f'\n Erro ao ler Modulos: {e}')
         return None
 
+def iterar_modulos(tamanho_lote=TAMANHO_BUSCA_PADRAO, scn=None, filtros=None, campos=None):
+    """
+    Percorre os modulos (mesma ordem de read_modulo) sem carregar a tabela inteira na memória.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_modulo_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_modulos.iterar(tamanho_lote, scn, filtros, campos)
+
 def update_modulo(id_modulo, novo_id_trilha, novo_titulo, nova_descricao, novo_tipo, novo_conteudo, nova_xp_recompensa, nova_adaptacao_necessaria):
     """Atualiza um modulo e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_MODULOS
-                    SET id_trilha = :novo_id_trilha, titulo = :novo_titulo, descricao = :nova_descricao, tipo = :novo_tipo,
-                        conteudo = :novo_conteudo, xp_recompensa = :nova_xp_recompensa, adaptacao_necessaria = :nova_adaptacao_necessaria
-                    WHERE id_modulo = :id_modulo
-                """
-                cursor.execute(sql, {
-                    'novo_id_trilha': novo_id_trilha, 'novo_titulo': novo_titulo, 'nova_descricao': nova_descricao,
-                    'novo_tipo': novo_tipo, 'novo_conteudo': novo_conteudo, 'nova_xp_recompensa': nova_xp_recompensa,
-                    'nova_adaptacao_necessaria': nova_adaptacao_necessaria, 'id_modulo': id_modulo
-                })
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_modulos.atualizar(id_modulo, dict(zip(COLUNAS_MODULO[1:], (novo_id_trilha, novo_titulo, nova_descricao, novo_tipo, novo_conteudo, nova_xp_recompensa, nova_adaptacao_necessaria))))
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Modulo: {e}')
+        return False
+    if atualizados:
+        invalidar('modulos', [id_modulo])
+    return atualizados > 0
+
+def patch_modulo(id_modulo, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) do módulo e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_modulos.atualizar_campos(id_modulo, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Modulo: {e}')
         return False
+    if atualizados:
+        invalidar('modulos', [id_modulo])
+    return atualizados > 0
 
 def delete_modulo(id_modulo):
     """Exclui um modulo e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_MODULOS WHERE id_modulo = :id_modulo"
-                cursor.execute(sql, {'id_modulo': id_modulo})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_modulos.excluir(id_modulo)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Modulo: {e}')
         return False
+    if excluidos:
+        invalidar('modulos', [id_modulo])
+    return excluidos > 0
 
-def exportar_modulos_json():
-    """Exporta os modulos para um arquivo JSON e retorna True em caso de sucesso."""
-    print('\n Exportando dados dos modulos para JSON...')
-    modulos = read_modulo()
-    if modulos is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not modulos:
-        print(" Nenhum modulo cadastrado para exportar.")
-        return True
+def delete_modulo_many(ids, cascade=False, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui vários módulos em uma única transação. Com 'cascade', exclui antes os progressos deles;
+    sem, a exclusão falha inteira se algum módulo ainda tiver progressos.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_modulos.excluir_lote(ids, cascade, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Modulos em lote: {e}')
+        return None
+    if resultado['excluidos']:
+        invalidar('modulos', resultado['chaves_excluidas'])
+    if resultado['dependentes'].get('progressos'):
+        invalidar('ranking')
+    return resultado
 
+def exportar_modulos_json(caminho='modulos.json', formato='indentado', compactar=False):
+    """
+    Exporta os modulos para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
+    print('\n Exportando dados dos modulos para JSON...')
     try:
-        with open('modulos.json', 'w', encoding='utf-8') as f:
-            json.dump(modulos, f, ensure_ascii=False, indent=4)
-        print(' Dados exportados com sucesso para modulos.json.')
-        return True
-    except IOError as e:
+        quantidade, destino = exportar_registros(iterar_modulos(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhum modulo cadastrado para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_modulo():
     while True:
         print('\n**Menu - Modulo**')
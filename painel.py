@@ -0,0 +1,72 @@
+import oracledb
+from utilitarios import getConnection
+
+# Quantidade padrão de itens recentes devolvidos em cada seção do painel
+LIMITE_PAINEL = 10
+
+# Colunas do usuário devolvidas no painel (a senha nunca sai do banco)
+SQL_USUARIO = """
+    SELECT id_usuario, nome, username, area, acessibilidade, modulos_concluidos, xp_total, data_cadastro
+    FROM LM_USUARIOS WHERE id_usuario = :id_usuario"""
+
+SQL_MODULOS_CONCLUIDOS = """
+    SELECT p.id_modulo, m.titulo, m.id_trilha, m.xp_recompensa, p.data_conclusao
+    FROM LM_PROGRESSOS p JOIN LM_MODULOS m ON m.id_modulo = p.id_modulo
+    WHERE p.id_usuario = :id_usuario
+    ORDER BY p.data_conclusao DESC FETCH FIRST :limite ROWS ONLY"""
+
+# Um módulo concluído mais de uma vez conta uma só vez, tanto nos módulos quanto no XP da trilha
+SQL_XP_POR_TRILHA = """
+    SELECT m.id_trilha, t.titulo, COUNT(DISTINCT m.id_modulo) AS modulos_concluidos, SUM(m.xp_recompensa) AS xp,
+           (SELECT COUNT(*) FROM LM_MODULOS mt WHERE mt.id_trilha = m.id_trilha) AS modulos_total
+    FROM (SELECT DISTINCT id_modulo FROM LM_PROGRESSOS WHERE id_usuario = :id_usuario) p
+    JOIN LM_MODULOS m ON m.id_modulo = p.id_modulo
+    LEFT JOIN LM_TRILHAS t ON t.id_trilha = m.id_trilha
+    GROUP BY m.id_trilha, t.titulo
+    ORDER BY xp DESC"""
+
+SQL_SUGESTOES = """
+    SELECT s.id_sugestao, s.id_trilha, t.titulo, t.area_foco, s.data_sugestao
+    FROM LM_SUGESTOES s LEFT JOIN LM_TRILHAS t ON t.id_trilha = s.id_trilha
+    WHERE s.id_usuario = :id_usuario
+    ORDER BY s.data_sugestao DESC FETCH FIRST :limite ROWS ONLY"""
+
+SQL_PREVISAO = """
+    SELECT id_previsao, taxa_sucesso, categoria, data_previsao
+    FROM LM_PREVISOES WHERE id_usuario = :id_usuario
+    ORDER BY data_previsao DESC FETCH FIRST 1 ROWS ONLY"""
+
+
+def _consultar(cursor, sql: str, params: dict) -> list:
+    """Executa 'sql' no cursor informado e retorna as linhas como dicionários."""
+    cursor.execute(sql, params)
+    nomes = [col[0].lower() for col in cursor.description]
+    return [dict(zip(nomes, linha)) for linha in cursor.fetchall()]
+
+
+def read_painel_usuario(id_usuario, limite: int = LIMITE_PAINEL):
+    """
+    Monta o painel do usuário: os dados dele, os últimos módulos concluídos, o XP e o progresso por
+    trilha, as últimas sugestões e a previsão mais recente. Todas as consultas filtram pelo usuário,
+    fazem os joins e agregações no banco e usam uma única conexão do pool, então o documento tem
+    poucos KB independentemente do tamanho das tabelas.
+    Retorna um dicionário, ou None se o usuário não existir ou houver erro.
+    """
+    try:
+        with getConnection() as conn:
+            with conn.cursor() as cursor:
+                usuario = _consultar(cursor, SQL_USUARIO, {'id_usuario': id_usuario})
+                if not usuario:
+                    return None
+                params = {'id_usuario': id_usuario, 'limite': limite}
+                previsao = _consultar(cursor, SQL_PREVISAO, {'id_usuario': id_usuario})
+                return {
+                    'usuario': usuario[0],
+                    'modulos_concluidos': _consultar(cursor, SQL_MODULOS_CONCLUIDOS, params),
+                    'xp_por_trilha': _consultar(cursor, SQL_XP_POR_TRILHA, {'id_usuario': id_usuario}),
+                    'sugestoes': _consultar(cursor, SQL_SUGESTOES, params),
+                    'previsao': previsao[0] if previsao else None,
+                }
+    except oracledb.Error as e:
+        print(f'\n Erro ao montar o painel do usuario {id_usuario}: {e}')
+        return None
@@ -0,0 +1,163 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+import oracledb
+from exportacao import DIRETORIO_EXPORTACAO, MARGEM_INCREMENTAL, gravar_json_atomico, ler_marcas
+from previsoes import COLUNAS_PREVISAO
+from utilitarios import iterar_consulta, mesclar_em_lote, TAMANHO_LOTE_PADRAO
+
+# Marca d'água da pontuação incremental: maior data_conclusao já considerada
+ARQUIVO_MARCAS_PONTUACAO = os.getenv('LEME_MARCAS_PONTUACAO', os.path.join(DIRETORIO_EXPORTACAO, 'pontuacao.json'))
+
+# Pesos do modelo logístico de taxa_sucesso. São heurísticos: o XP conta relativo à área do
+# usuário (z-score), a velocidade é em módulos por semana e a inatividade em dias (limitada).
+PESOS_PONTUACAO = {
+    'intercepto': -1.0,
+    'log_concluidos': 0.8,
+    'velocidade': 0.6,
+    'xp_area': 0.5,
+    'inatividade': -0.05,
+}
+VELOCIDADE_MAXIMA = 5.0   # módulos/semana considerados no máximo
+INATIVIDADE_MAXIMA = 60.0  # dias
+# Limites inferiores de taxa_sucesso de cada categoria, da maior para a menor
+CATEGORIAS = (('alta', 0.7), ('media', 0.4), ('baixa', 0.0))
+
+# Um usuário por linha com os agregados do seu progresso; com :desde, só os que concluíram módulos depois dela
+SQL_ATRIBUTOS = """
+    SELECT u.id_usuario, u.area, u.xp_total, u.data_cadastro,
+           COUNT(p.id_progresso) AS concluidos, MIN(p.data_conclusao) AS primeira, MAX(p.data_conclusao) AS ultima
+    FROM LM_USUARIOS u LEFT JOIN LM_PROGRESSOS p ON p.id_usuario = u.id_usuario
+    {filtro}
+    GROUP BY u.id_usuario, u.area, u.xp_total, u.data_cadastro"""
+FILTRO_INCREMENTAL = "WHERE u.id_usuario IN (SELECT id_usuario FROM LM_PROGRESSOS WHERE data_conclusao > :desde)"
+
+# Média e desvio do XP por área, sempre sobre todos os usuários (também no modo incremental)
+SQL_AREAS = """
+    SELECT area, AVG(NVL(xp_total, 0)) AS media, AVG(NVL(xp_total, 0) * NVL(xp_total, 0)) AS media_quadrados
+    FROM LM_USUARIOS GROUP BY area"""
+
+
+def id_previsao_calculada(id_usuario) -> str:
+    """Id fixo da previsão calculada de cada usuário, para que o MERGE atualize sempre a mesma linha."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'leme:previsao:{id_usuario}'))
+
+
+def _dias(agora: datetime, data) -> float:
+    return (agora - data).total_seconds() / 86400 if data is not None else np.nan
+
+
+def carregar_atributos(agora: datetime, desde: datetime = None) -> dict:
+    """
+    Lê os agregados por usuário (todos, ou só os com progresso depois de 'desde') e os converte em
+    vetores NumPy alinhados: ids, area, xp, concluidos e as idades em dias do cadastro e do primeiro
+    e último módulo concluído (NaN se não houver), além de 'ultima' (maior data_conclusao lida).
+    """
+    sql = SQL_ATRIBUTOS.format(filtro=FILTRO_INCREMENTAL if desde is not None else '')
+    ids, areas, xp, concluidos, dias_cadastro, dias_primeira, dias_ultima = [], [], [], [], [], [], []
+    ultima = None
+    for linha in iterar_consulta(sql, {'desde': desde} if desde is not None else None):
+        ids.append(linha['id_usuario'])
+        areas.append(linha['area'])
+        xp.append(linha['xp_total'] or 0)
+        concluidos.append(linha['concluidos'])
+        dias_cadastro.append(_dias(agora, linha['data_cadastro']))
+        dias_primeira.append(_dias(agora, linha['primeira']))
+        dias_ultima.append(_dias(agora, linha['ultima']))
+        if linha['ultima'] is not None and (ultima is None or linha['ultima'] > ultima):
+            ultima = linha['ultima']
+    return {
+        'ids': ids,
+        'area': np.array(areas, dtype=object),
+        'xp': np.array(xp, dtype=float),
+        'concluidos': np.array(concluidos, dtype=float),
+        'dias_cadastro': np.array(dias_cadastro, dtype=float),
+        'dias_primeira': np.array(dias_primeira, dtype=float),
+        'dias_ultima': np.array(dias_ultima, dtype=float),
+        'ultima': ultima,
+    }
+
+
+def carregar_areas() -> dict:
+    """Retorna {area: (media, desvio)} do XP dos usuários."""
+    areas = {}
+    for linha in iterar_consulta(SQL_AREAS):
+        media = float(linha['media'] or 0)
+        variancia = float(linha['media_quadrados'] or 0) - media * media
+        areas[linha['area']] = (media, float(np.sqrt(max(variancia, 0.0))))
+    return areas
+
+
+def calcular_pontuacao(atributos: dict, areas: dict):
+    """
+    Calcula taxa_sucesso (0 a 1) e categoria de todos os usuários de 'atributos' de uma vez,
+    com operações vetorizadas. Retorna (taxas, categorias) alinhados com atributos['ids'].
+    """
+    concluidos = atributos['concluidos']
+    # Semanas desde o primeiro módulo (ou desde o cadastro), no mínimo uma
+    inicio = np.where(np.isnan(atributos['dias_primeira']), atributos['dias_cadastro'], atributos['dias_primeira'])
+    semanas = np.maximum(np.nan_to_num(inicio, nan=0.0) / 7, 1.0)
+    velocidade = np.minimum(concluidos / semanas, VELOCIDADE_MAXIMA)
+
+    # XP relativo à área: (xp - média da área) / desvio da área
+    distintas, posicoes = np.unique(atributos['area'].astype(str), return_inverse=True)
+    por_area = {str(area): valores for area, valores in areas.items()}
+    estatisticas = np.array([por_area.get(area, (0.0, 0.0)) for area in distintas], dtype=float).reshape(-1, 2)[posicoes]
+    desvio = np.where(estatisticas[:, 1] > 0, estatisticas[:, 1], 1.0)
+    xp_area = np.clip((atributos['xp'] - estatisticas[:, 0]) / desvio, -3, 3)
+
+    inativo = np.where(np.isnan(atributos['dias_ultima']), atributos['dias_cadastro'], atributos['dias_ultima'])
+    inatividade = np.clip(np.nan_to_num(inativo, nan=INATIVIDADE_MAXIMA), 0, INATIVIDADE_MAXIMA)
+
+    logito = (PESOS_PONTUACAO['intercepto']
+              + PESOS_PONTUACAO['log_concluidos'] * np.log1p(concluidos)
+              + PESOS_PONTUACAO['velocidade'] * velocidade
+              + PESOS_PONTUACAO['xp_area'] * xp_area
+              + PESOS_PONTUACAO['inatividade'] * inatividade)
+    taxas = np.round(1 / (1 + np.exp(-logito)), 4)
+
+    nomes = np.array([nome for nome, _ in CATEGORIAS], dtype=object)
+    limites = np.array([limite for _, limite in CATEGORIAS])
+    categorias = nomes[np.argmax(taxas[:, None] >= limites[None, :], axis=1)]
+    return taxas, categorias
+
+
+def pontuar_previsoes(incremental: bool = False, tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+                      arquivo_marcas: str = ARQUIVO_MARCAS_PONTUACAO):
+    """
+    Recalcula a previsão (taxa_sucesso e categoria) dos usuários e grava com MERGE em LM_PREVISOES,
+    uma linha por usuário com id fixo (id_previsao_calculada). Com 'incremental', só os usuários que
+    concluíram módulos depois da última execução, relendo MARGEM_INCREMENTAL segundos antes da marca para
+    pegar progressos gravados com atraso (recalcular um usuário de novo só reescreve a mesma linha); a
+    marca d'água só avança se a gravação não teve erros.
+    Retorna {'usuarios', 'gravados', 'erros', 'segundos'}, ou None em caso de erro.
+    """
+    inicio = time.perf_counter()
+    agora = datetime.now()
+    try:
+        marcas = ler_marcas(arquivo_marcas)
+        desde = datetime.fromisoformat(marcas['previsoes']) if incremental and marcas.get('previsoes') else None
+        if incremental and desde is None:
+            print(' Nenhuma execução anterior: calculando todos os usuários.')
+        atributos = carregar_atributos(agora, desde - timedelta(seconds=MARGEM_INCREMENTAL) if desde else None)
+        if not atributos['ids']:
+            return {'usuarios': 0, 'gravados': 0, 'erros': [], 'segundos': time.perf_counter() - inicio}
+        taxas, categorias = calcular_pontuacao(atributos, carregar_areas())
+
+        registros = [{'id_previsao': id_previsao_calculada(id_usuario), 'id_usuario': id_usuario,
+                      'taxa_sucesso': float(taxa), 'categoria': categoria, 'data_previsao': agora}
+                     for id_usuario, taxa, categoria in zip(atributos['ids'], taxas, categorias)]
+        resultado = mesclar_em_lote('LM_PREVISOES', COLUNAS_PREVISAO, ('id_previsao',), registros, tamanho_lote)
+        if not resultado['erros'] and atributos['ultima'] is not None:
+            marcas['previsoes'] = max(atributos['ultima'], desde or atributos['ultima']).isoformat()
+            gravar_json_atomico(arquivo_marcas, marcas)
+    except oracledb.Error as e:
+        print(f'\n Erro ao calcular as previsões: {e}')
+        return None
+    except (IOError, ValueError) as e:
+        print(f'\n Erro ao gravar a marca da pontuação: {e}')
+        return None
+    return {'usuarios': len(registros), 'gravados': resultado['gravados'], 'erros': resultado['erros'],
+            'segundos': time.perf_counter() - inicio}
@@ -1,88 +1,165 @@
 import oracledb
-import json
-from utilitarios import getConnection, validar_string, validar_id, validar_data, validar_float, converter_hora, validar_inteiro
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_string, validar_id, validar_data, validar_float, converter_hora, validar_inteiro
+
+COLUNAS_PREVISAO = ('id_previsao', 'id_usuario', 'taxa_sucesso', 'categoria', 'data_previsao')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_PREVISAO = {'id_usuario': 'texto', 'categoria': 'texto', 'taxa_sucesso': 'numero', 'data_previsao': 'data'}
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_previsoes = Repositorio('LM_PREVISOES', COLUNAS_PREVISAO, 'data_previsao', FILTROS_PREVISAO)
 
 def create_previsao(id_previsao, id_usuario, taxa_sucesso, categoria, data_previsao):
     """Insere uma nova previsão no banco e retorna True em caso de sucesso."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_PREVISOES (id_previsao, id_usuario, taxa_sucesso, categoria, data_previsao)
-                    VALUES (:id_previsao, :id_usuario, :taxa_sucesso, :categoria, :data_previsao)
-                """
-                cursor.execute(sql, {'id_previsao': id_previsao, 'id_usuario': id_usuario, 'taxa_sucesso': taxa_sucesso, 'categoria': categoria, 'data_previsao': data_previsao})
-                conn.commit()
-                return True
+        repositorio_previsoes.inserir(dict(zip(COLUNAS_PREVISAO, (id_previsao, id_usuario, taxa_sucesso, categoria, data_previsao))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Previsão: {e}')
         return False
+    return True
+
+def create_previsao_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere várias previsões (dicionários com as mesmas chaves de create_previsao) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    try:
+        return repositorio_previsoes.inserir_lote(registros, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Previsões em lote: {e}')
+        return None
+
+def upsert_previsao_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza várias previsões (dicionários com as mesmas chaves de create_previsao) com MERGE em lotes,
+    sem regravar as que chegaram iguais às do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_previsoes.sincronizar_lote(registros, tamanho_lote)
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Previsões em lote: {e}')
+        return None
+
+def read_previsao(filtros=None, campos=None):
+    """
+    Lê e retorna uma lista de todas as previsões do banco.
+    Com 'filtros' ou 'campos' (ver read_previsao_pagina) a lista é filtrada e projetada no banco.
+    """
+    try:
+        return repositorio_previsoes.listar(filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Previsões: {e}')
+        return None
+
+def read_previsao_by_id(id_previsao):
+    """Lê a previsão pelo id e retorna um dicionário, ou None se não existir ou houver erro."""
+    try:
+        return repositorio_previsoes.por_id(id_previsao)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Previsão {id_previsao}: {e}')
+        return None
+
+def read_previsao_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página das previsões ordenada por data da previsão e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_PREVISAO e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_previsoes.pagina(limite, cursor, filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Previsões: {e}')
+        return None
 
-def read_previsao():
-    """Lê e retorna uma lista de todas as previsões do banco."""
+def read_previsao_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê as previsões (mesma ordem, filtros e campos de read_previsao) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "SELECT id_previsao, id_usuario, taxa_sucesso, categoria, data_previsao FROM LM_PREVISOES ORDER BY data_previsao"
-                cursor.execute(sql)
-                previsoes = []
-                for row in cursor.fetchall():
-                    previsoes.append({'id_previsao': row[0], 'id_usuario': row[1], 'taxa_sucesso': row[2], 'categoria': row[3], 'data_previsao': row[4]})
-                return previsoes
+        return repositorio_previsoes.listar_colunas(filtros, campos, tamanho_lote)
     except oracledb.Error as e:
         print(f'\n Erro ao ler Previsões: {e}')
         return None
 
+def iterar_previsoes(tamanho_lote=TAMANHO_BUSCA_PADRAO, desde=None, scn=None, filtros=None, campos=None):
+    """
+    Percorre as previsões (mesma ordem de read_previsao) sem carregar a tabela inteira na memória.
+    Com 'desde', traz apenas os registros com data_previsao posterior a essa data.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_previsao_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_previsoes.iterar(tamanho_lote, scn, filtros, campos, desde)
+
 def update_previsao(id_previsao, novo_id_usuario, nova_taxa_sucesso, nova_categoria, nova_data_previsao):
     """Atualiza uma previsão e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_PREVISOES
-                    SET id_usuario = :novo_id_usuario, taxa_sucesso = :nova_taxa_sucesso, categoria = :nova_categoria, data_previsao = :nova_data_previsao
-                    WHERE id_previsao = :id_previsao
-                """
-                cursor.execute(sql, {'novo_id_usuario': novo_id_usuario, 'nova_taxa_sucesso': nova_taxa_sucesso, 'nova_categoria': nova_categoria, 'nova_data_previsao': nova_data_previsao, 'id_previsao': id_previsao})
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_previsoes.atualizar(id_previsao, dict(zip(COLUNAS_PREVISAO[1:], (novo_id_usuario, nova_taxa_sucesso, nova_categoria, nova_data_previsao))))
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Previsão: {e}')
         return False
+    return atualizados > 0
+
+def patch_previsao(id_previsao, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) da previsão e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_previsoes.atualizar_campos(id_previsao, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Previsão: {e}')
+        return False
+    return atualizados > 0
 
 def delete_previsao(id_previsao):
     """Exclui uma previsão e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_PREVISOES WHERE id_previsao = :id_previsao"
-                cursor.execute(sql, {'id_previsao': id_previsao})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_previsoes.excluir(id_previsao)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Previsão: {e}')
         return False
+    return excluidos > 0
 
-def exportar_previsoes_json():
-    """Exporta as previsões para um arquivo JSON e retorna True em caso de sucesso."""
-    print('\n Exportando dados das previsões para JSON...')
-    previsoes = read_previsao()
-    if previsoes is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not previsoes:
-        print(" Nenhuma previsão cadastrada para exportar.")
-        return True
+def delete_previsao_many(ids, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui várias previsões em uma única transação.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        return repositorio_previsoes.excluir_lote(ids, tamanho_lote=tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Previsões em lote: {e}')
+        return None
 
+def exportar_previsoes_json(caminho='previsoes.json', formato='indentado', compactar=False):
+    """
+    Exporta as previsões para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
+    print('\n Exportando dados das previsões para JSON...')
     try:
-        with open('previsoes.json', 'w', encoding='utf-8') as f:
-            json.dump(previsoes, f, ensure_ascii=False, indent=4, default=converter_hora)
-        print(' Dados exportados com sucesso para previsoes.json.')
-        return True
-    except (IOError, TypeError) as e:
+        quantidade, destino = exportar_registros(iterar_previsoes(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhuma previsão cadastrada para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_previsao():
     while True:
         print('\n**Menu - Previsões**')
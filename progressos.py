@@ -1,88 +1,258 @@
+import time
 import oracledb
-import json
-from utilitarios import getConnection, validar_string, validar_id, validar_data, validar_inteiro
+from datetime import datetime
+from cache import invalidar
+from fila import FilaEscrita
+from ranking import registrar_conclusoes
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import getConnection, TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_string, validar_id, validar_data, validar_inteiro
+
+COLUNAS_PROGRESSO = ('id_progresso', 'id_usuario', 'id_modulo', 'data_conclusao')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_PROGRESSO = {'id_usuario': 'texto', 'id_modulo': 'texto', 'data_conclusao': 'data'}
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_progressos = Repositorio('LM_PROGRESSOS', COLUNAS_PROGRESSO, 'data_conclusao', FILTROS_PROGRESSO)
 
 def create_progresso(id_progresso, id_usuario, id_modulo, data_conclusao):
     """Insere um novo progresso no banco e retorna True em caso de sucesso."""
+    instante = time.time()
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_PROGRESSOS (id_progresso, id_usuario, id_modulo, data_conclusao)
-                    VALUES (:id_progresso, :id_usuario, :id_modulo, :data_conclusao)
-                """
-                cursor.execute(sql, {'id_progresso': id_progresso, 'id_usuario': id_usuario, 'id_modulo': id_modulo, 'data_conclusao': data_conclusao})
-                conn.commit()
-                return True
+        repositorio_progressos.inserir(dict(zip(COLUNAS_PROGRESSO, (id_progresso, id_usuario, id_modulo, data_conclusao))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Progresso: {e}')
         return False
+    registrar_conclusoes([(id_progresso, id_usuario, id_modulo)], instante)
+    return True
 
-def read_progresso():
-    """Lê e retorna uma lista de todos os progressos do banco."""
+# Resultados de complete_module
+CONCLUIDO = 'concluido'
+JA_CONCLUIDO = 'ja_concluido'
+USUARIO_NAO_ENCONTRADO = 'usuario_nao_encontrado'
+MODULO_NAO_ENCONTRADO = 'modulo_nao_encontrado'
+
+def complete_module(id_usuario, id_modulo, data_conclusao=None):
+    """
+    Registra que o usuário concluiu o módulo em uma única transação: grava o progresso e soma
+    o xp_recompensa do módulo em xp_total e 1 em modulos_concluidos no próprio banco
+    (UPDATE ... SET xp_total = xp_total + :xp), sem ler e regravar o usuário inteiro.
+    A linha do usuário fica travada (SELECT ... FOR UPDATE) até o commit, então conclusões
+    repetidas ou simultâneas do mesmo módulo contam uma única vez.
+    Retorna {'resultado': CONCLUIDO | JA_CONCLUIDO | USUARIO_NAO_ENCONTRADO | MODULO_NAO_ENCONTRADO,
+    'id_progresso', 'xp_ganho', 'xp_total', 'modulos_concluidos'}, ou None em caso de erro.
+    """
+    data_conclusao = data_conclusao or datetime.now()
+    instante = time.time()
     try:
         with getConnection() as conn:
             with conn.cursor() as cursor:
-                sql = "SELECT id_progresso, id_usuario, id_modulo, data_conclusao FROM LM_PROGRESSOS ORDER BY data_conclusao"
-                cursor.execute(sql)
-                progressos = []
-                for row in cursor.fetchall():
-                    progressos.append({'id_progresso': row[0], 'id_usuario': row[1], 'id_modulo': row[2], 'data_conclusao': row[3]})
-                return progressos
+                cursor.execute("SELECT xp_recompensa FROM LM_MODULOS WHERE id_modulo = :id_modulo", {'id_modulo': id_modulo})
+                modulo = cursor.fetchone()
+                if modulo is None:
+                    return {'resultado': MODULO_NAO_ENCONTRADO}
+                xp = modulo[0] or 0
+
+                cursor.execute("""
+                    SELECT xp_total, modulos_concluidos FROM LM_USUARIOS
+                    WHERE id_usuario = :id_usuario FOR UPDATE
+                """, {'id_usuario': id_usuario})
+                usuario = cursor.fetchone()
+                if usuario is None:
+                    conn.rollback()
+                    return {'resultado': USUARIO_NAO_ENCONTRADO}
+                xp_total, modulos_concluidos = usuario[0] or 0, usuario[1] or 0
+
+                id_progresso = validar_id()
+                cursor.execute("""
+                    INSERT INTO LM_PROGRESSOS (id_progresso, id_usuario, id_modulo, data_conclusao)
+                    SELECT :id_progresso, :id_usuario, :id_modulo, :data_conclusao FROM dual
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM LM_PROGRESSOS WHERE id_usuario = :id_usuario AND id_modulo = :id_modulo
+                    )
+                """, {'id_progresso': id_progresso, 'id_usuario': id_usuario, 'id_modulo': id_modulo, 'data_conclusao': data_conclusao})
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return {'resultado': JA_CONCLUIDO, 'id_progresso': None, 'xp_ganho': 0,
+                            'xp_total': xp_total, 'modulos_concluidos': modulos_concluidos}
+
+                cursor.execute("""
+                    UPDATE LM_USUARIOS
+                    SET xp_total = NVL(xp_total, 0) + :xp, modulos_concluidos = NVL(modulos_concluidos, 0) + 1
+                    WHERE id_usuario = :id_usuario
+                """, {'xp': xp, 'id_usuario': id_usuario})
+                conn.commit()
+    except oracledb.Error as e:
+        print(f'\n Erro ao concluir o Modulo {id_modulo} para o Usuario {id_usuario}: {e}')
+        return None
+
+    invalidar('usuarios')
+    registrar_conclusoes([(id_progresso, id_usuario, id_modulo)], instante)
+    return {'resultado': CONCLUIDO, 'id_progresso': id_progresso, 'xp_ganho': xp,
+            'xp_total': xp_total + xp, 'modulos_concluidos': modulos_concluidos + 1}
+
+def create_progresso_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere vários progressos (dicionários com as mesmas chaves de create_progresso) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    registros = list(registros)
+    instante = time.time()
+    try:
+        resultado = repositorio_progressos.inserir_lote(registros, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Progressos em lote: {e}')
+        return None
+    rejeitados = {erro['indice'] for erro in resultado['erros']}
+    registrar_conclusoes([(r['id_progresso'], r['id_usuario'], r['id_modulo']) for i, r in enumerate(registros)
+                          if i not in rejeitados], instante)
+    return resultado
+
+def upsert_progresso_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza vários progressos (dicionários com as mesmas chaves de create_progresso) com MERGE em lotes,
+    sem regravar os que chegaram iguais aos do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_progressos.sincronizar_lote(registros, tamanho_lote)
+        if resultado['chaves_gravadas']:
+            # Atualizações podem mudar o módulo ou o usuário de um progresso: o ranking é remontado
+            invalidar('ranking')
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Progressos em lote: {e}')
+        return None
+
+# Fila de escrita em segundo plano para o modo assíncrono de POST /progressos (LEME_PROGRESSOS_ASSINCRONO=1)
+fila_progressos = FilaEscrita('progressos', create_progresso_many)
+
+def read_progresso(filtros=None, campos=None):
+    """
+    Lê e retorna uma lista de todos os progressos do banco.
+    Com 'filtros' ou 'campos' (ver read_progresso_pagina) a lista é filtrada e projetada no banco.
+    """
+    try:
+        return repositorio_progressos.listar(filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Progressos: {e}')
+        return None
+
+def read_progresso_by_id(id_progresso):
+    """Lê o progresso pelo id e retorna um dicionário, ou None se não existir ou houver erro."""
+    try:
+        return repositorio_progressos.por_id(id_progresso)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Progresso {id_progresso}: {e}')
+        return None
+
+def read_progresso_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página dos progressos ordenada por data de conclusão e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_PROGRESSO e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_progressos.pagina(limite, cursor, filtros, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao ler Progressos: {e}')
         return None
 
+def read_progresso_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê os progressos (mesma ordem, filtros e campos de read_progresso) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_progressos.listar_colunas(filtros, campos, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Progressos: {e}')
+        return None
+
+def iterar_progressos(tamanho_lote=TAMANHO_BUSCA_PADRAO, desde=None, scn=None, filtros=None, campos=None):
+    """
+    Percorre os progressos (mesma ordem de read_progresso) sem carregar a tabela inteira na memória.
+    Com 'desde', traz apenas os registros com data_conclusao posterior a essa data.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_progresso_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_progressos.iterar(tamanho_lote, scn, filtros, campos, desde)
+
 def update_progresso(id_progresso, novo_id_usuario, novo_id_modulo, nova_data_conclusao):
     """Atualiza um progresso e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_PROGRESSOS
-                    SET id_usuario = :novo_id_usuario, id_modulo = :novo_id_modulo, data_conclusao = :nova_data_conclusao
-                    WHERE id_progresso = :id_progresso
-                """
-                cursor.execute(sql, {'novo_id_usuario': novo_id_usuario, 'novo_id_modulo': novo_id_modulo, 'nova_data_conclusao': nova_data_conclusao, 'id_progresso': id_progresso})
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_progressos.atualizar(id_progresso, dict(zip(COLUNAS_PROGRESSO[1:], (novo_id_usuario, novo_id_modulo, nova_data_conclusao))))
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Progresso: {e}')
+        return False
+    if atualizados:
+        invalidar('ranking')
+    return atualizados > 0
+
+def patch_progresso(id_progresso, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) do progresso e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_progressos.atualizar_campos(id_progresso, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Progresso: {e}')
         return False
+    if atualizados:
+        invalidar('ranking')
+    return atualizados > 0
 
 def delete_progresso(id_progresso):
     """Exclui um progresso e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_PROGRESSOS WHERE id_progresso = :id_progresso"
-                cursor.execute(sql, {'id_progresso': id_progresso})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_progressos.excluir(id_progresso)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Progresso: {e}')
         return False
+    if excluidos:
+        invalidar('ranking')
+    return excluidos > 0
 
-def exportar_progressos_json():
-    """Exporta os progressos para um arquivo JSON e retorna True em caso de sucesso."""
-    print('\n Exportando dados dos progressos para JSON...')
-    progressos = read_progresso()
-    if progressos is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not progressos:
-        print(" Nenhum progresso cadastrado para exportar.")
-        return True
+def delete_progresso_many(ids, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui vários progressos em uma única transação.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_progressos.excluir_lote(ids, tamanho_lote=tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Progressos em lote: {e}')
+        return None
+    if resultado['excluidos']:
+        invalidar('ranking')
+    return resultado
 
+def exportar_progressos_json(caminho='progressos.json', formato='indentado', compactar=False):
+    """
+    Exporta os progressos para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
+    print('\n Exportando dados dos progressos para JSON...')
     try:
-        with open('progressos.json', 'w', encoding='utf-8') as f:
-            json.dump(progressos, f, ensure_ascii=False, indent=4)
-        print(' Dados exportados com sucesso para progressos.json.')
-        return True
-    except IOError as e:
+        quantidade, destino = exportar_registros(iterar_progressos(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhum progresso cadastrado para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_progresso():
     while True:
         print('\n**Menu - Progresso**')
@@ -91,9 +261,10 @@ def main_progresso():
         print('3. Atualizar os dados de um Progresso')
         print('4. Excluir um Progresso')
         print('5. Exportar Progressos para Json')
-        print('6. Voltar ao menu principal')
+        print('6. Concluir um Modulo (soma o XP no usuario)')
+        print('7. Voltar ao menu principal')
 
-        opcao = validar_inteiro('Digite uma opção entre 1 e 6: ')
+        opcao = validar_inteiro('Digite uma opção entre 1 e 7: ')
         if opcao == 1:
             print('\n*** Inserindo um novo progresso ***')
             id_progresso = validar_id()
@@ -144,10 +315,24 @@ def main_progresso():
             exportar_progressos_json()
 
         elif opcao == 6:
+            print('\n*** Concluindo um Modulo ***')
+            id_usuario = validar_string('Digite o id_usuario: ')
+            id_modulo = validar_string('Digite o id_modulo concluído: ')
+            conclusao = complete_module(id_usuario, id_modulo)
+            if conclusao is None:
+                print('\n Falha ao concluir o módulo.')
+            elif conclusao['resultado'] == CONCLUIDO:
+                print(f"\n Módulo concluído! +{conclusao['xp_ganho']} XP (total: {conclusao['xp_total']}).")
+            elif conclusao['resultado'] == JA_CONCLUIDO:
+                print('\n O usuário já havia concluído este módulo; nada foi alterado.')
+            else:
+                print('\n Usuário ou módulo não encontrado.')
+
+        elif opcao == 7:
             print('\nRetornando ao menu principal...')
             break
         else:
-            print("\n Opção inválida. Tente novamente com um número inteiro entre 1 e 6.")
+            print("\n Opção inválida. Tente novamente com um número inteiro entre 1 e 7.")
 
 if __name__ == "__main__":
     main_progresso()
\ No newline at end of file
@@ -0,0 +1,258 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left, insort
+import oracledb
+from cache import DIRETORIO_VERSOES, TAMANHO_MAXIMO_VERSAO, versao, invalidar
+from modulos import read_modulo_by_id
+from utilitarios import iterar_consulta, ler_por_ids, obter_scn, ler_numero_env
+
+# O XP do ranking é a soma de modulos.xp_recompensa dos progressos de cada usuário, no total,
+# por área do usuário e por trilha. O ranking fica em memória em cada worker: é montado uma vez
+# com uma consulta agregada e depois atualizado incrementalmente a cada progresso criado.
+#
+# Para que todos os workers do gunicorn vejam os novos progressos, cada conclusão é acrescentada
+# como uma linha JSON [id_progresso, id_usuario, id_trilha, xp, instante] ao arquivo de eventos; cada
+# worker lê apenas o trecho novo do arquivo antes de responder. 'instante' é o time.time() de antes
+# da gravação do progresso: a remontagem lê o banco num SCN, e um evento com instante anterior ao
+# fim da leitura desse SCN pode já estar contado na consulta; esses progressos são conferidos no
+# mesmo SCN e os que já estavam lá são ignorados, para não somar o XP duas vezes. Escritas que não são simples somas (alterar ou excluir
+# progressos, gravar usuários ou módulos) mudam as versões de NAMESPACES_RANKING e o ranking é remontado.
+# As escritas de usuários publicam 'ranking' diretamente, porque 'usuarios' também muda a cada
+# módulo concluído (xp_total), o que não exige remontar o ranking.
+ARQUIVO_EVENTOS = os.path.join(DIRETORIO_VERSOES, 'ranking.eventos')
+NAMESPACES_RANKING = ('ranking', 'modulos')
+
+# Intervalo (segundos) para remontar o ranking mesmo sem escritas, corrigindo o que foi
+# alterado direto no banco
+RANKING_TTL = ler_numero_env("LEME_RANKING_TTL", 600.0)
+
+SQL_RANKING = """
+    SELECT u.id_usuario, u.nome, u.area, m.id_trilha, SUM(m.xp_recompensa) AS xp
+    FROM LM_USUARIOS AS OF SCN :scn u
+    LEFT JOIN LM_PROGRESSOS AS OF SCN :scn p ON p.id_usuario = u.id_usuario
+    LEFT JOIN LM_MODULOS AS OF SCN :scn m ON m.id_modulo = p.id_modulo
+    GROUP BY u.id_usuario, u.nome, u.area, m.id_trilha"""
+SQL_PROGRESSOS_SCN = "SELECT id_progresso FROM LM_PROGRESSOS AS OF SCN :scn"
+
+
+class Placar:
+    """
+    Classificação ordenada por XP (maior primeiro, empate pelo id). Atualizar um usuário custa uma
+    busca binária e um deslocamento da lista; ler o top-K é apenas uma fatia.
+    """
+
+    def __init__(self):
+        self._ordem = []  # (-xp, id_usuario), sempre ordenada
+        self._xp = {}
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def definir(self, id_usuario, xp) -> None:
+        """Define o XP do usuário, reposicionando-o na classificação."""
+        self.remover(id_usuario)
+        self._xp[id_usuario] = xp
+        insort(self._ordem, (-xp, id_usuario))
+
+    def somar(self, id_usuario, xp) -> None:
+        """Soma 'xp' ao XP atual do usuário (zero se ele ainda não estiver no placar)."""
+        self.definir(id_usuario, self._xp.get(id_usuario, 0) + xp)
+
+    def remover(self, id_usuario) -> None:
+        """Tira o usuário da classificação, se estiver nela."""
+        anterior = self._xp.pop(id_usuario, None)
+        if anterior is not None:
+            del self._ordem[bisect_left(self._ordem, (-anterior, id_usuario))]
+
+    def topo(self, k: int) -> list:
+        """Retorna os k primeiros como [(id_usuario, xp), ...]."""
+        return [(id_usuario, -xp) for xp, id_usuario in self._ordem[:k]]
+
+    def posicao(self, id_usuario):
+        """Retorna (posição começando em 1, xp) do usuário, ou None se ele não estiver no placar."""
+        xp = self._xp.get(id_usuario)
+        if xp is None:
+            return None
+        return bisect_left(self._ordem, (-xp, id_usuario)) + 1, xp
+
+
+class Ranking:
+    """Placar geral, por área e por trilha, mais os dados dos usuários para montar a resposta."""
+
+    def __init__(self):
+        self.usuarios = {}  # id_usuario -> (nome, area)
+        self.geral = Placar()
+        self.por_area = {}
+        self.por_trilha = {}
+
+    def adicionar_usuario(self, id_usuario, nome, area) -> None:
+        self.usuarios[id_usuario] = (nome, area)
+        self.geral.somar(id_usuario, 0)
+        self.por_area.setdefault(area, Placar()).somar(id_usuario, 0)
+
+    def somar(self, id_usuario, id_trilha, xp) -> bool:
+        """Credita 'xp' ao usuário no total, na área dele e na trilha. Retorna False se o usuário não for conhecido."""
+        if id_usuario not in self.usuarios:
+            return False
+        self.geral.somar(id_usuario, xp)
+        self.por_area[self.usuarios[id_usuario][1]].somar(id_usuario, xp)
+        if id_trilha is not None:
+            self.por_trilha.setdefault(id_trilha, Placar()).somar(id_usuario, xp)
+        return True
+
+    def placar(self, area=None, id_trilha=None):
+        """Retorna o placar pedido (vazio se a área ou trilha não tiver usuários)."""
+        if id_trilha is not None:
+            return self.por_trilha.get(id_trilha) or Placar()
+        if area is not None:
+            return self.por_area.get(area) or Placar()
+        return self.geral
+
+
+def montar_ranking(linhas) -> Ranking:
+    """Monta um Ranking a partir das linhas de SQL_RANKING (id_usuario, nome, area, id_trilha, xp)."""
+    ranking = Ranking()
+    for linha in linhas:
+        if linha['id_usuario'] not in ranking.usuarios:
+            ranking.adicionar_usuario(linha['id_usuario'], linha['nome'], linha['area'])
+        if linha['xp'] is not None:
+            ranking.somar(linha['id_usuario'], linha['id_trilha'], linha['xp'])
+    return ranking
+
+
+_ranking = None
+_versoes = None
+_montado_em = 0.0
+_arquivo_visto = None  # (inode, posição já lida) no arquivo de eventos
+_scn_montagem = None  # SCN lido pela última remontagem
+_instante_montagem = 0.0  # time.time() logo depois de obter esse SCN
+_lock = threading.Lock()
+
+
+def _versoes_atuais():
+    return tuple(versao(namespace) for namespace in NAMESPACES_RANKING)
+
+
+def _fim_eventos():
+    """Retorna (inode, tamanho) do arquivo de eventos, ou (None, 0) se ele não existir."""
+    try:
+        st = os.stat(ARQUIVO_EVENTOS)
+    except FileNotFoundError:
+        return None, 0
+    return st.st_ino, st.st_size
+
+
+def _aplicar_eventos(ranking: Ranking) -> bool:
+    """
+    Aplica ao ranking as linhas do arquivo de eventos gravadas desde a última leitura, menos os
+    progressos que a consulta da remontagem já contou. Retorna False se o arquivo foi zerado ou trocado (ou trouxe um usuário desconhecido)
+    e o ranking precisa ser remontado.
+    """
+    global _arquivo_visto
+    inode, tamanho = _fim_eventos()
+    inode_visto, posicao = _arquivo_visto
+    if inode_visto is None:
+        # O arquivo ainda não existia na última leitura: tudo o que há nele é novo
+        inode_visto = inode
+    if inode != inode_visto or tamanho < posicao:
+        return False
+    if tamanho == posicao:
+        return True
+    with open(ARQUIVO_EVENTOS, 'rb') as f:
+        f.seek(posicao)
+        bloco = f.read(tamanho - posicao)
+    completo = bloco[:bloco.rfind(b'\n') + 1]  # uma linha ainda sendo escrita fica para a próxima leitura
+    eventos = [json.loads(linha) for linha in completo.splitlines()]
+    if any(len(evento) != 5 for evento in eventos):
+        return False
+    # Progressos gravados antes do fim da leitura do SCN podem já estar na consulta da remontagem
+    duvidosos = [evento[0] for evento in eventos if evento[4] < _instante_montagem]
+    contados = ler_por_ids(SQL_PROGRESSOS_SCN, 'id_progresso', duvidosos, {'scn': _scn_montagem}) if duvidosos else {}
+    _arquivo_visto = (inode, posicao + len(completo))
+    for id_progresso, id_usuario, id_trilha, xp, _ in eventos:
+        if id_progresso in contados:
+            continue
+        if not ranking.somar(id_usuario, id_trilha, xp):
+            return False
+    return True
+
+
+def _sincronizar() -> Ranking:
+    """Retorna o ranking atualizado, remontando-o se necessário. Chamado com _lock adquirido."""
+    global _ranking, _versoes, _montado_em, _arquivo_visto, _scn_montagem, _instante_montagem
+    atuais = _versoes_atuais()
+    if (_ranking is not None and atuais == _versoes and time.monotonic() - _montado_em < RANKING_TTL
+            and _aplicar_eventos(_ranking)):
+        return _ranking
+    # Os eventos gravados a partir daqui serão aplicados sobre o resultado da consulta, menos os
+    # progressos que a consulta (lida nesse SCN) já contou
+    _ranking = None  # se a consulta falhar, a próxima leitura remonta em vez de usar a marca nova
+    _arquivo_visto = _fim_eventos()
+    _scn_montagem = obter_scn()
+    _instante_montagem = time.time()
+    _ranking = montar_ranking(iterar_consulta(SQL_RANKING, {'scn': _scn_montagem}))
+    _versoes = atuais
+    _montado_em = time.monotonic()
+    return _ranking
+
+
+def read_ranking(area=None, id_trilha=None, k: int = 10, id_usuario=None):
+    """
+    Retorna o top-K do ranking geral, de uma área ou de uma trilha como
+    {'items': [{'posicao', 'id_usuario', 'nome', 'area', 'xp'}, ...], 'total': n}.
+    Com 'id_usuario' inclui também 'usuario' com a posição desse usuário (None se não estiver no placar).
+    Retorna None em caso de erro.
+    """
+    try:
+        with _lock:
+            ranking = _sincronizar()
+            placar = ranking.placar(area, id_trilha)
+            itens = [{'posicao': posicao, 'id_usuario': id_u, 'nome': ranking.usuarios[id_u][0],
+                      'area': ranking.usuarios[id_u][1], 'xp': xp}
+                     for posicao, (id_u, xp) in enumerate(placar.topo(k), start=1)]
+            resultado = {'items': itens, 'total': len(placar)}
+            if id_usuario is not None:
+                encontrado = placar.posicao(id_usuario)
+                resultado['usuario'] = {'id_usuario': id_usuario, 'posicao': encontrado[0], 'xp': encontrado[1]} if encontrado else None
+            return resultado
+    except (oracledb.Error, OSError, ValueError) as e:
+        print(f'\n Erro ao ler o ranking: {e}')
+        return None
+
+
+def registrar_conclusoes(conclusoes, instante: float) -> None:
+    """
+    Publica para todos os workers o XP ganho em novos progressos.
+    'conclusoes' é uma sequência de (id_progresso, id_usuario, id_modulo) já gravados no banco e
+    'instante' o time.time() de antes da gravação; o XP e a trilha vêm do cache de módulos.
+    Se não for possível publicar, o ranking é remontado na próxima leitura.
+    """
+    linhas = []
+    for id_progresso, id_usuario, id_modulo in conclusoes:
+        modulo = read_modulo_by_id(id_modulo)
+        if modulo is None:
+            invalidar('ranking')
+            return
+        linhas.append(json.dumps([id_progresso, id_usuario, modulo['id_trilha'], modulo['xp_recompensa'] or 0, instante]) + '\n')
+    if not linhas:
+        return
+    try:
+        os.makedirs(os.path.dirname(ARQUIVO_EVENTOS), exist_ok=True)
+        descritor = os.open(ARQUIVO_EVENTOS, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(descritor, ''.join(linhas).encode())
+            cheio = os.fstat(descritor).st_size > TAMANHO_MAXIMO_VERSAO
+        finally:
+            os.close(descritor)
+        if cheio:
+            # Trocar o arquivo por um vazio (novo inode) faz cada worker remontar o ranking uma vez, a partir do banco
+            descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(ARQUIVO_EVENTOS))
+            os.close(descritor)
+            os.chmod(temporario, 0o666)
+            os.replace(temporario, ARQUIVO_EVENTOS)
+    except OSError as e:
+        print(f'Aviso: não foi possível publicar o evento de ranking: {e}')
+        invalidar('ranking')
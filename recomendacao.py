@@ -0,0 +1,205 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+import numpy as np
+import oracledb
+from scipy import sparse
+from cache import invalidar
+from exportacao import DIRETORIO_EXPORTACAO, MARGEM_INCREMENTAL, gravar_json_atomico, ler_marcas
+from sugestoes import COLUNAS_SUGESTAO
+from utilitarios import getConnection, iterar_consulta, mesclar_em_lote, ler_numero_env
+
+# Marca d'água do modo incremental: maior data_conclusao já considerada
+ARQUIVO_MARCAS_RECOMENDACAO = os.getenv('LEME_MARCAS_RECOMENDACAO', os.path.join(DIRETORIO_EXPORTACAO, 'recomendacao.json'))
+# Sugestões por usuário e usuários processados por vez
+TOP_N_RECOMENDACAO = ler_numero_env("LEME_RECOMENDACAO_TOP_N", 5)
+LOTE_RECOMENDACAO = ler_numero_env("LEME_RECOMENDACAO_LOTE", 1000)
+
+# Peso de cada sinal na pontuação de uma trilha para um usuário (todos os sinais vão de 0 a 1)
+PESOS_RECOMENDACAO = {
+    'colaborativo': 1.0,     # trilhas concluídas junto com as que o usuário já fez (cosseno entre trilhas)
+    'area': 0.5,             # area_foco da trilha igual à área do usuário
+    'acessibilidade': 0.3,   # proporção de módulos adaptados, para quem informou necessidade de acessibilidade
+    'popularidade': 0.1,     # quantidade de usuários que fizeram a trilha
+}
+# Valores de acessibilidade / adaptacao_necessaria que significam "nenhuma"
+SEM_ADAPTACAO = ('', 'n', 'nao', 'não', 'nenhuma', 'nenhum', 'no', 'none', 'false', '0')
+
+SQL_TRILHAS = """
+    SELECT t.id_trilha, t.area_foco, COUNT(m.id_modulo) AS modulos,
+           SUM(CASE WHEN m.adaptacao_necessaria IS NULL THEN 0
+                    WHEN LOWER(TRIM(m.adaptacao_necessaria)) IN ({sem_adaptacao}) THEN 0 ELSE 1 END) AS adaptados
+    FROM LM_TRILHAS t LEFT JOIN LM_MODULOS m ON m.id_trilha = t.id_trilha
+    GROUP BY t.id_trilha, t.area_foco"""
+
+# Módulos distintos concluídos por usuário em cada trilha (a matriz esparsa usuário x trilha)
+SQL_CONCLUSOES = """
+    SELECT p.id_usuario, m.id_trilha, COUNT(DISTINCT p.id_modulo) AS concluidos
+    FROM LM_PROGRESSOS p JOIN LM_MODULOS m ON m.id_modulo = p.id_modulo
+    GROUP BY p.id_usuario, m.id_trilha"""
+
+SQL_USUARIOS = "SELECT id_usuario, area, acessibilidade FROM LM_USUARIOS"
+FILTRO_INCREMENTAL = " WHERE id_usuario IN (SELECT id_usuario FROM LM_PROGRESSOS WHERE data_conclusao > :desde)"
+SQL_ULTIMA_CONCLUSAO = "SELECT MAX(data_conclusao) AS ultima FROM LM_PROGRESSOS"
+
+
+def precisa_adaptacao(valor) -> bool:
+    return valor is not None and str(valor).strip().lower() not in SEM_ADAPTACAO
+
+
+class ModeloRecomendacao:
+    """
+    Dados do catálogo e do histórico usados para recomendar: a matriz esparsa usuário x trilha com a
+    fração de cada trilha concluída, a similaridade de cosseno entre trilhas (trilha x trilha, esparsa)
+    e os atributos das trilhas, tudo indexado pela posição da trilha em 'trilhas'.
+    """
+
+    def __init__(self, trilhas, areas, modulos, adaptados, conclusoes):
+        self.trilhas = list(trilhas)
+        self.posicao_trilha = {id_trilha: i for i, id_trilha in enumerate(self.trilhas)}
+        self.areas = np.array([str(a).strip().lower() if a is not None else '' for a in areas], dtype=object)
+        modulos = np.asarray(modulos, dtype=float)
+        self.adaptados = np.divide(np.asarray(adaptados, dtype=float), modulos, out=np.zeros(len(modulos)), where=modulos > 0)
+
+        linhas, colunas, valores, self.posicao_usuario = [], [], [], {}
+        for id_usuario, id_trilha, concluidos in conclusoes:
+            coluna = self.posicao_trilha.get(id_trilha)
+            if coluna is None or not modulos[coluna]:
+                continue
+            linhas.append(self.posicao_usuario.setdefault(id_usuario, len(self.posicao_usuario)))
+            colunas.append(coluna)
+            valores.append(min(concluidos / modulos[coluna], 1.0))
+        self.progresso = sparse.csr_matrix((valores, (linhas, colunas)), shape=(len(self.posicao_usuario), len(self.trilhas)))
+        self._progresso_com_vazia = sparse.vstack([self.progresso, sparse.csr_matrix((1, len(self.trilhas)))]).tocsr()
+
+        # Cosseno entre as colunas (trilhas): normaliza cada coluna e multiplica C' x C
+        normas = np.sqrt(np.asarray(self.progresso.multiply(self.progresso).sum(axis=0)).ravel())
+        inverso = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+        normalizada = self.progresso @ sparse.diags(inverso)
+        self.similaridade = (normalizada.T @ normalizada).tocsr()
+        self.similaridade.setdiag(0)
+        self.similaridade.eliminate_zeros()
+
+        usuarios_por_trilha = np.asarray((self.progresso > 0).sum(axis=0), dtype=float).ravel()
+        self.popularidade = usuarios_por_trilha / usuarios_por_trilha.max() if usuarios_por_trilha.size and usuarios_por_trilha.max() > 0 else np.zeros(len(self.trilhas))
+
+    def recomendar(self, usuarios, n: int = TOP_N_RECOMENDACAO) -> list:
+        """
+        Calcula as n melhores trilhas de cada usuário de 'usuarios' (dicionários com id_usuario, area e
+        acessibilidade) de uma vez, com operações de matriz. Trilhas já concluídas não são sugeridas.
+        Retorna uma lista alinhada com 'usuarios' de listas de (id_trilha, pontuacao), da melhor para a pior.
+        """
+        if not self.trilhas or not usuarios:
+            return [[] for _ in usuarios]
+        # Usuários sem conclusões apontam para a linha vazia acrescentada no fim da matriz
+        vazia = len(self.posicao_usuario)
+        posicoes = np.array([self.posicao_usuario.get(u['id_usuario'], vazia) for u in usuarios])
+        progresso = self._progresso_com_vazia[posicoes]
+
+        colaborativo = (progresso @ self.similaridade).toarray()
+        maximo = colaborativo.max(axis=1, keepdims=True)
+        colaborativo = np.divide(colaborativo, maximo, out=np.zeros_like(colaborativo), where=maximo > 0)
+
+        areas = np.array([str(u['area']).strip().lower() if u['area'] is not None else None for u in usuarios], dtype=object)
+        mesma_area = (areas[:, None] == self.areas[None, :]).astype(float)
+        precisa = np.array([precisa_adaptacao(u['acessibilidade']) for u in usuarios], dtype=float)
+
+        pontuacao = (PESOS_RECOMENDACAO['colaborativo'] * colaborativo
+                     + PESOS_RECOMENDACAO['area'] * mesma_area
+                     + PESOS_RECOMENDACAO['acessibilidade'] * precisa[:, None] * self.adaptados[None, :]
+                     + PESOS_RECOMENDACAO['popularidade'] * self.popularidade[None, :])
+        pontuacao[progresso.toarray() >= 1.0] = -np.inf
+
+        k = min(n, len(self.trilhas))
+        melhores = np.argpartition(-pontuacao, k - 1, axis=1)[:, :k]
+        ordem = np.take_along_axis(pontuacao, melhores, axis=1).argsort(axis=1)[:, ::-1]
+        melhores = np.take_along_axis(melhores, ordem, axis=1)
+        return [[(self.trilhas[j], float(pontuacao[i, j])) for j in linha if np.isfinite(pontuacao[i, j])]
+                for i, linha in enumerate(melhores)]
+
+
+def carregar_modelo() -> ModeloRecomendacao:
+    """Lê o catálogo e as conclusões agregadas e monta o modelo. Lança oracledb.Error em caso de falha."""
+    sem_adaptacao = ', '.join(f"'{valor}'" for valor in SEM_ADAPTACAO)
+    trilhas = list(iterar_consulta(SQL_TRILHAS.format(sem_adaptacao=sem_adaptacao)))
+    conclusoes = ((c['id_usuario'], c['id_trilha'], c['concluidos']) for c in iterar_consulta(SQL_CONCLUSOES))
+    return ModeloRecomendacao([t['id_trilha'] for t in trilhas], [t['area_foco'] for t in trilhas],
+                              [t['modulos'] for t in trilhas], [t['adaptados'] or 0 for t in trilhas], conclusoes)
+
+
+def id_sugestao_calculada(id_usuario, posicao: int) -> str:
+    """Id fixo da sugestão de cada posição do top-N do usuário, para que o MERGE regrave as mesmas linhas."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'leme:sugestao:{id_usuario}:{posicao}'))
+
+
+def _excluir_sobras(ids) -> int:
+    """
+    Remove as posições do top-N que ficaram sem trilha (o usuário já concluiu quase todas).
+    Retorna a quantidade de linhas excluídas.
+    """
+    if not ids:
+        return 0
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            cursor.executemany("DELETE FROM LM_SUGESTOES WHERE id_sugestao = :1", [(i,) for i in ids])
+            conn.commit()
+            return cursor.rowcount
+
+
+def gerar_sugestoes(incremental: bool = False, n: int = TOP_N_RECOMENDACAO, tamanho_lote: int = LOTE_RECOMENDACAO,
+                    arquivo_marcas: str = ARQUIVO_MARCAS_RECOMENDACAO):
+    """
+    Calcula as n trilhas recomendadas para cada usuário e grava com MERGE em LM_SUGESTOES, uma linha por
+    posição (id_sugestao_calculada). Os usuários são lidos em fluxo e processados em lotes de 'tamanho_lote'.
+    A ordem da recomendação fica em data_sugestao: a 1ª posição tem a data da execução e cada posição
+    seguinte um segundo a menos, já que a coluna guarda só até os segundos (DATE).
+    Com 'incremental', só os usuários que concluíram módulos depois da última execução, relendo
+    MARGEM_INCREMENTAL segundos antes da marca para pegar progressos gravados com atraso.
+    Retorna {'usuarios', 'gravados', 'erros', 'segundos'}, ou None em caso de erro.
+    """
+    inicio = time.perf_counter()
+    agora = datetime.now().replace(microsecond=0)
+    usuarios_lidos, gravados, excluidos, erros = 0, 0, 0, []
+    try:
+        marcas = ler_marcas(arquivo_marcas)
+        desde = datetime.fromisoformat(marcas['sugestoes']) if incremental and marcas.get('sugestoes') else None
+        if incremental and desde is None:
+            print(' Nenhuma execução anterior: calculando todos os usuários.')
+        # A marca é lida antes de montar o modelo para que conclusões gravadas durante a execução fiquem para a próxima
+        ultima = list(iterar_consulta(SQL_ULTIMA_CONCLUSAO))[0]['ultima']
+        modelo = carregar_modelo()
+
+        sql = SQL_USUARIOS + (FILTRO_INCREMENTAL if desde is not None else '')
+        parametros = {'desde': desde - timedelta(seconds=MARGEM_INCREMENTAL)} if desde is not None else None
+        usuarios = iterar_consulta(sql, parametros)
+        while True:
+            lote = list(islice(usuarios, tamanho_lote))
+            if not lote:
+                break
+            registros, sobras = [], []
+            for usuario, trilhas in zip(lote, modelo.recomendar(lote, n)):
+                for posicao, (id_trilha, _) in enumerate(trilhas):
+                    registros.append({'id_sugestao': id_sugestao_calculada(usuario['id_usuario'], posicao),
+                                      'id_usuario': usuario['id_usuario'], 'id_trilha': id_trilha,
+                                      'data_sugestao': agora - timedelta(seconds=posicao)})
+                sobras.extend(id_sugestao_calculada(usuario['id_usuario'], posicao) for posicao in range(len(trilhas), n))
+            resultado = mesclar_em_lote('LM_SUGESTOES', COLUNAS_SUGESTAO, ('id_sugestao',), registros)
+            excluidos += _excluir_sobras(sobras)
+            usuarios_lidos += len(lote)
+            gravados += resultado['gravados']
+            erros.extend(resultado['erros'])
+
+        if gravados or excluidos:
+            invalidar('sugestoes')
+        if not erros and ultima is not None:
+            marcas['sugestoes'] = ultima.isoformat()
+            gravar_json_atomico(arquivo_marcas, marcas)
+    except oracledb.Error as e:
+        print(f'\n Erro ao gerar as sugestões: {e}')
+        return None
+    except (IOError, ValueError) as e:
+        print(f'\n Erro ao gravar a marca das sugestões: {e}')
+        return None
+    return {'usuarios': usuarios_lidos, 'gravados': gravados, 'erros': erros, 'segundos': time.perf_counter() - inicio}
@@ -0,0 +1,135 @@
+import functools
+from utilitarios import (getConnection, montar_filtros, projetar_colunas, montar_consulta, ler_pagina, ler_por_id, ler_por_ids,
+                         iterar_consulta, ler_colunas, inserir_em_lote, sincronizar_em_lote, atualizar_parcial, excluir_em_lote,
+                         TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO)
+
+# Repositório genérico das tabelas LM_*: cada tabela é descrita pelos seus metadados (colunas, ordenação
+# das listagens, filtros aceitos e linhas dependentes) e todas as operações de leitura e escrita saem
+# do mesmo código. Os módulos das entidades (usuarios, trilhas, ...) continuam expondo create_*/read_*/
+# update_*/delete_* como funções finas sobre o repositório, tratando os erros e invalidando os caches;
+# assim uma melhoria de desempenho feita aqui vale para as seis tabelas.
+
+# Todos os repositórios criados, por tabela
+REPOSITORIOS = {}
+
+
+@functools.lru_cache(maxsize=512)
+def montar_consulta_em_cache(tabela: str, colunas: tuple, ordem: str, condicoes: tuple = (), com_scn: bool = False) -> str:
+    """
+    montar_consulta com o SQL guardado por (colunas, condições): as listagens repetem sempre as mesmas
+    combinações de filtros e campos, e o texto idêntico também reaproveita o cursor já preparado no driver.
+    """
+    return montar_consulta(tabela, colunas, ordem, condicoes, True if com_scn else None)
+
+
+class Repositorio:
+    """
+    Operações de uma tabela a partir dos seus metadados: 'colunas' (a chave primária primeiro), a coluna
+    de 'ordem' das listagens, os 'filtros' aceitos (como em montar_filtros) e os 'dependentes' excluídos
+    antes da linha com cascata (como em excluir_em_lote). Os SQLs fixos são montados na criação e os
+    variáveis ficam em cache (montar_consulta_em_cache, montar_update).
+    Os métodos lançam oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+
+    def __init__(self, tabela: str, colunas, ordem: str, filtros: dict = None, dependentes=()):
+        self.tabela = tabela
+        self.colunas = tuple(colunas)
+        self.chave = self.colunas[0]
+        self.ordem = ordem
+        self.filtros = filtros or {}
+        self.dependentes = tuple(dependentes)
+        self.sql_inserir = (f"INSERT INTO {tabela} ({', '.join(self.colunas)}) "
+                            f"VALUES ({', '.join(f':{c}' for c in self.colunas)})")
+        self.sql_excluir = f"DELETE FROM {tabela} WHERE {self.chave} = :chave"
+        self.sql_selecao = f"SELECT {', '.join(self.colunas)} FROM {tabela}"
+        REPOSITORIOS[tabela] = self
+
+    # --- Escrita ---
+    def inserir(self, registro: dict) -> None:
+        """Insere uma linha ('registro' com todas as colunas)."""
+        with getConnection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(self.sql_inserir, {c: registro[c] for c in self.colunas})
+                conn.commit()
+
+    def inserir_lote(self, registros: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+        """Insere vários registros em lotes (ver inserir_em_lote)."""
+        return inserir_em_lote(self.tabela, self.colunas, registros, tamanho_lote)
+
+    def sincronizar_lote(self, registros: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+        """Insere ou atualiza vários registros com MERGE, sem regravar os iguais (ver sincronizar_em_lote)."""
+        return sincronizar_em_lote(self.tabela, self.colunas, self.chave, registros, tamanho_lote)
+
+    def atualizar(self, valor_chave, registro: dict) -> int:
+        """Regrava todas as colunas da linha (menos a chave) e retorna a quantidade de linhas atualizadas."""
+        return atualizar_parcial(self.tabela, self.colunas, self.chave, valor_chave,
+                                 {c: registro[c] for c in self.colunas[1:]})
+
+    def atualizar_campos(self, valor_chave, campos: dict) -> int:
+        """Atualiza só as colunas de 'campos' (ver atualizar_parcial) e retorna a quantidade de linhas atualizadas."""
+        return atualizar_parcial(self.tabela, self.colunas, self.chave, valor_chave, campos)
+
+    def excluir(self, valor_chave) -> int:
+        """Exclui a linha e retorna a quantidade de linhas excluídas."""
+        with getConnection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(self.sql_excluir, {'chave': valor_chave})
+                conn.commit()
+                return cursor.rowcount
+
+    def excluir_lote(self, ids: list, cascata: bool = False, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+        """Exclui várias linhas em uma transação, com os dependentes se 'cascata' (ver excluir_em_lote)."""
+        return excluir_em_lote(self.tabela, self.chave, ids, self.dependentes if cascata else (), tamanho_lote)
+
+    # --- Leitura ---
+    def por_id(self, valor_chave):
+        """Lê uma linha pela chave primária e retorna um dicionário, ou None se ela não existir."""
+        return ler_por_id(self.tabela, self.colunas, self.chave, valor_chave)
+
+    def por_ids(self, ids: list) -> dict:
+        """Lê várias linhas pela chave primária e retorna {id: linha}; ids inexistentes ficam de fora."""
+        return ler_por_ids(self.sql_selecao, self.chave, ids)
+
+    def consulta(self, scn=None, filtros: dict = None, campos=None, desde=None):
+        """
+        Monta (sql, params) da listagem na ordem de 'ordem'. Com 'desde', só as linhas com a coluna de
+        ordenação posterior a ele; com 'scn', a tabela como estava nesse SCN (flashback query).
+        'filtros' e 'campos' funcionam como em pagina.
+        """
+        condicoes, params = montar_filtros(self.filtros, filtros)
+        if desde is not None:
+            condicoes.append(f"{self.ordem} > :desde")
+            params['desde'] = desde
+        if scn is not None:
+            params['scn'] = scn
+        sql = montar_consulta_em_cache(self.tabela, projetar_colunas(self.colunas, campos), self.ordem,
+                                       tuple(condicoes), scn is not None)
+        return sql, params
+
+    def iterar(self, tamanho_lote: int = TAMANHO_BUSCA_PADRAO, scn=None, filtros: dict = None, campos=None, desde=None,
+               prefetch: int = None):
+        """
+        Gerador com as linhas (dicionários) da consulta montada por consulta(), buscadas em blocos de
+        'tamanho_lote' com 'prefetch' linhas já no execute (ver iterar_consulta).
+        """
+        sql, params = self.consulta(scn, filtros, campos, desde)
+        return iterar_consulta(sql, params, tamanho_lote, prefetch)
+
+    def listar(self, filtros: dict = None, campos=None) -> list:
+        """Lê todas as linhas (filtradas e projetadas no banco) em uma lista de dicionários."""
+        return list(self.iterar(filtros=filtros, campos=campos))
+
+    def listar_colunas(self, filtros: dict = None, campos=None, tamanho_lote: int = TAMANHO_BUSCA_PADRAO,
+                       prefetch: int = None) -> dict:
+        """Como listar, mas no formato compacto {coluna: [valores]} (ver ler_colunas)."""
+        sql, params = self.consulta(filtros=filtros, campos=campos)
+        return ler_colunas(sql, params, tamanho_lote, prefetch)
+
+    def pagina(self, limite: int = 50, cursor: str = None, filtros: dict = None, campos=None):
+        """
+        Lê uma página ordenada por (ordem, chave) com paginação keyset e retorna (linhas, proximo_cursor).
+        Aceita os filtros da tabela e a lista de 'campos' a buscar.
+        """
+        condicoes, params = montar_filtros(self.filtros, filtros)
+        return ler_pagina(self.tabela, projetar_colunas(self.colunas, campos), self.ordem, self.chave,
+                          limite, cursor, condicoes, params)
@@ -1,88 +1,181 @@
 import oracledb
-import json
-from utilitarios import getConnection, validar_string, validar_id, validar_data, validar_inteiro, converter_hora
+from cache import invalidar
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_string, validar_id, validar_data, validar_inteiro, converter_hora
+
+COLUNAS_SUGESTAO = ('id_sugestao', 'id_usuario', 'id_trilha', 'data_sugestao')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_SUGESTAO = {'id_usuario': 'texto', 'id_trilha': 'texto', 'data_sugestao': 'data'}
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_sugestoes = Repositorio('LM_SUGESTOES', COLUNAS_SUGESTAO, 'data_sugestao', FILTROS_SUGESTAO)
 
 def create_sugestao(id_sugestao, id_usuario, id_trilha, data_sugestao):
     """Insere uma nova sugestão no banco e retorna True em caso de sucesso."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_SUGESTOES (id_sugestao, id_usuario, id_trilha, data_sugestao)
-                    VALUES (:id_sugestao, :id_usuario, :id_trilha, :data_sugestao)
-                """
-                cursor.execute(sql, {'id_sugestao': id_sugestao, 'id_usuario': id_usuario, 'id_trilha': id_trilha, 'data_sugestao': data_sugestao})
-                conn.commit()
-                return True
+        repositorio_sugestoes.inserir(dict(zip(COLUNAS_SUGESTAO, (id_sugestao, id_usuario, id_trilha, data_sugestao))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Sugestão: {e}')
         return False
+    invalidar('sugestoes')
+    return True
+
+def create_sugestao_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere várias sugestões (dicionários com as mesmas chaves de create_sugestao) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_sugestoes.inserir_lote(registros, tamanho_lote)
+        if resultado['inseridos']:
+            invalidar('sugestoes')
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Sugestões em lote: {e}')
+        return None
+
+def upsert_sugestao_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza várias sugestões (dicionários com as mesmas chaves de create_sugestao) com MERGE em lotes,
+    sem regravar as que chegaram iguais às do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_sugestoes.sincronizar_lote(registros, tamanho_lote)
+        if resultado['chaves_gravadas']:
+            invalidar('sugestoes')
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Sugestões em lote: {e}')
+        return None
+
+def read_sugestao(filtros=None, campos=None):
+    """
+    Lê e retorna uma lista de todas as sugestões do banco.
+    Com 'filtros' ou 'campos' (ver read_sugestao_pagina) a lista é filtrada e projetada no banco.
+    """
+    try:
+        return repositorio_sugestoes.listar(filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Sugestões: {e}')
+        return None
+
+def read_sugestao_by_id(id_sugestao):
+    """Lê a sugestão pelo id e retorna um dicionário, ou None se não existir ou houver erro."""
+    try:
+        return repositorio_sugestoes.por_id(id_sugestao)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Sugestão {id_sugestao}: {e}')
+        return None
+
+def read_sugestao_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página das sugestões ordenada por data da sugestão e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_SUGESTAO e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_sugestoes.pagina(limite, cursor, filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Sugestões: {e}')
+        return None
 
-def read_sugestao():
-    """Lê e retorna uma lista de todas as sugestões do banco."""
+def read_sugestao_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê as sugestões (mesma ordem, filtros e campos de read_sugestao) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "SELECT id_sugestao, id_usuario, id_trilha, data_sugestao FROM LM_SUGESTOES ORDER BY data_sugestao"
-                cursor.execute(sql)
-                sugestoes = []
-                for row in cursor.fetchall():
-                    sugestoes.append({'id_sugestao': row[0], 'id_usuario': row[1], 'id_trilha': row[2], 'data_sugestao': row[3]})
-                return sugestoes
+        return repositorio_sugestoes.listar_colunas(filtros, campos, tamanho_lote)
     except oracledb.Error as e:
         print(f'\n Erro ao ler Sugestões: {e}')
         return None
 
+def iterar_sugestoes(tamanho_lote=TAMANHO_BUSCA_PADRAO, desde=None, scn=None, filtros=None, campos=None):
+    """
+    Percorre as sugestões (mesma ordem de read_sugestao) sem carregar a tabela inteira na memória.
+    Com 'desde', traz apenas os registros com data_sugestao posterior a essa data.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_sugestao_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_sugestoes.iterar(tamanho_lote, scn, filtros, campos, desde)
+
 def update_sugestao(id_sugestao, novo_id_usuario, novo_id_trilha, nova_data_sugestao):
     """Atualiza uma sugestão e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_SUGESTOES
-                    SET id_usuario = :novo_id_usuario, id_trilha = :novo_id_trilha, data_sugestao = :nova_data_sugestao
-                    WHERE id_sugestao = :id_sugestao
-                """
-                cursor.execute(sql, {'novo_id_usuario': novo_id_usuario, 'novo_id_trilha': novo_id_trilha, 'nova_data_sugestao': nova_data_sugestao, 'id_sugestao': id_sugestao})
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_sugestoes.atualizar(id_sugestao, dict(zip(COLUNAS_SUGESTAO[1:], (novo_id_usuario, novo_id_trilha, nova_data_sugestao))))
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Sugestão: {e}')
         return False
+    if atualizados:
+        invalidar('sugestoes')
+    return atualizados > 0
+
+def patch_sugestao(id_sugestao, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) da sugestão e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_sugestoes.atualizar_campos(id_sugestao, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Sugestão: {e}')
+        return False
+    if atualizados:
+        invalidar('sugestoes')
+    return atualizados > 0
 
 def delete_sugestao(id_sugestao):
     """Exclui uma sugestão e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_SUGESTOES WHERE id_sugestao = :id_sugestao"
-                cursor.execute(sql, {'id_sugestao': id_sugestao})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_sugestoes.excluir(id_sugestao)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Sugestão: {e}')
         return False
-
-def exportar_sugestoes_json():
-    """Exporta as sugestões para um arquivo JSON e retorna True em caso de sucesso."""
+    if excluidos:
+        invalidar('sugestoes')
+    return excluidos > 0
+
+def delete_sugestao_many(ids, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui várias sugestões em uma única transação.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_sugestoes.excluir_lote(ids, tamanho_lote=tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Sugestões em lote: {e}')
+        return None
+    if resultado['excluidos']:
+        invalidar('sugestoes')
+    return resultado
+
+def exportar_sugestoes_json(caminho='sugestoes.json', formato='indentado', compactar=False):
+    """
+    Exporta as sugestões para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
     print('\n Exportando dados das sugestões para JSON...')
-    sugestoes = read_sugestao()
-    if sugestoes is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not sugestoes:
-        print(" Nenhuma sugestão cadastrada para exportar.")
-        return True
-
     try:
-        with open('sugestoes.json', 'w', encoding='utf-8') as f:
-            json.dump(sugestoes, f, ensure_ascii=False, indent=4, default=converter_hora)
-        print(' Dados exportados com sucesso para sugestoes.json.')
-        return True
-    except (IOError, TypeError) as e:
+        quantidade, destino = exportar_registros(iterar_sugestoes(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhuma sugestão cadastrada para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_sugestao():
     while True:
         print('\n**Menu - Sugestões**')
@@ -1,6 +1,7 @@
 
 import unittest
 import requests
+import json
 import uuid
 from datetime import datetime, timedelta
 
@@ -134,5 +135,205 @@ class TestApiIntegration(unittest.TestCase):
         response = requests.put(f"{self.BASE_URL}/modulos/{self.created_ids['id_modulo']}", json=modulo_data)
         self.assertEqual(response.status_code, 200, f"Erro ao atualizar módulo: {response.text}")
 
+    def test_06_keyset_pagination(self):
+        """Testa a paginação keyset (limit/cursor) em todas as listagens."""
+        endpoints = ['usuarios', 'trilhas', 'modulos', 'progressos', 'sugestoes', 'previsoes']
+        for endpoint in endpoints:
+            with self.subTest(endpoint=endpoint):
+                response = requests.get(f"{self.BASE_URL}/{endpoint}", params={'limit': 1})
+                self.assertEqual(response.status_code, 200)
+                pagina = response.json()
+                self.assertLessEqual(len(pagina['items']), 1)
+                if pagina['next']:
+                    response = requests.get(f"{self.BASE_URL}/{endpoint}", params={'limit': 1, 'cursor': pagina['next']})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response.json()['items'], pagina['items'])
+        response = requests.get(f"{self.BASE_URL}/usuarios", params={'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_07_bulk_insert(self):
+        """Testa a inserção em lote com uma linha inválida que não interrompe as demais."""
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        dados = [
+            {"id_sugestao": ids[0], "id_usuario": self.created_ids['id_usuario'], "id_trilha": self.created_ids['id_trilha'], "data_sugestao": agora},
+            {"id_sugestao": str(uuid.uuid4()), "id_usuario": self.created_ids['id_usuario']},
+            {"id_sugestao": ids[1], "id_usuario": self.created_ids['id_usuario'], "id_trilha": self.created_ids['id_trilha'], "data_sugestao": agora},
+        ]
+        response = requests.post(f"{self.BASE_URL}/sugestoes/bulk", params={'chunk_size': 1}, json=dados)
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertEqual(response.json()['inserted'], 2)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1])
+        for id_sugestao in ids:
+            requests.delete(f"{self.BASE_URL}/sugestoes/{id_sugestao}")
+
+    def test_08_streaming(self):
+        """Testa as listagens em fluxo (array JSON e NDJSON)."""
+        response = requests.get(f"{self.BASE_URL}/usuarios", params={'stream': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), list)
+        response = requests.get(f"{self.BASE_URL}/usuarios", headers={'Accept': 'application/x-ndjson'}, stream=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+        ids = [json.loads(linha)['id_usuario'] for linha in response.iter_lines() if linha]
+        self.assertIn(self.created_ids['id_usuario'], ids)
+
+    def test_09_conditional_get(self):
+        """Testa o GET condicional (ETag) nas listagens de catálogo."""
+        for endpoint in ['trilhas', 'modulos', 'sugestoes']:
+            with self.subTest(endpoint=endpoint):
+                response = requests.get(f"{self.BASE_URL}/{endpoint}")
+                self.assertEqual(response.status_code, 200)
+                etag = response.headers['ETag']
+                response = requests.get(f"{self.BASE_URL}/{endpoint}", headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_10_get_by_id(self):
+        """Testa a leitura de um único registro pelo id em todos os recursos."""
+        endpoints = {'id_usuario': 'usuarios', 'id_trilha': 'trilhas', 'id_modulo': 'modulos',
+                     'id_progresso': 'progressos', 'id_sugestao': 'sugestoes', 'id_previsao': 'previsoes'}
+        for campo, endpoint in endpoints.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertIn(campo, self.created_ids, "Pré-requisito falhou: entidade não foi criada.")
+                response = requests.get(f"{self.BASE_URL}/{endpoint}/{self.created_ids[campo]}")
+                self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+                self.assertEqual(response.json()[campo], self.created_ids[campo])
+                response = requests.get(f"{self.BASE_URL}/{endpoint}/{uuid.uuid4()}")
+                self.assertEqual(response.status_code, 404)
+
+    def test_11_filters_and_fields(self):
+        """Testa filtros por coluna e a seleção de campos nas listagens."""
+        self.assertIn('id_usuario', self.created_ids, "Pré-requisito falhou: usuário não foi criado.")
+        response = requests.get(f"{self.BASE_URL}/progressos", params={'id_usuario': self.created_ids['id_usuario']})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertTrue(all(p['id_usuario'] == self.created_ids['id_usuario'] for p in response.json()))
+
+        response = requests.get(f"{self.BASE_URL}/modulos", params={'fields': 'id_modulo,titulo', 'limit': 5})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        for modulo in response.json()['items']:
+            self.assertEqual(set(modulo), {'id_modulo', 'titulo'})
+
+        self.assertEqual(requests.get(f"{self.BASE_URL}/usuarios", params={'senha': 'x'}).status_code, 400)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/usuarios", params={'fields': 'inexistente'}).status_code, 400)
+
+    def test_12_dashboard(self):
+        """Testa o painel agregado do usuário."""
+        self.assertIn('id_usuario', self.created_ids, "Pré-requisito falhou: usuário não foi criado.")
+        response = requests.get(f"{self.BASE_URL}/usuarios/{self.created_ids['id_usuario']}/dashboard")
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        painel = response.json()
+        self.assertEqual(painel['usuario']['id_usuario'], self.created_ids['id_usuario'])
+        self.assertNotIn('senha', painel['usuario'])
+        for secao in ('modulos_concluidos', 'xp_por_trilha', 'sugestoes', 'previsao'):
+            self.assertIn(secao, painel)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/usuarios/{uuid.uuid4()}/dashboard").status_code, 404)
+
+    def test_13_leaderboard(self):
+        """Testa o ranking de XP geral e por área."""
+        response = requests.get(f"{self.BASE_URL}/leaderboard", params={'k': 5})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        itens = response.json()['items']
+        self.assertLessEqual(len(itens), 5)
+        self.assertEqual([i['xp'] for i in itens], sorted((i['xp'] for i in itens), reverse=True))
+        response = requests.get(f"{self.BASE_URL}/leaderboard", params={'area': 'datascience', 'k': 5, 'id_usuario': self.created_ids.get('id_usuario')})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertTrue(all(i['area'] == 'datascience' for i in response.json()['items']))
+        self.assertEqual(requests.get(f"{self.BASE_URL}/leaderboard", params={'k': 0}).status_code, 400)
+
+    def test_14_complete_module(self):
+        """Testa a conclusão de módulo: soma o XP uma única vez."""
+        self.assertIn('id_usuario', self.created_ids, "Pré-requisito falhou: usuário não foi criado.")
+        self.assertIn('id_modulo', self.created_ids, "Pré-requisito falhou: módulo não foi criado.")
+        url = f"{self.BASE_URL}/usuarios/{self.created_ids['id_usuario']}/modulos/{self.created_ids['id_modulo']}/complete"
+        primeira = requests.post(url)
+        self.assertIn(primeira.status_code, (200, 201), f"Erro: {primeira.text}")
+        segunda = requests.post(url)
+        self.assertEqual(segunda.status_code, 200, f"Erro: {segunda.text}")
+        self.assertEqual(segunda.json()['xp_ganho'], 0)
+        self.assertEqual(segunda.json()['xp_total'], primeira.json()['xp_total'])
+        self.assertEqual(requests.post(f"{self.BASE_URL}/usuarios/{uuid.uuid4()}/modulos/{self.created_ids['id_modulo']}/complete").status_code, 404)
+
+    def test_15_queue_status(self):
+        """Testa as métricas da fila de gravação de progressos."""
+        response = requests.get(f"{self.BASE_URL}/status/fila")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profundidade', response.json()['progressos'])
+    def test_16_live_suggestions(self):
+        """Testa as sugestões calculadas na hora pelo índice em memória."""
+        self.assertIn('id_usuario', self.created_ids, "Pré-requisito falhou: usuário não foi criado.")
+        response = requests.get(f"{self.BASE_URL}/usuarios/{self.created_ids['id_usuario']}/sugestoes/live", params={'k': 3})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertLessEqual(len(response.json()['items']), 3)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/usuarios/{uuid.uuid4()}/sugestoes/live").status_code, 404)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/usuarios/{self.created_ids['id_usuario']}/sugestoes/live", params={'k': 0}).status_code, 400)
+    def test_17_search(self):
+        """Testa a busca textual e o autocompletar."""
+        response = requests.get(f"{self.BASE_URL}/search", params={'q': 'trilha', 'limit': 5})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertLessEqual(len(response.json()['items']), 5)
+        response = requests.get(f"{self.BASE_URL}/search/autocomplete", params={'q': 'tri'})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertIsInstance(response.json()['sugestoes'], list)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/search").status_code, 400)
+    def test_18_bulk_upsert(self):
+        """Testa o upsert em lote: inserir, reenviar igual e alterar."""
+        trilha = {'id_trilha': str(uuid.uuid4()), 'titulo': 'Trilha Sincronizada', 'descricao': 'Snapshot',
+                  'area_foco': 'TI', 'xp_trilha': 100, 'data_criacao': '2024-01-01 10:00:00'}
+        url = f"{self.BASE_URL}/trilhas/bulk"
+        self.assertEqual(requests.put(url, json=[trilha]).json()['inserted'], 1)
+        self.assertEqual(requests.put(url, json=[trilha]).json()['unchanged'], 1)
+        trilha['titulo'] = 'Trilha Sincronizada Alterada'
+        response = requests.put(url, json=[trilha])
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertEqual(response.json()['updated'], 1)
+        requests.delete(f"{self.BASE_URL}/trilhas/{trilha['id_trilha']}")
+    def test_19_patch(self):
+        """Testa a atualização parcial de uma única coluna."""
+        self.assertIn('id_usuario', self.created_ids, "Pré-requisito falhou: usuário não foi criado.")
+        url = f"{self.BASE_URL}/usuarios/{self.created_ids['id_usuario']}"
+        response = requests.patch(url, json={'xp_total': 777})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertEqual(requests.get(url).json()['xp_total'], 777)
+        self.assertEqual(requests.patch(url, json={'coluna_inexistente': 1}).status_code, 400)
+        self.assertEqual(requests.patch(f"{self.BASE_URL}/usuarios/{uuid.uuid4()}", json={'xp_total': 1}).status_code, 404)
+    def test_20_cascade_and_bulk_delete(self):
+        """Testa a exclusão de um usuário com os seus dependentes e a exclusão em lote."""
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        usuario = {'id_usuario': str(uuid.uuid4()), 'nome': 'Usuario Temporario', 'username': 'temp', 'email': 'temp@test.com',
+                   'senha': 'password', 'area': 'it', 'acessibilidade': 'nenhuma', 'modulos_concluidos': 0, 'xp_total': 0,
+                   'data_cadastro': agora}
+        self.assertEqual(requests.post(f"{self.BASE_URL}/usuarios", json=usuario).status_code, 201)
+        previsao = {'id_previsao': str(uuid.uuid4()), 'id_usuario': usuario['id_usuario'], 'taxa_sucesso': 0.5,
+                    'categoria': 'media', 'data_previsao': agora}
+        self.assertEqual(requests.post(f"{self.BASE_URL}/previsoes", json=previsao).status_code, 201)
+        response = requests.delete(f"{self.BASE_URL}/usuarios/{usuario['id_usuario']}", params={'cascade': 1})
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertEqual(response.json()['dependents']['previsoes'], 1)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/previsoes/{previsao['id_previsao']}").status_code, 404)
+
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        trilhas = [{'id_trilha': i, 'titulo': 'Trilha Temporaria', 'descricao': 'Lote', 'area_foco': 'TI',
+                    'xp_trilha': 10, 'data_criacao': agora} for i in ids]
+        self.assertEqual(requests.post(f"{self.BASE_URL}/trilhas/bulk", json=trilhas).json()['inserted'], 3)
+        ausente = str(uuid.uuid4())
+        response = requests.post(f"{self.BASE_URL}/trilhas/delete", json=ids + [ausente])
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        self.assertEqual(response.json()['deleted'], 3)
+        self.assertEqual(response.json()['not_found'], [ausente])
+        self.assertEqual(requests.post(f"{self.BASE_URL}/trilhas/delete", json={'ids': ids}).status_code, 400)
+    def test_21_columnar_format(self):
+        """Testa a listagem no formato por colunas contra a listagem normal."""
+        params = {'fields': 'id_progresso,id_usuario'}
+        normal = requests.get(f"{self.BASE_URL}/progressos", params=params)
+        response = requests.get(f"{self.BASE_URL}/progressos", params=dict(params, format='columnar'))
+        self.assertEqual(response.status_code, 200, f"Erro: {response.text}")
+        corpo = response.json()
+        self.assertEqual(corpo['columns'], ['id_progresso', 'id_usuario'])
+        self.assertEqual(corpo['count'], len(normal.json()))
+        self.assertEqual([dict(zip(corpo['columns'], valores)) for valores in zip(*corpo['values'])], normal.json())
+        self.assertEqual(requests.get(f"{self.BASE_URL}/progressos", params={'format': 'columnar', 'limit': 5}).status_code, 400)
+        self.assertEqual(requests.get(f"{self.BASE_URL}/progressos", params={'format': 'xml'}).status_code, 400)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
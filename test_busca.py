@@ -0,0 +1,67 @@
+import unittest
+
+from busca import IndiceBusca, MODULO, TRILHA, definir_modulo, definir_trilha, montar_indice_busca, termos
+
+TRILHAS = [
+    {'id_trilha': 't1', 'titulo': 'Introdução à Programação', 'descricao': 'Lógica e algoritmos em Python'},
+    {'id_trilha': 't2', 'titulo': 'Comunicação', 'descricao': 'Comunicação não violenta para líderes'},
+]
+MODULOS = [
+    {'id_modulo': 'm1', 'id_trilha': 't1', 'titulo': 'Funções', 'descricao': 'Como criar funções',
+     'conteudo': 'Em Python, funções são definidas com def.'},
+    {'id_modulo': 'm2', 'id_trilha': 't2', 'titulo': 'Escuta ativa', 'descricao': 'Ouvir',
+     'conteudo': 'A comunicação começa pela escuta.'},
+]
+
+
+def ids(resultados):
+    return [(tipo, id_documento) for tipo, id_documento, _, _ in resultados]
+
+
+class TestIndiceBusca(unittest.TestCase):
+    """Testes do índice invertido da busca textual."""
+
+    def setUp(self):
+        self.indice = montar_indice_busca(TRILHAS, MODULOS)
+
+    def test_termos_sem_acentos_e_palavras_vazias(self):
+        self.assertEqual(termos('Introdução à Programação'), ['introducao', 'programacao'])
+
+    def test_busca_ignora_acentos(self):
+        self.assertEqual(ids(self.indice.buscar('introducao')), [(TRILHA, 't1')])
+        self.assertEqual(ids(self.indice.buscar('FUNÇÕES')), [(MODULO, 'm1')])
+
+    def test_titulo_vale_mais_que_conteudo(self):
+        self.assertEqual(ids(self.indice.buscar('comunicação')), [(TRILHA, 't2'), (MODULO, 'm2')])
+
+    def test_ultima_palavra_como_prefixo(self):
+        self.assertEqual(ids(self.indice.buscar('progr')), [(TRILHA, 't1')])
+        self.assertEqual(ids(self.indice.buscar('pyth', tipo=MODULO)), [(MODULO, 'm1')])
+
+    def test_ultima_palavra_vazia_incompleta(self):
+        # 'com' é palavra vazia, mas no fim da consulta pode ser o começo de 'comunicação', como no autocompletar
+        self.assertCountEqual(ids(self.indice.buscar('com')), [(TRILHA, 't2'), (MODULO, 'm2')])
+        self.assertEqual(self.indice.completar('funções com', 1), ['comunicacao'])
+        self.assertIn((TRILHA, 't2'), ids(self.indice.buscar('funções com')))
+        self.assertEqual(ids(self.indice.buscar('escuta de'))[0], (MODULO, 'm2'))
+
+    def test_completar(self):
+        self.assertEqual(self.indice.completar('com', 1), ['comunicacao'])
+        self.assertEqual(self.indice.completar('xyz'), [])
+
+    def test_alteracoes_incrementais(self):
+        definir_modulo(self.indice, dict(MODULOS[1], conteudo='Feedback construtivo.'))
+        self.assertEqual(ids(self.indice.buscar('feedback')), [(MODULO, 'm2')])
+        self.assertEqual(ids(self.indice.buscar('escuta')), [(MODULO, 'm2')])
+        self.indice.remover(TRILHA, 't2')
+        self.assertNotIn('comunicacao', self.indice.completar('comu'))
+        self.assertEqual(self.indice.buscar('comunicação'), [])
+        definir_trilha(self.indice, TRILHAS[1])
+        self.assertEqual(ids(self.indice.buscar('violenta')), [(TRILHA, 't2')])
+
+    def test_indice_vazio(self):
+        self.assertEqual(IndiceBusca().buscar('python'), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
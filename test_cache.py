@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import cache
+from cache import CacheTTL
+
+
+class TestCacheTTL(unittest.TestCase):
+    """Testes do cache em memória com TTL e descarte LRU."""
+
+    def setUp(self):
+        self.cargas = 0
+
+    def carregar(self, valor='dados'):
+        self.cargas += 1
+        return valor
+
+    def test_acerto_depois_da_primeira_carga(self):
+        cache = CacheTTL('teste_acerto', ttl=60)
+        self.assertEqual(cache.obter('chave', self.carregar), 'dados')
+        self.assertEqual(cache.obter('chave', self.carregar), 'dados')
+        self.assertEqual(self.cargas, 1)
+        estatisticas = cache.estatisticas()
+        self.assertEqual((estatisticas['acertos'], estatisticas['falhas']), (1, 1))
+
+    def test_expiracao(self):
+        cache = CacheTTL('teste_expiracao', ttl=0.01)
+        cache.obter('chave', self.carregar)
+        time.sleep(0.02)
+        cache.obter('chave', self.carregar)
+        self.assertEqual(self.cargas, 2)
+
+    def test_descarte_lru(self):
+        cache = CacheTTL('teste_lru', ttl=60, tamanho_maximo=2)
+        cache.obter('a', self.carregar)
+        cache.obter('b', self.carregar)
+        cache.obter('a', self.carregar)
+        cache.obter('c', self.carregar)
+        cache.obter('a', self.carregar)
+        self.assertEqual(self.cargas, 3)
+        cache.obter('b', self.carregar)
+        self.assertEqual(self.cargas, 4)
+        self.assertEqual(cache.estatisticas()['descartes'], 2)
+
+    def test_invalidacao(self):
+        cache = CacheTTL('teste_invalidacao', ttl=60)
+        cache.obter('chave', self.carregar)
+        cache.invalidar()
+        cache.obter('chave', self.carregar)
+        self.assertEqual(self.cargas, 2)
+
+    def test_erro_nao_e_guardado(self):
+        cache = CacheTTL('teste_erro', ttl=60)
+        cache.obter('chave', lambda: self.carregar(None))
+        cache.obter('chave', lambda: self.carregar(None))
+        self.assertEqual(self.cargas, 2)
+
+
+class TestBarramentoInvalidacao(unittest.TestCase):
+    """Testes da invalidação entre processos pelo arquivo de versão."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.patch = mock.patch.object(cache, 'DIRETORIO_VERSOES', self.diretorio.name)
+        self.patch.start()
+        self.cargas = 0
+
+    def tearDown(self):
+        self.patch.stop()
+        self.diretorio.cleanup()
+
+    def carregar(self):
+        self.cargas += 1
+        return self.cargas
+
+    def test_invalidacao_publicada_por_outro_processo(self):
+        catalogo = CacheTTL('teste_barramento', ttl=60, namespace='catalogo_teste')
+        self.assertEqual(catalogo.obter('todos', self.carregar), 1)
+        self.assertEqual(catalogo.obter('todos', self.carregar), 1)
+        codigo = 'import cache, sys; cache.DIRETORIO_VERSOES = sys.argv[1]; cache.publicar_invalidacao("catalogo_teste")'
+        subprocess.run([sys.executable, '-c', codigo, self.diretorio.name], check=True,
+                       cwd=os.path.dirname(os.path.abspath(cache.__file__)))
+        self.assertEqual(catalogo.obter('todos', self.carregar), 2)
+
+    def test_invalidar_limpa_caches_locais_do_namespace(self):
+        catalogo = CacheTTL('teste_invalidar_ns', ttl=60, namespace='outro_teste')
+        catalogo.obter('todos', self.carregar)
+        versao_anterior = cache.versao('outro_teste')
+        cache.invalidar('outro_teste')
+        self.assertNotEqual(cache.versao('outro_teste'), versao_anterior)
+        self.assertEqual(catalogo.obter('todos', self.carregar), 2)
+
+    def test_leitor_recebe_as_chaves_alteradas(self):
+        leitor = cache.LeitorAlteracoes('registro_teste')
+        self.assertIsNone(leitor.novas())
+        leitor.marcar()
+        cache.invalidar('registro_teste', ['a', 'b'])
+        self.assertEqual(leitor.novas(), ['a', 'b'])
+        self.assertEqual(leitor.novas(), [])
+
+    def test_escrita_sem_chaves_exige_remontar(self):
+        leitor = cache.LeitorAlteracoes('registro_teste')
+        leitor.marcar()
+        cache.invalidar('registro_teste')
+        self.assertIsNone(leitor.novas())
+
+    def test_indice_incremental_aplica_alteracoes_e_remonta(self):
+        aplicadas = []
+        indice = cache.IndiceIncremental(('trilhas_teste', 'modulos_teste'), self.carregar,
+                                         lambda montado, trilhas, modulos: aplicadas.append((montado, trilhas, modulos)), ttl=60)
+        with indice.usar() as montado:
+            self.assertEqual(montado, 1)
+        cache.invalidar('modulos_teste', ['m1'])
+        with indice.usar() as montado:
+            self.assertEqual(montado, 1)
+        self.assertEqual(aplicadas, [(1, [], ['m1'])])
+        cache.invalidar('trilhas_teste')  # escrita sem chaves: remonta
+        with indice.usar() as montado:
+            self.assertEqual(montado, 2)
+
+    def test_indice_incremental_remonta_se_aplicar_falhar(self):
+        def aplicar(montado, trilhas, modulos):
+            raise RuntimeError('falha ao reler')
+        indice = cache.IndiceIncremental(('trilhas_teste', 'modulos_teste'), self.carregar, aplicar, ttl=60)
+        with indice.usar():
+            pass
+        cache.invalidar('trilhas_teste', ['t1'])
+        with self.assertRaises(RuntimeError):
+            with indice.usar():
+                pass
+        with indice.usar() as montado:
+            self.assertEqual(montado, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import oracledb
+import fila
+import utilitarios
+from fila import FilaEscrita
+from test_utilitarios import CursorRegistrador
+
+
+class GravadorLocal:
+    """Função de gravação falsa com o mesmo retorno dos create_*_many."""
+    def __init__(self, falhas=0, liberar=None):
+        self.lotes = []
+        self.falhas = falhas
+        self.liberar = liberar
+
+    def __call__(self, lote):
+        if self.liberar is not None:
+            self.liberar.wait(5)
+        if self.falhas:
+            self.falhas -= 1
+            return None
+        self.lotes.append(list(lote))
+        return {'inseridos': len(lote), 'erros': []}
+
+
+class ConexaoInstavel(CursorRegistrador):
+    """Conexão falsa em que os primeiros 'falhas' executemany falham inteiros, como numa queda do banco."""
+    def __init__(self, falhas):
+        super().__init__()
+        self.falhas = falhas
+
+    def executemany(self, sql, dados, batcherrors=False):
+        if self.falhas:
+            self.falhas -= 1
+            raise oracledb.DatabaseError('DPI-1080: connection was closed')
+        self.executados.append((sql, dados))
+
+    def getbatcherrors(self):
+        return []
+
+
+class TestFilaEscrita(unittest.TestCase):
+    """Testes da fila de escrita em segundo plano."""
+
+    def tearDown(self):
+        for nome in [n for n in fila.FILAS if n.startswith('teste')]:
+            fila.FILAS.pop(nome).encerrar(1)
+
+    def test_grava_em_lotes_pelo_tamanho(self):
+        gravador = GravadorLocal()
+        f = FilaEscrita('teste_lote', gravador, tamanho_lote=3, intervalo=5)
+        for i in range(6):
+            self.assertTrue(f.enfileirar({'id': i}))
+        prazo = time.monotonic() + 2
+        while f.estatisticas()['gravados'] < 6 and time.monotonic() < prazo:
+            time.sleep(0.01)
+        self.assertEqual([len(lote) for lote in gravador.lotes], [3, 3])
+        self.assertEqual(f.estatisticas()['profundidade'], 0)
+
+    def test_grava_lote_incompleto_pelo_intervalo(self):
+        gravador = GravadorLocal()
+        f = FilaEscrita('teste_intervalo', gravador, tamanho_lote=100, intervalo=0.05)
+        f.enfileirar({'id': 1})
+        time.sleep(0.5)
+        self.assertEqual(gravador.lotes, [[{'id': 1}]])
+
+    def test_encerrar_esvazia_a_fila(self):
+        gravador = GravadorLocal()
+        f = FilaEscrita('teste_encerrar', gravador, tamanho_lote=100, intervalo=10)
+        for i in range(5):
+            f.enfileirar({'id': i})
+        f.encerrar(5)
+        self.assertEqual(sum(len(lote) for lote in gravador.lotes), 5)
+        self.assertFalse(f.enfileirar({'id': 99}))
+
+    def test_fila_cheia_rejeita(self):
+        liberar = threading.Event()
+        f = FilaEscrita('teste_cheia', GravadorLocal(liberar=liberar), tamanho_maximo=2, tamanho_lote=1, espera=0.01)
+        resultados = [f.enfileirar({'id': i}) for i in range(5)]
+        self.assertIn(False, resultados)
+        self.assertGreater(f.estatisticas()['rejeitados_fila_cheia'], 0)
+        liberar.set()
+
+    def test_tenta_de_novo_quando_o_banco_falha(self):
+        gravador = GravadorLocal(falhas=1)
+        f = FilaEscrita('teste_falha', gravador, tamanho_lote=1, intervalo=0.01, tentativas=2)
+        f.enfileirar({'id': 1})
+        f.encerrar(5)
+        self.assertEqual(gravador.lotes, [[{'id': 1}]])
+        estatisticas = f.estatisticas()
+        self.assertEqual(estatisticas['lotes'], 2)
+        self.assertEqual(estatisticas['descartados'], 0)
+
+    def test_tenta_de_novo_quando_o_lote_falha_no_banco(self):
+        # inserir_em_lote não lança a falha do lote: as linhas voltam em 'erros' com 'falha_do_lote'
+        conexao = ConexaoInstavel(falhas=1)
+        gravar = lambda lote: utilitarios.inserir_em_lote('LM_TESTE', ('id',), lote)
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            f = FilaEscrita('teste_falha_lote', gravar, tamanho_lote=10, intervalo=0.5, tentativas=2)
+            f.enfileirar({'id': 1})
+            f.enfileirar({'id': 2})
+            f.encerrar(5)
+        self.assertEqual(conexao.executados, [('INSERT INTO LM_TESTE (id) VALUES (:1)', [(1,), (2,)])])
+        estatisticas = f.estatisticas()
+        self.assertEqual((estatisticas['gravados'], estatisticas['erros'], estatisticas['descartados']), (2, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
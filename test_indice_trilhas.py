@@ -0,0 +1,56 @@
+import unittest
+
+from indice_trilhas import IndiceTrilhas, montar_indice
+
+TRILHAS = [
+    {'id_trilha': 't1', 'titulo': 'Python básico', 'descricao': 'Introdução à programação', 'area_foco': 'TI'},
+    {'id_trilha': 't2', 'titulo': 'Python para dados', 'descricao': 'Análise com Pandas', 'area_foco': 'TI'},
+    {'id_trilha': 't3', 'titulo': 'Liderança', 'descricao': 'Gestão de equipes', 'area_foco': 'RH'},
+]
+MODULOS = [
+    {'id_modulo': 'm1', 'id_trilha': 't1', 'titulo': 'Variáveis em Python', 'descricao': None, 'tipo': 'video', 'adaptacao_necessaria': 'n'},
+    {'id_modulo': 'm2', 'id_trilha': 't1', 'titulo': 'Funções em Python', 'descricao': None, 'tipo': 'video', 'adaptacao_necessaria': 'n'},
+    {'id_modulo': 'm3', 'id_trilha': 't2', 'titulo': 'Pandas em Python', 'descricao': None, 'tipo': 'texto', 'adaptacao_necessaria': 'n'},
+    {'id_modulo': 'm4', 'id_trilha': 't3', 'titulo': 'Feedback para a equipe', 'descricao': None, 'tipo': 'texto', 'adaptacao_necessaria': 'libras'},
+]
+
+
+def ids(recomendacoes):
+    return [id_trilha for id_trilha, _ in recomendacoes]
+
+
+class TestIndiceTrilhas(unittest.TestCase):
+    """Testes do índice em memória das sugestões ao vivo."""
+
+    def setUp(self):
+        self.indice = montar_indice(TRILHAS, MODULOS)
+
+    def test_conteudo_parecido_com_o_concluido(self):
+        self.assertEqual(ids(self.indice.recomendar(['m1'], area='Vendas', k=1)), ['t1'])
+        self.assertEqual(ids(self.indice.recomendar(['m1', 'm2'], area='Vendas', k=1)), ['t2'])
+
+    def test_trilhas_concluidas_nao_sao_sugeridas(self):
+        self.assertNotIn('t1', ids(self.indice.recomendar(['m1', 'm2'], k=3)))
+
+    def test_usuario_novo_usa_area_e_acessibilidade(self):
+        self.assertEqual(ids(self.indice.recomendar([], area='Rh', acessibilidade='visual', k=1)), ['t3'])
+        self.assertEqual(sorted(ids(self.indice.recomendar([], area='TI', k=2))), ['t1', 't2'])
+
+    def test_alteracoes_incrementais(self):
+        self.indice.definir_modulo({'id_modulo': 'm3', 'id_trilha': 't3', 'titulo': 'Pandas em Python', 'descricao': None,
+                                    'tipo': 'texto', 'adaptacao_necessaria': 'n'})
+        self.assertEqual(self.indice.modulos_total[self.indice.posicao['t2']], 0)
+        self.assertEqual(self.indice.modulos_total[self.indice.posicao['t3']], 2)
+        self.indice.remover_trilha('t1')
+        self.assertNotIn('t1', ids(self.indice.recomendar([], k=3)))
+        linha = self.indice.posicao['t3']
+        self.indice.definir_trilha({'id_trilha': 't4', 'titulo': 'Nova', 'descricao': '', 'area_foco': 'TI'})
+        self.assertEqual(len(self.indice), 3)
+        self.assertEqual(self.indice.posicao['t3'], linha)
+
+    def test_indice_vazio(self):
+        self.assertEqual(IndiceTrilhas().recomendar(['m1']), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from pontuacao import calcular_pontuacao, id_previsao_calculada
+
+
+def atributos(**valores):
+    """Atributos de um único usuário, com valores padrão para o que não for informado."""
+    padrao = {'area': 'TI', 'xp': 0.0, 'concluidos': 0.0, 'dias_cadastro': 30.0, 'dias_primeira': np.nan, 'dias_ultima': np.nan}
+    padrao.update(valores)
+    return {chave: np.array([valor], dtype=object if chave == 'area' else float) for chave, valor in padrao.items()}
+
+
+def juntar(*usuarios):
+    return {chave: np.concatenate([u[chave] for u in usuarios]) for chave in usuarios[0]}
+
+
+class TestPontuacao(unittest.TestCase):
+    """Testes do cálculo vetorizado de taxa_sucesso e categoria."""
+
+    def test_usuario_ativo_pontua_mais_que_inativo(self):
+        ativo = atributos(xp=500, concluidos=12, dias_primeira=21, dias_ultima=1)
+        inativo = atributos(xp=0, concluidos=0)
+        taxas, categorias = calcular_pontuacao(juntar(ativo, inativo), {'TI': (250.0, 250.0)})
+        self.assertGreater(taxas[0], taxas[1])
+        self.assertEqual(list(categorias), ['alta', 'baixa'])
+        self.assertTrue(np.all((taxas >= 0) & (taxas <= 1)))
+
+    def test_xp_relativo_a_area(self):
+        # Mesmo XP e progresso, mas em uma área onde a média é menor
+        na_media = atributos(area='TI', xp=300, concluidos=3, dias_primeira=14, dias_ultima=2)
+        acima = atributos(area='RH', xp=300, concluidos=3, dias_primeira=14, dias_ultima=2)
+        taxas, _ = calcular_pontuacao(juntar(na_media, acima), {'TI': (300.0, 100.0), 'RH': (100.0, 100.0)})
+        self.assertGreater(taxas[1], taxas[0])
+
+    def test_area_desconhecida_e_nula(self):
+        taxas, categorias = calcular_pontuacao(juntar(atributos(area=None), atributos(area='X')), {})
+        self.assertEqual(len(taxas), 2)
+        self.assertEqual(len(categorias), 2)
+
+    def test_id_previsao_estavel(self):
+        self.assertEqual(id_previsao_calculada('u1'), id_previsao_calculada('u1'))
+        self.assertNotEqual(id_previsao_calculada('u1'), id_previsao_calculada('u2'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
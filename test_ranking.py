@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import ranking
+from ranking import Placar, montar_ranking
+
+
+class TestPlacar(unittest.TestCase):
+    """Testes da classificação ordenada usada pelo ranking."""
+
+    def test_topo_e_posicao(self):
+        placar = Placar()
+        placar.definir('a', 10)
+        placar.definir('b', 30)
+        placar.definir('c', 20)
+        self.assertEqual(placar.topo(2), [('b', 30), ('c', 20)])
+        self.assertEqual(placar.posicao('a'), (3, 10))
+        self.assertIsNone(placar.posicao('x'))
+
+    def test_somar_reposiciona(self):
+        placar = Placar()
+        placar.definir('a', 10)
+        placar.definir('b', 20)
+        placar.somar('a', 15)
+        self.assertEqual(placar.topo(1), [('a', 25)])
+        self.assertEqual(len(placar), 2)
+
+    def test_empate_pelo_id(self):
+        placar = Placar()
+        placar.definir('b', 10)
+        placar.definir('a', 10)
+        self.assertEqual(placar.topo(2), [('a', 10), ('b', 10)])
+
+    def test_remover(self):
+        placar = Placar()
+        placar.definir('a', 10)
+        placar.remover('a')
+        placar.remover('a')
+        self.assertEqual(placar.topo(5), [])
+
+
+LINHAS = [
+    {'id_usuario': 'u1', 'nome': 'Ana', 'area': 'TI', 'id_trilha': 't1', 'xp': 30},
+    {'id_usuario': 'u1', 'nome': 'Ana', 'area': 'TI', 'id_trilha': 't2', 'xp': 10},
+    {'id_usuario': 'u2', 'nome': 'Bia', 'area': 'RH', 'id_trilha': 't1', 'xp': 50},
+    {'id_usuario': 'u3', 'nome': 'Caio', 'area': 'TI', 'id_trilha': None, 'xp': None},
+]
+
+
+class TestRanking(unittest.TestCase):
+    """Testes da montagem do ranking e da aplicação incremental dos eventos."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.eventos = mock.patch.object(ranking, 'ARQUIVO_EVENTOS', os.path.join(self.diretorio.name, 'ranking.eventos'))
+        self.eventos.start()
+        self.consultas = []
+        self.durante_consulta = None  # chamado entre a marca no arquivo de eventos e a consulta
+        def consultar(sql, params):
+            self.consultas.append(sql)
+            if self.durante_consulta:
+                self.durante_consulta()
+            return iter(LINHAS)
+        self.consulta = mock.patch.object(ranking, 'iterar_consulta', consultar)
+        self.consulta.start()
+        self.scn = mock.patch.object(ranking, 'obter_scn', lambda: 100)
+        self.scn.start()
+        self.contados_no_scn = set()
+        self.conferencia = mock.patch.object(ranking, 'ler_por_ids',
+                                             lambda sql, chave, ids, params: {i: {} for i in ids if i in self.contados_no_scn})
+        self.conferencia.start()
+        self.modulo = mock.patch.object(ranking, 'read_modulo_by_id', lambda id_modulo: {'id_trilha': 't2', 'xp_recompensa': 45})
+        self.modulo.start()
+        ranking._ranking = None
+
+    def tearDown(self):
+        self.conferencia.stop()
+        self.scn.stop()
+        self.modulo.stop()
+        self.consulta.stop()
+        self.eventos.stop()
+        self.diretorio.cleanup()
+        ranking._ranking = None
+
+    def test_montar_ranking(self):
+        r = montar_ranking(LINHAS)
+        self.assertEqual(r.geral.topo(3), [('u2', 50), ('u1', 40), ('u3', 0)])
+        self.assertEqual(r.placar(area='TI').topo(5), [('u1', 40), ('u3', 0)])
+        self.assertEqual(r.placar(id_trilha='t1').topo(5), [('u2', 50), ('u1', 30)])
+        self.assertEqual(r.placar(area='inexistente').topo(5), [])
+
+    def test_conclusoes_atualizam_sem_nova_consulta(self):
+        self.assertEqual(ranking.read_ranking(k=1)['items'][0]['id_usuario'], 'u2')
+        ranking.registrar_conclusoes([('p1', 'u3', 'm1'), ('p2', 'u3', 'm2')], time.time())
+        resultado = ranking.read_ranking(area='TI', k=1, id_usuario='u3')
+        self.assertEqual(resultado['items'][0], {'posicao': 1, 'id_usuario': 'u3', 'nome': 'Caio', 'area': 'TI', 'xp': 90})
+        self.assertEqual(ranking.read_ranking(id_trilha='t2', k=5)['items'][0]['xp'], 90)
+        self.assertEqual(len(self.consultas), 1)
+
+    def test_usuario_desconhecido_remonta(self):
+        ranking.read_ranking()
+        ranking.registrar_conclusoes([('p1', 'novo', 'm1')], time.time())
+        ranking.read_ranking()
+        self.assertEqual(len(self.consultas), 2)
+
+    def test_evento_ja_contado_na_remontagem_nao_soma_de_novo(self):
+        # Dois progressos gravados enquanto o ranking é remontado: 'p1' já entrou na consulta
+        # (estava no SCN lido) e 'p2' não; só o XP de 'p2' deve ser somado pelos eventos
+        instante = time.time()
+        def gravar_durante_a_consulta():
+            ranking.registrar_conclusoes([('p1', 'u1', 'm1'), ('p2', 'u3', 'm2')], instante)
+        self.durante_consulta = gravar_durante_a_consulta
+        self.contados_no_scn = {'p1'}
+        ranking.read_ranking()
+        self.durante_consulta = None
+        resultado = ranking.read_ranking(k=3)
+        self.assertEqual([(i['id_usuario'], i['xp']) for i in resultado['items']], [('u2', 50), ('u3', 45), ('u1', 40)])
+        # Eventos de depois da remontagem são somados sem conferir o banco
+        ranking.registrar_conclusoes([('p3', 'u1', 'm1')], time.time() + 1)
+        self.contados_no_scn = {'p1', 'p3'}
+        self.assertEqual(ranking.read_ranking(id_usuario='u1')['usuario']['xp'], 85)
+        self.assertEqual(len(self.consultas), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
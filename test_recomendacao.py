@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import recomendacao
+from recomendacao import ModeloRecomendacao, id_sugestao_calculada
+
+
+def modelo():
+    """Catálogo com quatro trilhas de dois módulos cada; t4 tem todos os módulos adaptados."""
+    conclusoes = [
+        ('u1', 't1', 2), ('u1', 't2', 2),
+        ('u2', 't1', 2), ('u2', 't2', 1),
+        ('u3', 't1', 2),
+    ]
+    return ModeloRecomendacao(['t1', 't2', 't3', 't4'], ['TI', 'TI', 'RH', 'RH'], [2, 2, 2, 2], [0, 0, 0, 2], conclusoes)
+
+
+class TestModeloRecomendacao(unittest.TestCase):
+    """Testes do cálculo das recomendações com matrizes esparsas."""
+
+    def test_conclusao_em_conjunto(self):
+        # Quem fez t1 costuma fazer t2 também
+        recomendacoes = modelo().recomendar([{'id_usuario': 'u3', 'area': 'RH', 'acessibilidade': 'nenhuma'}], n=1)
+        self.assertEqual([t for t, _ in recomendacoes[0]], ['t2'])
+
+    def test_trilhas_concluidas_nao_sao_sugeridas(self):
+        recomendacoes = modelo().recomendar([{'id_usuario': 'u1', 'area': 'TI', 'acessibilidade': None}], n=4)
+        self.assertEqual(sorted(t for t, _ in recomendacoes[0]), ['t3', 't4'])
+
+    def test_usuario_novo_usa_area_e_acessibilidade(self):
+        usuarios = [{'id_usuario': 'novo', 'area': 'RH', 'acessibilidade': 'visual'},
+                    {'id_usuario': 'novo2', 'area': 'ti', 'acessibilidade': 'nenhuma'}]
+        recomendacoes = modelo().recomendar(usuarios, n=2)
+        self.assertEqual(recomendacoes[0][0][0], 't4')
+        self.assertEqual(sorted(t for t, _ in recomendacoes[1]), ['t1', 't2'])
+
+    def test_pontuacoes_em_ordem(self):
+        for trilhas in modelo().recomendar([{'id_usuario': 'u2', 'area': 'TI', 'acessibilidade': 'n'}], n=3):
+            pontuacoes = [p for _, p in trilhas]
+            self.assertEqual(pontuacoes, sorted(pontuacoes, reverse=True))
+
+    def test_catalogo_vazio(self):
+        vazio = ModeloRecomendacao([], [], [], [], [])
+        self.assertEqual(vazio.recomendar([{'id_usuario': 'u1', 'area': 'TI', 'acessibilidade': 'n'}]), [[]])
+
+    def test_id_sugestao_por_posicao(self):
+        self.assertEqual(id_sugestao_calculada('u1', 0), id_sugestao_calculada('u1', 0))
+        self.assertNotEqual(id_sugestao_calculada('u1', 0), id_sugestao_calculada('u1', 1))
+
+
+
+class TestGerarSugestoes(unittest.TestCase):
+    """Testes da gravação das sugestões calculadas (com o banco substituído por funções falsas)."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.gravados, self.excluidos, self.invalidados = [], [], []
+        usuarios = [{'id_usuario': 'u1', 'area': 'TI', 'acessibilidade': 'n'}, {'id_usuario': 'u3', 'area': 'TI', 'acessibilidade': 'n'}]
+        consultas = {recomendacao.SQL_ULTIMA_CONCLUSAO: [{'ultima': None}], recomendacao.SQL_USUARIOS: usuarios}
+        def mesclar(tabela, colunas, chaves, registros):
+            self.gravados.extend(registros)
+            return {'gravados': len(registros), 'erros': []}
+        self.substituicoes = [
+            mock.patch.object(recomendacao, 'iterar_consulta', lambda sql, params=None: iter(consultas[sql])),
+            mock.patch.object(recomendacao, 'carregar_modelo', modelo),
+            mock.patch.object(recomendacao, 'mesclar_em_lote', mesclar),
+            mock.patch.object(recomendacao, '_excluir_sobras', lambda ids: self.excluidos.extend(ids) or len(ids)),
+            mock.patch.object(recomendacao, 'invalidar', self.invalidados.append),
+        ]
+        for substituicao in self.substituicoes:
+            substituicao.start()
+
+    def tearDown(self):
+        for substituicao in self.substituicoes:
+            substituicao.stop()
+        self.diretorio.cleanup()
+
+    def gerar(self, n):
+        return recomendacao.gerar_sugestoes(n=n, arquivo_marcas=os.path.join(self.diretorio.name, 'marcas.json'))
+
+    def test_posicoes_em_segundos_inteiros(self):
+        self.gerar(2)
+        datas = [r['data_sugestao'] for r in self.gravados if r['id_usuario'] == 'u3']
+        self.assertEqual(len(datas), 2)
+        self.assertEqual(datas[0].microsecond, 0)
+        self.assertEqual((datas[0] - datas[1]).total_seconds(), 1)
+        self.assertEqual(self.invalidados, ['sugestoes'])
+
+    def test_so_exclusao_de_sobras_invalida_o_cache(self):
+        # u1 concluiu t1 e t2: com n=4 sobram posições sem trilha, que são excluídas
+        with mock.patch.object(recomendacao, 'mesclar_em_lote', lambda *args: {'gravados': 0, 'erros': []}):
+            resultado = self.gerar(4)
+        self.assertEqual(resultado['gravados'], 0)
+        self.assertIn(id_sugestao_calculada('u1', 3), self.excluidos)
+        self.assertEqual(self.invalidados, ['sugestoes'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
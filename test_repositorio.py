@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import repositorio
+from repositorio import Repositorio, REPOSITORIOS
+from test_utilitarios import CursorRegistrador
+
+
+class TestRepositorio(unittest.TestCase):
+    """Testes do repositório genérico montado a partir dos metadados da tabela."""
+
+    def setUp(self):
+        self.repositorio = Repositorio('LM_TESTE', ('id_teste', 'nome', 'data'), 'data', {'nome': 'texto', 'data': 'data'})
+
+    def tearDown(self):
+        REPOSITORIOS.pop('LM_TESTE', None)
+
+    def test_sql_gerado_pelos_metadados(self):
+        self.assertEqual(self.repositorio.sql_inserir, 'INSERT INTO LM_TESTE (id_teste, nome, data) VALUES (:id_teste, :nome, :data)')
+        self.assertEqual(self.repositorio.sql_excluir, 'DELETE FROM LM_TESTE WHERE id_teste = :chave')
+        self.assertIs(REPOSITORIOS['LM_TESTE'], self.repositorio)
+
+    def test_inserir_e_excluir(self):
+        conexao = CursorRegistrador()
+        with mock.patch.object(repositorio, 'getConnection', lambda: conexao):
+            self.repositorio.inserir({'nome': 'Ana', 'data': None, 'id_teste': 'a', 'extra': 1})
+            self.assertEqual(self.repositorio.excluir('a'), 1)
+        self.assertEqual(conexao.executados[0][1], {'id_teste': 'a', 'nome': 'Ana', 'data': None})
+        self.assertEqual(conexao.executados[1][1], {'chave': 'a'})
+
+    def test_iterar_com_filtros_campos_e_desde(self):
+        chamadas = []
+        with mock.patch.object(repositorio, 'iterar_consulta', lambda sql, params, *args: chamadas.append((sql, params)) or iter([])):
+            desde = datetime(2024, 1, 1)
+            self.repositorio.iterar(filtros={'nome': 'Ana'}, campos=['nome'], desde=desde)
+            self.repositorio.iterar(filtros={'nome': 'Bia'}, campos=['nome'], desde=desde)
+        sql, params = chamadas[0]
+        self.assertEqual(sql, 'SELECT nome FROM LM_TESTE WHERE nome = :filtro_0 AND data > :desde ORDER BY data')
+        self.assertEqual(params, {'filtro_0': 'Ana', 'desde': desde})
+        # Mesmos filtros e campos com outros valores reaproveitam o mesmo texto de SQL
+        self.assertIs(chamadas[0][0], chamadas[1][0])
+
+    def test_listar_colunas_usa_a_mesma_consulta(self):
+        chamadas = []
+        registrar = lambda sql, params, *args: chamadas.append((sql, params, args)) or iter([])
+        with mock.patch.object(repositorio, 'iterar_consulta', registrar), mock.patch.object(repositorio, 'ler_colunas', registrar):
+            self.repositorio.iterar(filtros={'nome': 'Ana'}, campos=['nome'])
+            self.repositorio.listar_colunas({'nome': 'Ana'}, ['nome'], 2000, 10)
+        self.assertEqual(chamadas[0][:2], chamadas[1][:2])
+        self.assertEqual(chamadas[1][2], (2000, 10))
+
+    def test_atualizar_regrava_todas_as_colunas_menos_a_chave(self):
+        with mock.patch.object(repositorio, 'atualizar_parcial', lambda *args: args):
+            tabela, colunas, chave, valor, campos = self.repositorio.atualizar('a', {'nome': 'Ana', 'data': None})
+        self.assertEqual((tabela, chave, valor, campos), ('LM_TESTE', 'id_teste', 'a', {'nome': 'Ana', 'data': None}))
+
+    def test_filtro_invalido(self):
+        with self.assertRaises(ValueError):
+            self.repositorio.iterar(filtros={'senha': 'x'})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,347 @@
+import base64
+import json
+import os
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import oracledb
+import utilitarios
+
+
+class ConexaoLocal:
+    """Conexão falsa devolvida pelo pool local."""
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.busy -= 1
+
+
+class PoolLocal:
+    """Pool falso com os mesmos atributos do oracledb.ConnectionPool."""
+    def __init__(self, **kwargs):
+        self.parametros = kwargs
+        self.min = kwargs['min']
+        self.max = kwargs['max']
+        self.increment = kwargs['increment']
+        self.wait_timeout = kwargs['wait_timeout']
+        self.timeout = kwargs['timeout']
+        self.ping_interval = kwargs['ping_interval']
+        self.opened = self.min
+        self.busy = 0
+        self.fechado = False
+
+    def acquire(self):
+        self.busy += 1
+        self.opened = max(self.opened, self.busy)
+        return ConexaoLocal(self)
+
+    def close(self, force=False):
+        self.fechado = True
+
+
+class DriverLocal:
+    """Driver falso com a interface usada por utilitarios.obter_pool."""
+    POOL_GETMODE_TIMEDWAIT = 'timedwait'
+
+    def __init__(self):
+        self.pools = []
+
+    def create_pool(self, **kwargs):
+        pool = PoolLocal(**kwargs)
+        self.pools.append(pool)
+        return pool
+
+
+class TestPoolConexoes(unittest.TestCase):
+    """Testes do pool de conexões usando um driver local no lugar do oracledb."""
+
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {
+            'ORACLE_USER': 'teste', 'ORACLE_PASSWORD': 'teste', 'ORACLE_DSN': 'localhost/teste',
+            'ORACLE_POOL_MIN': '2', 'ORACLE_POOL_MAX': '8', 'ORACLE_POOL_WAIT_TIMEOUT': '1.5',
+        })
+        self.env.start()
+        self.driver = DriverLocal()
+        self.driver_original = utilitarios.driver
+        utilitarios.configurar_driver(self.driver)
+
+    def tearDown(self):
+        utilitarios.configurar_driver(self.driver_original)
+        self.env.stop()
+
+    def test_pool_criado_uma_vez_e_reutilizado(self):
+        with utilitarios.getConnection():
+            pass
+        with utilitarios.getConnection():
+            pass
+        self.assertEqual(len(self.driver.pools), 1)
+        parametros = self.driver.pools[0].parametros
+        self.assertEqual(parametros['min'], 2)
+        self.assertEqual(parametros['max'], 8)
+        self.assertEqual(parametros['wait_timeout'], 1500)
+        self.assertEqual(parametros['getmode'], DriverLocal.POOL_GETMODE_TIMEDWAIT)
+
+    def test_estatisticas_pool(self):
+        self.assertFalse(utilitarios.estatisticas_pool()['ativo'])
+        conn = utilitarios.getConnection()
+        estatisticas = utilitarios.estatisticas_pool()
+        self.assertTrue(estatisticas['ativo'])
+        self.assertEqual(estatisticas['busy'], 1)
+        conn.close()
+        self.assertEqual(utilitarios.estatisticas_pool()['busy'], 0)
+
+    def test_fechar_pool(self):
+        utilitarios.getConnection().close()
+        pool = self.driver.pools[0]
+        utilitarios.fechar_pool()
+        self.assertTrue(pool.fechado)
+        self.assertFalse(utilitarios.estatisticas_pool()['ativo'])
+
+    def test_pool_descartado_apos_fork(self):
+        utilitarios.getConnection().close()
+        utilitarios._descartar_pool_herdado()
+        utilitarios.getConnection().close()
+        self.assertEqual(len(self.driver.pools), 2)
+
+    def test_sem_credenciais(self):
+        with mock.patch.dict(os.environ, {'ORACLE_USER': ''}):
+            with self.assertRaises(oracledb.Error):
+                utilitarios.getConnection()
+
+    def test_falha_ao_obter_conexao_propaga(self):
+        utilitarios.getConnection().close()
+        with mock.patch.object(PoolLocal, 'acquire', side_effect=oracledb.DatabaseError('DPY-4005: pool esgotado')):
+            with self.assertRaises(oracledb.DatabaseError):
+                with utilitarios.getConnection():
+                    pass
+
+
+class CursorRegistrador:
+    """Conexão e cursor falsos que guardam os comandos executados."""
+    def __init__(self, rowcount=1):
+        self.executados = []
+        self.rowcount = rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        self.executados.append((sql, params))
+
+    def executemany(self, sql, dados, arraydmlrowcounts=False):
+        self.executados.append((sql, dados))
+        if 'falha' in sql:
+            raise oracledb.DatabaseError('ORA-02292')
+        self.linhas = [0 if valor == 'ausente' else self.rowcount for valor, in dados]
+
+    def getarraydmlrowcounts(self):
+        return self.linhas
+
+    def commit(self):
+        self.confirmado = True
+
+    def rollback(self):
+        self.desfeito = True
+
+
+class TestAtualizacaoParcial(unittest.TestCase):
+    """Testes do UPDATE montado só com as colunas enviadas."""
+
+    COLUNAS = ('id', 'nome', 'xp', 'data')
+
+    def test_atualiza_so_as_colunas_enviadas(self):
+        conexao = CursorRegistrador()
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            self.assertEqual(utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'a', {'xp': 5, 'nome': 'Ana'}), 1)
+        sql, params = conexao.executados[0]
+        self.assertEqual(sql, 'UPDATE T SET nome = :nome, xp = :xp WHERE id = :chave')
+        self.assertEqual(params, {'nome': 'Ana', 'xp': 5, 'chave': 'a'})
+
+    def test_mesmo_conjunto_de_colunas_reaproveita_o_sql(self):
+        conexao = CursorRegistrador()
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'a', {'xp': 5})
+            utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'b', {'xp': 7})
+        self.assertIs(conexao.executados[0][0], conexao.executados[1][0])
+
+    def test_campos_invalidos(self):
+        with self.assertRaisesRegex(ValueError, 'Campos inválidos: senha'):
+            utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'a', {'senha': 'x'})
+        with self.assertRaisesRegex(ValueError, 'Campos inválidos: id'):
+            utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'a', {'id': 'b'})
+        with self.assertRaises(ValueError):
+            utilitarios.atualizar_parcial('T', self.COLUNAS, 'id', 'a', {})
+
+
+class TestSincronizacaoEmLote(unittest.TestCase):
+    """Testes do upsert em lote que não regrava linhas iguais às do banco."""
+
+    def setUp(self):
+        self.banco = {'a': {'id': 'a', 'valor': 10.0}, 'b': {'id': 'b', 'valor': 2.0}}
+        self.mesclados = []
+        def mesclar(tabela, colunas, chaves, registros, tamanho_lote):
+            self.mesclados.append([r['id'] for r in registros])
+            erros = [{'indice': i, 'erro': 'ORA-12899'} for i, r in enumerate(registros) if r['valor'] == 'grande']
+            return {'gravados': len(registros) - len(erros), 'erros': erros}
+        self.patches = [
+            mock.patch.object(utilitarios, 'ler_por_ids', lambda sql, chave, ids: {i: self.banco[i] for i in ids if i in self.banco}),
+            mock.patch.object(utilitarios, 'mesclar_em_lote', mesclar),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_conta_inseridos_atualizados_e_inalterados(self):
+        registros = [{'id': 'a', 'valor': 10}, {'id': 'b', 'valor': 3}, {'id': 'c', 'valor': 1}, {'id': 'a', 'valor': 5}]
+        resultado = utilitarios.sincronizar_em_lote('T', ('id', 'valor'), 'id', registros)
+        self.assertEqual((resultado['inseridos'], resultado['atualizados'], resultado['inalterados']), (1, 1, 1))
+        self.assertEqual(self.mesclados, [['b', 'c']])
+        self.assertEqual(resultado['chaves_gravadas'], ['b', 'c'])
+        self.assertEqual([e['indice'] for e in resultado['erros']], [3])
+
+    def test_erros_do_banco_voltam_com_o_indice_original(self):
+        registros = [{'id': 'a', 'valor': 10}, {'id': 'x', 'valor': 1}, {'id': 'y', 'valor': 'grande'}]
+        resultado = utilitarios.sincronizar_em_lote('T', ('id', 'valor'), 'id', registros, tamanho_lote=2)
+        self.assertEqual(self.mesclados, [['x'], ['y']])
+        self.assertEqual(resultado['erros'], [{'indice': 2, 'erro': 'ORA-12899'}])
+        self.assertEqual(resultado['inseridos'], 1)
+
+    def test_hash_conteudo(self):
+        self.assertEqual(utilitarios.hash_conteudo([10.0, datetime(2024, 1, 1)]), utilitarios.hash_conteudo([10, datetime(2024, 1, 1)]))
+        self.assertNotEqual(utilitarios.hash_conteudo(['a', None]), utilitarios.hash_conteudo(['a', '']))
+
+
+class TestExclusaoEmLote(unittest.TestCase):
+    """Testes da exclusão em lote com dependentes em uma única transação."""
+
+    def test_exclui_dependentes_antes_e_conta_os_nao_encontrados(self):
+        conexao = CursorRegistrador(rowcount=2)
+        dependentes = (('filhos', 'DELETE FROM F WHERE id_pai = :1'),)
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            resultado = utilitarios.excluir_em_lote('P', 'id', ['a', 'ausente', 'a', 'b'], dependentes, tamanho_lote=2)
+        self.assertEqual([sql for sql, _ in conexao.executados],
+                         ['DELETE FROM F WHERE id_pai = :1'] * 2 + ['DELETE FROM P WHERE id = :1'] * 2)
+        self.assertEqual(conexao.executados[0][1], [('a',), ('ausente',)])
+        self.assertEqual(resultado['chaves_excluidas'], ['a', 'b'])
+        self.assertEqual(resultado['nao_encontrados'], ['ausente'])
+        self.assertEqual(resultado['dependentes'], {'filhos': 4})
+        self.assertTrue(conexao.confirmado)
+
+    def test_falha_desfaz_tudo(self):
+        conexao = CursorRegistrador()
+        dependentes = (('filhos', 'DELETE FROM F WHERE id_pai = :1'), ('falha', 'DELETE FROM falha WHERE id = :1'))
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            with self.assertRaises(oracledb.DatabaseError):
+                utilitarios.excluir_em_lote('P', 'id', ['a'], dependentes)
+        self.assertTrue(conexao.desfeito)
+        self.assertFalse(hasattr(conexao, 'confirmado'))
+
+
+
+class CursorLeitura:
+    """Conexão e cursor falsos que devolvem 'linhas' em blocos de arraysize."""
+    def __init__(self, nomes, linhas):
+        self.description = [(nome.upper(),) for nome in nomes]
+        self.linhas = list(linhas)
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.buscas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        self.configuracao = (self.arraysize, self.prefetchrows)
+        self.executado = (sql, params)
+
+    def fetchall(self):
+        return self.fetchmany()
+
+    def fetchmany(self):
+        self.buscas += 1
+        bloco, self.linhas = self.linhas[:self.arraysize], self.linhas[self.arraysize:]
+        return bloco
+
+
+class TestLeituraPorColunas(unittest.TestCase):
+    """Testes da leitura compacta por colunas e do tamanho das buscas do cursor."""
+
+    LINHAS = [('a', 1), ('b', 2), ('c', 3)]
+
+    def test_colunas_iguais_as_linhas_em_dicionario(self):
+        conexao = CursorLeitura(('id', 'xp'), self.LINHAS)
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            colunas = utilitarios.ler_colunas('SELECT id, xp FROM T', tamanho_lote=2)
+        self.assertEqual(colunas, {'id': ['a', 'b', 'c'], 'xp': [1, 2, 3]})
+        self.assertEqual(conexao.buscas, 3)
+        conexao = CursorLeitura(('id', 'xp'), self.LINHAS)
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            linhas = list(utilitarios.iterar_consulta('SELECT id, xp FROM T'))
+        self.assertEqual([dict(zip(colunas, valores)) for valores in zip(*colunas.values())], linhas)
+
+    def test_arraysize_e_prefetch_configurados_antes_do_execute(self):
+        conexao = CursorLeitura(('id',), [])
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            self.assertEqual(utilitarios.ler_colunas('SELECT id FROM T', tamanho_lote=1000, prefetch=50), {'id': []})
+            self.assertEqual(conexao.configuracao, (1000, 50))
+            with mock.patch.object(utilitarios, 'PREFETCH_PADRAO', 0):
+                conexao.prefetchrows = 2
+                list(utilitarios.iterar_consulta('SELECT id FROM T', tamanho_lote=10))
+            self.assertEqual(conexao.configuracao, (10, 2))
+
+
+
+class TestPaginacaoKeyset(unittest.TestCase):
+    """Testes do cursor opaco e da paginação keyset com valores de ordenação nulos."""
+
+    def test_cursor_ida_e_volta(self):
+        data = datetime(2024, 5, 1, 10, 30)
+        self.assertEqual(utilitarios.decodificar_cursor(utilitarios.codificar_cursor([data, 'a']), 2), [data, 'a'])
+        self.assertEqual(utilitarios.decodificar_cursor(utilitarios.codificar_cursor([None, 'a']), 2), [None, 'a'])
+
+    def test_cursor_invalido(self):
+        for valores in ([{'$dt': 1}, 'x'], [{'$dt': 'ontem'}, 'x'], [{'outro': 1}, 'x'], [[1], 'x'], ['x'], [1, 2, 3], {'a': 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+            with self.assertRaises(ValueError):
+                utilitarios.decodificar_cursor(cursor, 2)
+        with self.assertRaises(ValueError):
+            utilitarios.ler_pagina('T', ('id', 'data'), 'data', 'id', 10, 'não é base64!')
+
+    def test_pagina_continua_pelas_linhas_sem_ordenacao(self):
+        conexao = CursorLeitura(('id', 'data'), [('a', datetime(2024, 1, 1)), ('b', None), ('c', None)])
+        with mock.patch.object(utilitarios, 'getConnection', lambda: conexao):
+            linhas, proximo = utilitarios.ler_pagina('T', ('id', 'data'), 'data', 'id', 2)
+            self.assertIn('ORDER BY data NULLS LAST, id', conexao.executado[0])
+            self.assertEqual([l['id'] for l in linhas], ['a', 'b'])
+            self.assertEqual(utilitarios.decodificar_cursor(proximo, 2), [None, 'b'])
+            utilitarios.ler_pagina('T', ('id', 'data'), 'data', 'id', 2, proximo)
+        sql, params = conexao.executado
+        self.assertIn('(data IS NULL AND id > :chave)', sql)
+        self.assertEqual((params['chave'], 'ordem' in params), ('b', False))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
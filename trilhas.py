@@ -1,91 +1,215 @@
 import oracledb
-import json
-from utilitarios import getConnection, validar_string, validar_inteiro, validar_id, validar_data, converter_hora
+from cache import CacheTTL, invalidar
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_string, validar_inteiro, validar_id, validar_data, converter_hora
 from datetime import datetime
 
+COLUNAS_TRILHA = ('id_trilha', 'titulo', 'descricao', 'area_foco', 'xp_trilha', 'data_criacao')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_TRILHA = {'area_foco': 'texto', 'xp_trilha': 'numero', 'data_criacao': 'data'}
+
+# Linhas que dependem da trilha, excluídas antes dela com cascade (os progressos dos seus módulos primeiro)
+DEPENDENTES_TRILHA = (
+    ('progressos', "DELETE FROM LM_PROGRESSOS WHERE id_modulo IN (SELECT id_modulo FROM LM_MODULOS WHERE id_trilha = :1)"),
+    ('sugestoes', "DELETE FROM LM_SUGESTOES WHERE id_trilha = :1"),
+    ('modulos', "DELETE FROM LM_MODULOS WHERE id_trilha = :1"),
+)
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_trilhas = Repositorio('LM_TRILHAS', COLUNAS_TRILHA, 'data_criacao', FILTROS_TRILHA, DEPENDENTES_TRILHA)
+
+# Cache da listagem completa (catálogo muda pouco e é lido o tempo todo)
+cache_trilhas = CacheTTL('trilhas', namespace='trilhas')
+cache_trilhas_por_id = CacheTTL('trilhas_por_id', namespace='trilhas')
+
 def create_trilha(id_trilha, titulo, descricao, area_foco, xp_trilha, data_criacao):
     """Insere uma nova trilha no banco e retorna True em caso de sucesso."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_TRILHAS (id_trilha, titulo, descricao, area_foco, xp_trilha, data_criacao)
-                    VALUES (:id_trilha, :titulo, :descricao, :area_foco, :xp_trilha, :data_criacao)
-                """
-                cursor.execute(sql, {'id_trilha': id_trilha, 'titulo': titulo, 'descricao': descricao, 'area_foco': area_foco, 'xp_trilha': xp_trilha, 'data_criacao': data_criacao})
-                conn.commit()
-                return True
+        repositorio_trilhas.inserir(dict(zip(COLUNAS_TRILHA, (id_trilha, titulo, descricao, area_foco, xp_trilha, data_criacao))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Trilha: {e}')
         return False
+    invalidar('trilhas', [id_trilha])
+    return True
+
+def create_trilha_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere várias trilhas (dicionários com as mesmas chaves de create_trilha) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_trilhas.inserir_lote(registros, tamanho_lote)
+        if resultado['inseridos']:
+            rejeitados = {erro['indice'] for erro in resultado['erros']}
+            invalidar('trilhas', [r['id_trilha'] for i, r in enumerate(registros) if i not in rejeitados])
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Trilhas em lote: {e}')
+        return None
+
+def upsert_trilha_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza várias trilhas (dicionários com as mesmas chaves de create_trilha) com MERGE em lotes,
+    sem regravar as que chegaram iguais às do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_trilhas.sincronizar_lote(registros, tamanho_lote)
+        if resultado['chaves_gravadas']:
+            invalidar('trilhas', resultado['chaves_gravadas'])
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Trilhas em lote: {e}')
+        return None
+
+def _read_trilha_banco():
+    """Lê todas as trilhas direto do banco e retorna uma lista de dicionários."""
+    try:
+        return repositorio_trilhas.listar()
+    except oracledb.Error as e:
+        print(f'\n Erro ao buscar Trilhas: {e}')
+        return None
+
+def read_trilha(filtros=None, campos=None):
+    """
+    Lê todas as trilhas e retorna uma lista de dicionários, passando pelo cache do catálogo.
+    Com 'filtros' ou 'campos' (ver read_trilha_pagina) a consulta é feita no banco, sem cache.
+    """
+    if filtros or campos:
+        try:
+            return repositorio_trilhas.listar(filtros, campos)
+        except oracledb.Error as e:
+            print(f'\n Erro ao ler Trilhas: {e}')
+            return None
+    return cache_trilhas.obter('todas', _read_trilha_banco)
+
+def _read_trilha_by_id_banco(id_trilha):
+    """Lê a trilha pelo id direto do banco."""
+    try:
+        return repositorio_trilhas.por_id(id_trilha)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Trilha {id_trilha}: {e}')
+        return None
+
+def read_trilha_by_id(id_trilha):
+    """Lê a trilha pelo id (passando pelo cache) e retorna um dicionário, ou None se não existir ou houver erro."""
+    return cache_trilhas_por_id.obter(id_trilha, lambda: _read_trilha_by_id_banco(id_trilha))
 
-def read_trilha():
-    """Lê todas as trilhas do banco e retorna uma lista de dicionários."""
+def read_trilha_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página das trilhas ordenada por data de criação e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_TRILHA e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT id_trilha, titulo, descricao, area_foco, xp_trilha, data_criacao FROM LM_TRILHAS ORDER BY data_criacao")
-                colunas = [col[0].lower() for col in cursor.description]
-                trilhas = [dict(zip(colunas, row)) for row in cursor.fetchall()]
-                return trilhas
+        return repositorio_trilhas.pagina(limite, cursor, filtros, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao buscar Trilhas: {e}')
         return None
 
+def read_trilha_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê as trilhas (mesma ordem, filtros e campos de read_trilha) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_trilhas.listar_colunas(filtros, campos, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Trilhas: {e}')
+        return None
+
+def iterar_trilhas(tamanho_lote=TAMANHO_BUSCA_PADRAO, scn=None, filtros=None, campos=None):
+    """
+    Percorre as trilhas (mesma ordem de read_trilha) sem carregar a tabela inteira na memória.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_trilha_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_trilhas.iterar(tamanho_lote, scn, filtros, campos)
+
 def update_trilha(id_trilha, novo_titulo, nova_descricao, nova_area_foco, nova_xp_trilha, nova_data_criacao):
     """Atualiza uma trilha e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_TRILHAS SET
-                    titulo = :novo_titulo,
-                    descricao = :nova_descricao,
-                    area_foco = :nova_area_foco,
-                    xp_trilha = :nova_xp_trilha,
-                    data_criacao = :nova_data_criacao
-                    WHERE id_trilha = :id_trilha
-                """
-                cursor.execute(sql, {'novo_titulo': novo_titulo, 'nova_descricao': nova_descricao, 'nova_area_foco': nova_area_foco, 'nova_xp_trilha': nova_xp_trilha, 'nova_data_criacao': nova_data_criacao, 'id_trilha': id_trilha})
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_trilhas.atualizar(id_trilha, dict(zip(COLUNAS_TRILHA[1:], (novo_titulo, nova_descricao, nova_area_foco, nova_xp_trilha, nova_data_criacao))))
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Trilha: {e}')
+        return False
+    if atualizados:
+        invalidar('trilhas', [id_trilha])
+    return atualizados > 0
+
+def patch_trilha(id_trilha, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) da trilha e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_trilhas.atualizar_campos(id_trilha, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Trilha: {e}')
         return False
+    if atualizados:
+        invalidar('trilhas', [id_trilha])
+    return atualizados > 0
 
 def delete_trilha(id_trilha):
     """Exclui uma trilha e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_TRILHAS WHERE id_trilha = :id_trilha"
-                cursor.execute(sql, {'id_trilha': id_trilha})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_trilhas.excluir(id_trilha)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Trilha: {e}')
         return False
+    if excluidos:
+        invalidar('trilhas', [id_trilha])
+    return excluidos > 0
+
+def delete_trilha_many(ids, cascade=False, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui várias trilhas em uma única transação. Com 'cascade', exclui antes os módulos delas, os progressos
+    desses módulos e as sugestões das trilhas; sem, a exclusão falha inteira se ainda houver essas linhas.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_trilhas.excluir_lote(ids, cascade, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Trilhas em lote: {e}')
+        return None
+    if resultado['excluidos']:
+        invalidar('trilhas', resultado['chaves_excluidas'])
+    dependentes = resultado['dependentes']
+    if dependentes.get('modulos'):
+        invalidar('modulos')  # sem os ids dos módulos excluídos: os índices em memória são remontados
+    if dependentes.get('progressos'):
+        invalidar('ranking')
+    if dependentes.get('sugestoes'):
+        invalidar('sugestoes')
+    return resultado
 
-def exportar_trilhas_json():
-    """Exporta as trilhas para um arquivo JSON e retorna True em caso de sucesso."""
+def exportar_trilhas_json(caminho='trilhas.json', formato='indentado', compactar=False):
+    """
+    Exporta as trilhas para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
     print('\n Exportando dados das trilhas para JSON...')
-    trilhas = read_trilha()
-    if trilhas is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not trilhas:
-        print(" Nenhuma trilha cadastrada para exportar.")
-        return True
-    
     try:
-        with open('trilhas.json', 'w', encoding='utf-8') as f:
-            json.dump(trilhas, f, ensure_ascii=False, indent=4, default=converter_hora)
-        print(' Dados exportados com sucesso para trilhas.json.')
-        return True
-    except (IOError, TypeError) as e:
+        quantidade, destino = exportar_registros(iterar_trilhas(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhuma trilha cadastrada para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_trilha():
     while True:
         print('\n**Menu - Trilha**')
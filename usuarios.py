@@ -1,103 +1,209 @@
 import oracledb
-import json
-from utilitarios import getConnection, validar_nome, validar_inteiro, validar_email, validar_string, validar_id, validar_data, converter_hora
+from cache import CacheTTL, invalidar
+from exportacao import exportar_registros
+from repositorio import Repositorio
+from utilitarios import TAMANHO_BUSCA_PADRAO, TAMANHO_LOTE_PADRAO, validar_nome, validar_inteiro, validar_email, validar_string, validar_id, validar_data, converter_hora
+
+COLUNAS_USUARIO = ('id_usuario', 'nome', 'username', 'email', 'senha', 'area', 'acessibilidade', 'modulos_concluidos', 'xp_total', 'data_cadastro')
+
+# Filtros aceitos nas listagens: coluna -> tipo (números e datas aceitam também <coluna>_min e <coluna>_max)
+FILTROS_USUARIO = {'username': 'texto', 'email': 'texto', 'area': 'texto', 'acessibilidade': 'texto', 'modulos_concluidos': 'numero', 'xp_total': 'numero', 'data_cadastro': 'data'}
+
+# Colunas do usuário que aparecem no ranking (nome e área)
+CAMPOS_RANKING_USUARIO = {'nome', 'area'}
+
+# Linhas que dependem do usuário, excluídas antes dele com cascade
+DEPENDENTES_USUARIO = (
+    ('progressos', "DELETE FROM LM_PROGRESSOS WHERE id_usuario = :1"),
+    ('sugestoes', "DELETE FROM LM_SUGESTOES WHERE id_usuario = :1"),
+    ('previsoes', "DELETE FROM LM_PREVISOES WHERE id_usuario = :1"),
+)
+
+# Operações da tabela, com o SQL gerado a partir das colunas e filtros acima (ver repositorio.py)
+repositorio_usuarios = Repositorio('LM_USUARIOS', COLUNAS_USUARIO, 'nome', FILTROS_USUARIO, DEPENDENTES_USUARIO)
+
+# Cache das leituras por id (limpo pelas escritas em usuarios, em todos os workers)
+cache_usuarios_por_id = CacheTTL('usuarios_por_id', namespace='usuarios')
 
 def create_usuario(id_usuario, nome, username, email, senha, area, acessibilidade, modulos_concluidos, xp_total, data_cadastro):
     """Insere um novo usuario no banco e retorna True em caso de sucesso."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    INSERT INTO LM_USUARIOS (id_usuario, nome, username, email, senha, area, acessibilidade, modulos_concluidos, xp_total, data_cadastro)
-                    VALUES (:id_usuario, :nome, :username, :email, :senha, :area, :acessibilidade, :modulos_concluidos, :xp_total, :data_cadastro)
-                """
-                cursor.execute(sql, {
-                    'id_usuario': id_usuario, 'nome': nome, 'username': username, 'email': email, 'senha': senha,
-                    'area': area, 'acessibilidade': acessibilidade, 'modulos_concluidos': modulos_concluidos,
-                    'xp_total': xp_total, 'data_cadastro': data_cadastro
-                })
-                conn.commit()
-                return True
+        repositorio_usuarios.inserir(dict(zip(COLUNAS_USUARIO, (id_usuario, nome, username, email, senha, area, acessibilidade, modulos_concluidos, xp_total, data_cadastro))))
     except oracledb.Error as e:
         print(f'\n Erro ao inserir Usuario: {e}')
         return False
+    invalidar('usuarios')
+    invalidar('ranking')
+    return True
+
+def create_usuario_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere vários usuarios (dicionários com as mesmas chaves de create_usuario) em lotes.
+    Retorna {'inseridos': n, 'erros': [...]} com as linhas rejeitadas, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_usuarios.inserir_lote(registros, tamanho_lote)
+        if resultado['inseridos']:
+            invalidar('usuarios')
+            invalidar('ranking')
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao inserir Usuarios em lote: {e}')
+        return None
+
+def upsert_usuario_many(registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere ou atualiza vários usuarios (dicionários com as mesmas chaves de create_usuario) com MERGE em lotes,
+    sem regravar os que chegaram iguais aos do banco. Retorna {'inseridos', 'atualizados', 'inalterados',
+    'chaves_gravadas', 'erros'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_usuarios.sincronizar_lote(registros, tamanho_lote)
+        if resultado['chaves_gravadas']:
+            invalidar('usuarios')
+            invalidar('ranking')
+        return resultado
+    except oracledb.Error as e:
+        print(f'\n Erro ao sincronizar Usuarios em lote: {e}')
+        return None
+
+def read_usuario(filtros=None, campos=None):
+    """
+    Lê e retorna uma lista de todos os usuarios do banco.
+    Com 'filtros' ou 'campos' (ver read_usuario_pagina) a lista é filtrada e projetada no banco.
+    """
+    try:
+        return repositorio_usuarios.listar(filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Usuarios: {e}')
+        return None
+
+def _read_usuario_by_id_banco(id_usuario):
+    """Lê o usuario pelo id direto do banco."""
+    try:
+        return repositorio_usuarios.por_id(id_usuario)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Usuario {id_usuario}: {e}')
+        return None
 
-def read_usuario():
-    """Lê e retorna uma lista de todos os usuarios do banco."""
+def read_usuario_by_id(id_usuario):
+    """Lê o usuario pelo id (passando pelo cache) e retorna um dicionário, ou None se não existir ou houver erro."""
+    return cache_usuarios_por_id.obter(id_usuario, lambda: _read_usuario_by_id_banco(id_usuario))
+
+def read_usuario_pagina(limite=50, cursor=None, filtros=None, campos=None):
+    """
+    Lê uma página dos usuarios ordenada por nome e retorna (lista, proximo_cursor).
+    Aceita os filtros de FILTROS_USUARIO e a lista de 'campos' a buscar.
+    Lança ValueError para cursor, filtros ou campos inválidos.
+    """
+    try:
+        return repositorio_usuarios.pagina(limite, cursor, filtros, campos)
+    except oracledb.Error as e:
+        print(f'\n Erro ao ler Usuarios: {e}')
+        return None
+
+def read_usuario_colunas(filtros=None, campos=None, tamanho_lote=TAMANHO_BUSCA_PADRAO):
+    """
+    Lê os usuários (mesma ordem, filtros e campos de read_usuario) no formato compacto por colunas,
+    {coluna: [valores]}, sem um dicionário por linha. Retorna None em caso de erro.
+    Lança ValueError para filtros ou campos inválidos.
+    """
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "SELECT id_usuario, nome, username, email, senha, area, acessibilidade, modulos_concluidos, xp_total, data_cadastro FROM LM_USUARIOS ORDER BY nome"
-                cursor.execute(sql)
-                usuarios = []
-                for row in cursor.fetchall():
-                    usuarios.append({
-                        'id_usuario': row[0], 'nome': row[1], 'username': row[2], 'email': row[3],
-                        'senha': row[4], 'area': row[5], 'acessibilidade': row[6],
-                        'modulos_concluidos': row[7], 'xp_total': row[8], 'data_cadastro': row[9]
-                    })
-                return usuarios
+        return repositorio_usuarios.listar_colunas(filtros, campos, tamanho_lote)
     except oracledb.Error as e:
         print(f'\n Erro ao ler Usuarios: {e}')
         return None
 
+def iterar_usuarios(tamanho_lote=TAMANHO_BUSCA_PADRAO, scn=None, filtros=None, campos=None):
+    """
+    Percorre os usuarios (mesma ordem de read_usuario) sem carregar a tabela inteira na memória.
+    Com 'scn', lê a tabela como estava nesse SCN (flashback query), para exportações consistentes.
+    'filtros' e 'campos' funcionam como em read_usuario_pagina.
+    Lança oracledb.Error em caso de falha no banco e ValueError para filtros ou campos inválidos.
+    """
+    return repositorio_usuarios.iterar(tamanho_lote, scn, filtros, campos)
+
 def update_usuario(id_usuario, novo_nome, novo_username, novo_email, nova_senha, nova_area, nova_acessibilidade, novo_modulos_concluidos, novo_xp_total, nova_data_cadastro):
     """Atualiza um usuario e retorna True se a atualização for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                    UPDATE LM_USUARIOS
-                    SET nome = :novo_nome, username = :novo_username, email = :novo_email, senha = :nova_senha,
-                        area = :nova_area, acessibilidade = :nova_acessibilidade, modulos_concluidos = :novo_modulos_concluidos,
-                        xp_total = :novo_xp_total, data_cadastro = :nova_data_cadastro
-                    WHERE id_usuario = :id_usuario
-                """
-                cursor.execute(sql, {
-                    'novo_nome': novo_nome, 'novo_username': novo_username, 'novo_email': novo_email,
-                    'nova_senha': nova_senha, 'nova_area': nova_area, 'nova_acessibilidade': nova_acessibilidade,
-                    'novo_modulos_concluidos': novo_modulos_concluidos, 'novo_xp_total': novo_xp_total,
-                    'nova_data_cadastro': nova_data_cadastro, 'id_usuario': id_usuario
-                })
-                conn.commit()
-                return cursor.rowcount > 0
+        atualizados = repositorio_usuarios.atualizar(id_usuario, dict(zip(COLUNAS_USUARIO[1:], (novo_nome, novo_username, novo_email, nova_senha, nova_area, nova_acessibilidade, novo_modulos_concluidos, novo_xp_total, nova_data_cadastro))))
+    except oracledb.Error as e:
+        print(f'\n Erro ao atualizar Usuario: {e}')
+        return False
+    if atualizados:
+        invalidar('usuarios')
+        invalidar('ranking')
+    return atualizados > 0
+
+def patch_usuario(id_usuario, campos):
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) do usuário e retorna True se a atualização for bem-sucedida.
+    Lança ValueError para colunas desconhecidas.
+    """
+    try:
+        atualizados = repositorio_usuarios.atualizar_campos(id_usuario, campos)
     except oracledb.Error as e:
         print(f'\n Erro ao atualizar Usuario: {e}')
         return False
+    if atualizados:
+        invalidar('usuarios')
+        # xp_total e modulos_concluidos não entram no ranking (ele soma os progressos)
+        if CAMPOS_RANKING_USUARIO & campos.keys():
+            invalidar('ranking')
+    return atualizados > 0
 
 def delete_usuario(id_usuario):
     """Exclui um usuario e retorna True se a exclusão for bem-sucedida."""
     try:
-        with getConnection() as conn:
-            with conn.cursor() as cursor:
-                sql = "DELETE FROM LM_USUARIOS WHERE id_usuario = :id_usuario"
-                cursor.execute(sql, {'id_usuario': id_usuario})
-                conn.commit()
-                return cursor.rowcount > 0
+        excluidos = repositorio_usuarios.excluir(id_usuario)
     except oracledb.Error as e:
         print(f'\n Erro ao excluir Usuario: {e}')
         return False
+    if excluidos:
+        invalidar('usuarios')
+        invalidar('ranking')
+    return excluidos > 0
 
-def exportar_usuarios_json():
-    """Exporta os usuarios para um arquivo JSON e retorna True em caso de sucesso."""
-    print('\n Exportando dados dos usuarios para JSON...')
-    usuarios = read_usuario()
-    if usuarios is None:
-        print(' Não foi possível obter os dados para exportar.')
-        return False
-    if not usuarios:
-        print(" Nenhum usuario cadastrado para exportar.")
-        return True
+def delete_usuario_many(ids, cascade=False, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exclui vários usuarios em uma única transação. Com 'cascade', exclui antes os progressos, sugestões
+    e previsões deles; sem, a exclusão falha inteira se algum usuário ainda tiver essas linhas.
+    Retorna {'excluidos', 'chaves_excluidas', 'nao_encontrados', 'dependentes'}, ou None em caso de erro.
+    """
+    try:
+        resultado = repositorio_usuarios.excluir_lote(ids, cascade, tamanho_lote)
+    except oracledb.Error as e:
+        print(f'\n Erro ao excluir Usuarios em lote: {e}')
+        return None
+    if resultado['excluidos']:
+        invalidar('usuarios')
+        invalidar('ranking')
+    if resultado['dependentes'].get('sugestoes'):
+        invalidar('sugestoes')
+    return resultado
 
+def exportar_usuarios_json(caminho='usuarios.json', formato='indentado', compactar=False):
+    """
+    Exporta os usuarios para um arquivo JSON e retorna True em caso de sucesso.
+    Os registros vão do cursor direto para o disco. 'formato' pode ser 'indentado' (padrão),
+    'compacto' ou 'ndjson', e 'compactar' grava o arquivo com gzip.
+    """
+    print('\n Exportando dados dos usuarios para JSON...')
     try:
-        with open('usuarios.json', 'w', encoding='utf-8') as f:
-            json.dump(usuarios, f, ensure_ascii=False, indent=4, default=converter_hora)
-        print(' Dados exportados com sucesso para usuarios.json.')
-        return True
-    except (IOError, TypeError) as e:
+        quantidade, destino = exportar_registros(iterar_usuarios(), caminho, formato, compactar)
+    except oracledb.Error as e:
+        print(f' Não foi possível obter os dados para exportar: {e}')
+        return False
+    except (IOError, TypeError, ValueError) as e:
         print(f' Erro ao escrever o arquivo JSON: {e}')
         return False
 
+    if quantidade == 0:
+        print(" Nenhum usuario cadastrado para exportar.")
+    else:
+        print(f' {quantidade} registros exportados com sucesso para {destino}.')
+    return True
+
 def main_usuario():
     while True:
         print('\n**Menu - Usuario**')
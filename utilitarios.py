@@ -4,6 +4,13 @@ import regex
 import re
 import uuid
 import os
+import atexit
+import threading
+import json
+import base64
+import functools
+import hashlib
+import unicodedata
 from dotenv import load_dotenv
 
 # Carrega as variáveis de ambiente do arquivo .env (se ele existir)
@@ -15,13 +22,43 @@ pip install oracledb
 pip install python-dotenv
 '''
 
-# criar (obter) uma conexão com o banco de dados Oracle
-def getConnection():
+# --- Pool de conexões ---
+# Cada processo mantém um único pool de sessões com o Oracle. O tamanho e os tempos
+# são configuráveis pelo .env:
+#   ORACLE_POOL_MIN, ORACLE_POOL_MAX, ORACLE_POOL_INCREMENT  -> tamanho do pool
+#   ORACLE_POOL_WAIT_TIMEOUT -> segundos máximos esperando uma conexão livre
+#   ORACLE_POOL_TIMEOUT      -> segundos até fechar sessões ociosas acima do mínimo
+#   ORACLE_POOL_PING         -> segundos sem uso a partir dos quais a sessão é testada (ping)
+driver = oracledb
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ler_numero_env(nome, padrao):
+    """Lê uma variável de ambiente numérica, usando o padrão se ela estiver ausente ou inválida."""
+    valor = os.getenv(nome)
+    if not valor:
+        return padrao
+    try:
+        return type(padrao)(valor)
+    except ValueError:
+        print(f"Aviso: valor inválido para {nome} ({valor}). Usando o padrão {padrao}.")
+        return padrao
+
+
+def obter_pool():
     """
-    Obtém uma conexão com o banco de dados Oracle usando credenciais
-    das variáveis de ambiente (lidas de um arquivo .env localmente).
+    Retorna o pool de conexões do processo atual, criando-o na primeira chamada.
+    Retorna None se as credenciais não estiverem definidas; falhas ao criar o pool lançam oracledb.Error.
     """
-    try:
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+
         user = os.getenv("ORACLE_USER")
         password = os.getenv("ORACLE_PASSWORD")
         dsn = os.getenv("ORACLE_DSN")
@@ -32,13 +69,567 @@ def getConnection():
             print("Por favor, crie um arquivo .env na raiz do projeto e adicione as credenciais. Veja o README.md para mais detalhes.")
             return None
 
-        conn = oracledb.connect(user=user, password=password, dsn=dsn)
-        print('Conexão com Oracle DB realizada!')
-        return conn
-    except Exception as e:
-        print(f'Erro ao obter a conexão: {e}')
-        return None
+        _pool = driver.create_pool(
+            user=user, password=password, dsn=dsn,
+            min=ler_numero_env("ORACLE_POOL_MIN", 1),
+            max=ler_numero_env("ORACLE_POOL_MAX", 5),
+            increment=ler_numero_env("ORACLE_POOL_INCREMENT", 1),
+            getmode=driver.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=int(ler_numero_env("ORACLE_POOL_WAIT_TIMEOUT", 5.0) * 1000),
+            timeout=ler_numero_env("ORACLE_POOL_TIMEOUT", 300),
+            ping_interval=ler_numero_env("ORACLE_POOL_PING", 60),
+        )
+        print('Pool de conexões com Oracle DB criado!')
+        return _pool
+
+
+def fechar_pool():
+    """Fecha o pool do processo atual (chamado ao encerrar a aplicação ou o worker)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            return
+        try:
+            _pool.close(force=True)
+        except Exception as e:
+            print(f'Erro ao fechar o pool de conexões: {e}')
+        _pool = None
+
+
+def _descartar_pool_herdado():
+    """
+    Executado no processo filho após um fork (ex.: workers do gunicorn com --preload).
+    O pool herdado pertence ao processo pai, então o filho apenas descarta a referência
+    e cria o seu próprio pool na primeira conexão.
+    """
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_pool_herdado)
+atexit.register(fechar_pool)
+
+
+def configurar_driver(novo_driver):
+    """
+    Substitui o driver usado para criar o pool (por exemplo, um driver local de testes
+    com a mesma interface do oracledb) e descarta o pool atual.
+    """
+    global driver
+    fechar_pool()
+    driver = novo_driver
+
+
+def estatisticas_pool() -> dict:
+    """Retorna os números do pool atual para acompanhar e dimensionar o seu tamanho."""
+    pool = _pool
+    if pool is None:
+        return {"ativo": False, "pid": os.getpid()}
+    return {
+        "ativo": True,
+        "pid": os.getpid(),
+        "min": pool.min,
+        "max": pool.max,
+        "increment": pool.increment,
+        "opened": pool.opened,
+        "busy": pool.busy,
+        "wait_timeout_ms": pool.wait_timeout,
+        "timeout_s": pool.timeout,
+        "ping_interval_s": pool.ping_interval,
+    }
+
+
+# criar (obter) uma conexão com o banco de dados Oracle
+def getConnection():
+    """
+    Obtém uma conexão do pool do processo, que é criado com as credenciais
+    das variáveis de ambiente (lidas de um arquivo .env localmente).
+    Ao sair do bloco 'with', a conexão é devolvida ao pool.
+    Lança oracledb.Error se as credenciais não estiverem definidas ou se a conexão não puder ser
+    obtida (ex.: banco fora do ar ou pool esgotado após ORACLE_POOL_WAIT_TIMEOUT), para que os
+    chamadores tratem a falha como qualquer outro erro do banco.
+    """
+    pool = obter_pool()
+    if pool is None:
+        raise oracledb.InterfaceError('Credenciais do Oracle não definidas (ORACLE_USER, ORACLE_PASSWORD, ORACLE_DSN).')
+    return pool.acquire()
+
+
+def obter_scn():
+    """
+    Retorna o SCN (System Change Number) atual do banco, usado para ler várias tabelas
+    no mesmo instante com 'AS OF SCN'. Usa DBMS_FLASHBACK quando o usuário tem permissão
+    e, caso contrário, TIMESTAMP_TO_SCN. Lança oracledb.Error em caso de falha.
+    """
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute("SELECT DBMS_FLASHBACK.GET_SYSTEM_CHANGE_NUMBER FROM DUAL")
+            except oracledb.DatabaseError:
+                cursor.execute("SELECT TIMESTAMP_TO_SCN(SYSTIMESTAMP) FROM DUAL")
+            return cursor.fetchone()[0]
+
+
+# --- Paginação keyset ---
+def codificar_cursor(valores: list) -> str:
+    """
+    Gera o cursor opaco da próxima página a partir dos valores de ordenação da última linha.
+    Datas são marcadas para voltarem como datetime na decodificação.
+    """
+    serializaveis = [{'$dt': v.isoformat()} if isinstance(v, datetime) else v for v in valores]
+    bruto = json.dumps(serializaveis, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def _valor_cursor(valor):
+    """Converte um valor decodificado do cursor (escalar, null ou {'$dt': data}). Lança ValueError se for inválido."""
+    if isinstance(valor, dict):
+        if set(valor) != {'$dt'} or not isinstance(valor['$dt'], str):
+            raise ValueError('Cursor inválido.')
+        try:
+            return datetime.fromisoformat(valor['$dt'])
+        except ValueError:
+            raise ValueError('Cursor inválido.')
+    if valor is not None and not isinstance(valor, (str, int, float)):
+        raise ValueError('Cursor inválido.')
+    return valor
+
+
+def decodificar_cursor(cursor: str, quantidade: int = None) -> list:
+    """
+    Decodifica um cursor gerado por codificar_cursor, conferindo a 'quantidade' de valores se ela for
+    informada. Lança ValueError se ele for inválido.
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Cursor inválido: {e}')
+    if not isinstance(valores, list) or (quantidade is not None and len(valores) != quantidade):
+        raise ValueError('Cursor inválido.')
+    return [_valor_cursor(v) for v in valores]
+
+
+# --- Filtros e projeção das listagens ---
+def _converter_filtro(nome: str, valor: str, tipo: str):
+    """Converte o valor textual de um filtro para o tipo da coluna. Lança ValueError se for inválido."""
+    try:
+        if tipo == 'numero':
+            return int(valor) if valor.lstrip('-').isdigit() else float(valor)
+        if tipo == 'data':
+            return datetime.fromisoformat(valor)
+        return valor
+    except ValueError:
+        raise ValueError(f'Valor inválido para o filtro {nome}: {valor}')
+
+
+def montar_filtros(filtros_permitidos: dict, filtros: dict = None):
+    """
+    Converte filtros (ex.: vindos da query string) em condições SQL com bind.
+    'filtros_permitidos' mapeia coluna -> tipo ('texto', 'numero' ou 'data'). Toda coluna aceita
+    igualdade (coluna=valor); números e datas aceitam também intervalos (coluna_min / coluna_max).
+    Retorna (condicoes, binds). Lança ValueError para filtros não permitidos ou valores inválidos.
+    """
+    condicoes, binds = [], {}
+    for nome, valor in (filtros or {}).items():
+        coluna, operador = nome, '='
+        if nome.endswith('_min') and nome[:-4] in filtros_permitidos:
+            coluna, operador = nome[:-4], '>='
+        elif nome.endswith('_max') and nome[:-4] in filtros_permitidos:
+            coluna, operador = nome[:-4], '<='
+        tipo = filtros_permitidos.get(coluna)
+        if tipo is None:
+            raise ValueError(f'Filtro não permitido: {nome}')
+        if operador != '=' and tipo == 'texto':
+            raise ValueError(f'O filtro {coluna} não aceita intervalo')
+        bind = f'filtro_{len(binds)}'
+        binds[bind] = _converter_filtro(nome, valor, tipo)
+        condicoes.append(f'{coluna} {operador} :{bind}')
+    return condicoes, binds
+
+
+def projetar_colunas(colunas, campos=None) -> tuple:
+    """
+    Restringe 'colunas' aos 'campos' pedidos (mantendo a ordem da tabela), para que colunas
+    grandes ou sensíveis nem sejam buscadas. Sem 'campos' retorna todas as colunas.
+    Lança ValueError para campos inexistentes.
+    """
+    if not campos:
+        return tuple(colunas)
+    desconhecidos = set(campos) - set(colunas)
+    if desconhecidos:
+        raise ValueError(f"Campos inválidos: {', '.join(sorted(desconhecidos))}")
+    return tuple(c for c in colunas if c in campos)
+
+
+def montar_consulta(tabela: str, colunas, ordem: str, condicoes=(), scn=None) -> str:
+    """Monta um SELECT de 'colunas' em 'tabela' com as condições (AND) e a ordenação informadas."""
+    sql = f"SELECT {', '.join(colunas)} FROM {tabela}"
+    if scn is not None:
+        sql += " AS OF SCN :scn"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    return sql + f" ORDER BY {ordem}"
+
+
+def ler_pagina(tabela: str, colunas, coluna_ordem: str, coluna_chave: str, limite: int, cursor: str = None,
+               condicoes=(), params: dict = None):
+    """
+    Lê uma página de 'tabela' ordenada por (coluna_ordem, coluna_chave) com paginação keyset:
+    cada página começa logo depois da última linha da anterior, sem OFFSET, então o custo
+    não cresce com a profundidade. 'condicoes'/'params' vêm de montar_filtros.
+    Linhas com coluna_ordem nula vêm no fim (NULLS LAST), ordenadas pela chave.
+    Retorna (linhas, proximo_cursor), com proximo_cursor None na última página.
+    Lança ValueError se o cursor for inválido.
+    """
+    condicoes = list(condicoes)
+    params = dict(params or {}, limite=limite + 1)
+    if cursor:
+        valor_ordem, valor_chave = decodificar_cursor(cursor, 2)
+        if valor_ordem is None:
+            # Já nas linhas sem valor de ordenação: só resta seguir pela chave entre elas
+            condicoes.append(f"({coluna_ordem} IS NULL AND {coluna_chave} > :chave)")
+        else:
+            condicoes.append(f"({coluna_ordem} > :ordem OR ({coluna_ordem} = :ordem AND {coluna_chave} > :chave)"
+                             f" OR {coluna_ordem} IS NULL)")
+            params['ordem'] = valor_ordem
+        params['chave'] = valor_chave
+
+    # As colunas de ordenação são sempre lidas, pois formam o cursor da próxima página
+    extras = [c for c in (coluna_ordem, coluna_chave) if c not in colunas]
+    sql = montar_consulta(tabela, list(colunas) + extras, f"{coluna_ordem} NULLS LAST, {coluna_chave}", condicoes)
+    sql += " FETCH FIRST :limite ROWS ONLY"
+    with getConnection() as conn:
+        with conn.cursor() as cur:
+            # Uma linha a mais indica se existe próxima página; com prefetchrows uma acima disso a página
+            # inteira (e o fim dos dados) chega já na resposta do execute, numa única ida ao banco
+            configurar_busca(cur, limite + 1, limite + 2)
+            cur.execute(sql, params)
+            nomes = [col[0].lower() for col in cur.description]
+            linhas = [dict(zip(nomes, row)) for row in cur.fetchall()]
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo_cursor = codificar_cursor([ultima[coluna_ordem], ultima[coluna_chave]])
+    for coluna in extras:
+        for linha in linhas:
+            del linha[coluna]
+    return linhas, proximo_cursor
+
+
+# --- Leitura por chave primária ---
+def ler_por_id(tabela: str, colunas, coluna_chave: str, valor_chave):
+    """
+    Lê uma única linha de 'tabela' pela chave primária (bind, usa o índice da PK).
+    Retorna um dicionário, ou None se a linha não existir.
+    """
+    sql = f"SELECT {', '.join(colunas)} FROM {tabela} WHERE {coluna_chave} = :chave"
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, {'chave': valor_chave})
+            linha = cursor.fetchone()
+            if linha is None:
+                return None
+            return dict(zip([col[0].lower() for col in cursor.description], linha))
+
+
+MAXIMO_IDS_POR_CONSULTA = 1000  # limite de itens de um IN (...) no Oracle
+
+def ler_por_ids(sql: str, coluna_chave: str, ids: list, params: dict = None) -> dict:
+    """
+    Relê as linhas de 'ids' acrescentando WHERE coluna_chave IN (...) a 'sql', em blocos de
+    MAXIMO_IDS_POR_CONSULTA binds. 'params' traz os demais binds de 'sql' (ex.: :scn).
+    Retorna {id: linha}; ids que não existem ficam de fora.
+    """
+    linhas = {}
+    for inicio in range(0, len(ids), MAXIMO_IDS_POR_CONSULTA):
+        bloco = ids[inicio:inicio + MAXIMO_IDS_POR_CONSULTA]
+        marcadores = ', '.join(f':id_{i}' for i in range(len(bloco)))
+        binds = dict(params or {}, **{f'id_{i}': valor for i, valor in enumerate(bloco)})
+        for linha in iterar_consulta(f"{sql} WHERE {coluna_chave} IN ({marcadores})", binds):
+            linhas[linha[coluna_chave]] = linha
+    return linhas
+
+
+def reler_alteradas(sql: str, coluna_chave: str, ids, definir, remover) -> None:
+    """
+    Relê as linhas de 'ids' (sem repetições) com ler_por_ids e chama definir(linha) para as que existem
+    e remover(id) para as que foram excluídas. Usado pelos índices em memória ao aplicar o registro de alterações.
+    """
+    ids = list(dict.fromkeys(ids))
+    atuais = ler_por_ids(sql, coluna_chave, ids)
+    for id_linha in ids:
+        if id_linha in atuais:
+            definir(atuais[id_linha])
+        else:
+            remover(id_linha)
+
+
+# --- Leitura em fluxo (streaming) ---
+# Tamanho das buscas do cursor, configurável por ambiente e por consulta:
+#   LEME_BUSCA_ARRAYSIZE -> linhas trazidas a cada ida ao banco no fetchmany (arraysize)
+#   LEME_BUSCA_PREFETCH  -> linhas enviadas já na resposta do execute (prefetchrows); 0 mantém o padrão do driver
+TAMANHO_BUSCA_PADRAO = ler_numero_env("LEME_BUSCA_ARRAYSIZE", 500)
+PREFETCH_PADRAO = ler_numero_env("LEME_BUSCA_PREFETCH", 0)
+
+def configurar_busca(cursor, tamanho_lote: int = TAMANHO_BUSCA_PADRAO, prefetch: int = None) -> None:
+    """
+    Ajusta arraysize e prefetchrows de 'cursor' (antes do execute). Sem 'prefetch' usa PREFETCH_PADRAO;
+    0 deixa o valor do driver.
+    """
+    cursor.arraysize = tamanho_lote
+    prefetch = PREFETCH_PADRAO if prefetch is None else prefetch
+    if prefetch:
+        cursor.prefetchrows = prefetch
+
+def iterar_consulta(sql: str, params: dict = None, tamanho_lote: int = TAMANHO_BUSCA_PADRAO, prefetch: int = None):
+    """
+    Gerador que executa 'sql' e devolve as linhas como dicionários, buscando do cursor
+    em blocos de 'tamanho_lote' linhas (arraysize). Só um bloco fica na memória por vez.
+    A conexão permanece emprestada do pool enquanto o gerador é consumido.
+    """
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            configurar_busca(cursor, tamanho_lote, prefetch)
+            cursor.execute(sql, params or {})
+            nomes = [col[0].lower() for col in cursor.description]
+            while True:
+                linhas = cursor.fetchmany()
+                if not linhas:
+                    break
+                for linha in linhas:
+                    yield dict(zip(nomes, linha))
+
+
+def ler_colunas(sql: str, params: dict = None, tamanho_lote: int = TAMANHO_BUSCA_PADRAO, prefetch: int = None) -> dict:
+    """
+    Executa 'sql' e retorna o resultado por colunas, {coluna: [valores]} na ordem do SELECT.
+    Formato compacto para listagens grandes: as tuplas de cada bloco do cursor são transpostas direto
+    para as listas das colunas, sem criar um dicionário (com as mesmas chaves) por linha.
+    """
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            configurar_busca(cursor, tamanho_lote, prefetch)
+            cursor.execute(sql, params or {})
+            nomes = [col[0].lower() for col in cursor.description]
+            valores = [[] for _ in nomes]
+            while True:
+                linhas = cursor.fetchmany()
+                if not linhas:
+                    break
+                for coluna, bloco in zip(valores, zip(*linhas)):
+                    coluna.extend(bloco)
+    return dict(zip(nomes, valores))
+
+
+# --- Inserção em lote ---
+TAMANHO_LOTE_PADRAO = 1000
+
+def _executar_em_lote(sql: str, colunas, registros: list, tamanho_lote: int):
+    """
+    Executa 'sql' (binds posicionais na ordem de 'colunas') com executemany e array binding, em lotes
+    de 'tamanho_lote' linhas com um commit por lote. Linhas rejeitadas pelo banco (batcherrors) não
+    interrompem o lote. Retorna (linhas gravadas, [{'indice': i, 'erro': mensagem}, ...]) com o índice original.
+    Se o lote inteiro falhar (ex.: conexão perdida), as linhas dele voltam com 'falha_do_lote': True:
+    nada foi gravado e elas podem ser tentadas de novo, ao contrário das rejeitadas pelo banco.
+    """
+    ok = 0
+    erros = []
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            for inicio in range(0, len(registros), tamanho_lote):
+                lote = registros[inicio:inicio + tamanho_lote]
+                try:
+                    cursor.executemany(sql, [tuple(r[c] for c in colunas) for r in lote], batcherrors=True)
+                    falhas = cursor.getbatcherrors()
+                    conn.commit()
+                except oracledb.Error as e:
+                    # Falha do lote inteiro (ex.: conexão perdida): nada dele foi gravado
+                    conn.rollback()
+                    erros.extend({'indice': inicio + i, 'erro': str(e), 'falha_do_lote': True} for i in range(len(lote)))
+                    continue
+                ok += len(lote) - len(falhas)
+                erros.extend({'indice': inicio + f.offset, 'erro': f.message} for f in falhas)
+    return ok, erros
+
+
+def inserir_em_lote(tabela: str, colunas, registros: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+    """
+    Insere 'registros' (dicionários com as colunas) em 'tabela' em lotes (ver _executar_em_lote).
+    Retorna {'inseridos': n, 'erros': [{'indice': i, 'erro': mensagem}, ...]}.
+    """
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(f':{i}' for i in range(1, len(colunas) + 1))})"
+    inseridos, erros = _executar_em_lote(sql, colunas, registros, tamanho_lote)
+    return {'inseridos': inseridos, 'erros': erros}
+
+
+def montar_merge(tabela: str, colunas, chaves) -> str:
+    """
+    Monta um MERGE de uma linha (binds posicionais na ordem de 'colunas') que atualiza a linha de
+    'tabela' com as mesmas 'chaves' ou a insere se ela não existir. Usado com executemany.
+    """
+    origem = ', '.join(f':{i} {c}' for i, c in enumerate(colunas, start=1))
+    juncao = ' AND '.join(f'd.{c} = s.{c}' for c in chaves)
+    atualizar = ', '.join(f'd.{c} = s.{c}' for c in colunas if c not in chaves)
+    return (f"MERGE INTO {tabela} d USING (SELECT {origem} FROM dual) s ON ({juncao}) "
+            f"WHEN MATCHED THEN UPDATE SET {atualizar} "
+            f"WHEN NOT MATCHED THEN INSERT ({', '.join(colunas)}) VALUES ({', '.join(f's.{c}' for c in colunas)})")
+
+
+def mesclar_em_lote(tabela: str, colunas, chaves, registros: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+    """
+    Grava 'registros' em 'tabela' com MERGE (atualiza pelas 'chaves' ou insere), em lotes como
+    inserir_em_lote. Retorna {'gravados': n, 'erros': [{'indice': i, 'erro': mensagem}, ...]}.
+    """
+    gravados, erros = _executar_em_lote(montar_merge(tabela, colunas, chaves), colunas, registros, tamanho_lote)
+    return {'gravados': gravados, 'erros': erros}
+
+
+# --- Atualização parcial ---
+@functools.lru_cache(maxsize=256)
+def montar_update(tabela: str, colunas: tuple, coluna_chave: str) -> str:
+    """
+    Monta o UPDATE de só 'colunas' (binds com o nome de cada coluna e :chave). Fica em cache por
+    conjunto de colunas; como o texto do SQL é sempre o mesmo, o driver também reaproveita o cursor
+    já preparado (statement cache) nas próximas atualizações das mesmas colunas.
+    """
+    return f"UPDATE {tabela} SET {', '.join(f'{c} = :{c}' for c in colunas)} WHERE {coluna_chave} = :chave"
+
+
+def atualizar_parcial(tabela: str, colunas, coluna_chave: str, valor_chave, campos: dict) -> int:
+    """
+    Atualiza só as colunas de 'campos' ({coluna: valor}) da linha de 'tabela' com a chave informada.
+    As colunas seguem a ordem de 'colunas', para que o mesmo conjunto gere sempre o mesmo SQL.
+    Retorna a quantidade de linhas atualizadas (0 se a linha não existir).
+    Lança ValueError se 'campos' estiver vazio ou tiver colunas desconhecidas (a chave não pode ser alterada).
+    """
+    if not campos:
+        raise ValueError('Nenhum campo para atualizar')
+    permitidas = [c for c in colunas if c != coluna_chave]
+    invalidos = [c for c in campos if c not in permitidas]
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}")
+    selecionadas = tuple(c for c in permitidas if c in campos)
+    params = {c: campos[c] for c in selecionadas}
+    params['chave'] = valor_chave
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(montar_update(tabela, selecionadas, coluna_chave), params)
+            conn.commit()
+            return cursor.rowcount
+
+
+def _valor_canonico(valor):
+    """Representação usada no hash: datas em ISO e números inteiros sem casas (10.0 do banco == 10 recebido)."""
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=' ')
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def hash_conteudo(valores) -> str:
+    """Hash estável de uma linha (sequência de valores), para saber se o que chegou é igual ao que está no banco."""
+    canonico = json.dumps([_valor_canonico(v) for v in valores], default=str, ensure_ascii=False)
+    return hashlib.sha256(canonico.encode()).hexdigest()
+
+
+def sincronizar_em_lote(tabela: str, colunas, chave: str, registros: list, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+    """
+    Sincroniza 'registros' (um snapshot vindo de outro sistema) com 'tabela' pela coluna 'chave'. Para cada
+    lote, lê as linhas que já existem (ler_por_ids) e compara o hash do conteúdo: linhas iguais não são
+    gravadas; as novas e as alteradas vão juntas em um MERGE com array binding (mesclar_em_lote).
+    Chaves repetidas no snapshot são rejeitadas (vale a primeira).
+    Retorna {'inseridos', 'atualizados', 'inalterados', 'chaves_gravadas': [...], 'erros': [{'indice', 'erro'}]}.
+    """
+    selecao = f"SELECT {', '.join(colunas)} FROM {tabela}"
+    inseridos = atualizados = inalterados = 0
+    chaves_gravadas, erros, vistas = [], [], set()
+    for inicio in range(0, len(registros), tamanho_lote):
+        lote = registros[inicio:inicio + tamanho_lote]
+        existentes = ler_por_ids(selecao, chave, list({r[chave] for r in lote}))
+        gravar, origens, novos = [], [], []
+        for indice, registro in enumerate(lote, start=inicio):
+            if registro[chave] in vistas:
+                erros.append({'indice': indice, 'erro': f'{chave} repetido no lote'})
+                continue
+            vistas.add(registro[chave])
+            atual = existentes.get(registro[chave])
+            if atual is not None and hash_conteudo(atual[c] for c in colunas) == hash_conteudo(registro[c] for c in colunas):
+                inalterados += 1
+                continue
+            gravar.append(registro)
+            origens.append(indice)
+            novos.append(atual is None)
+        if not gravar:
+            continue
+        resultado = mesclar_em_lote(tabela, colunas, (chave,), gravar, len(gravar))
+        falhas = {erro['indice'] for erro in resultado['erros']}
+        erros.extend({'indice': origens[erro['indice']], 'erro': erro['erro']} for erro in resultado['erros'])
+        for posicao, registro in enumerate(gravar):
+            if posicao in falhas:
+                continue
+            chaves_gravadas.append(registro[chave])
+            if novos[posicao]:
+                inseridos += 1
+            else:
+                atualizados += 1
+    erros.sort(key=lambda erro: erro['indice'])
+    return {'inseridos': inseridos, 'atualizados': atualizados, 'inalterados': inalterados,
+            'chaves_gravadas': chaves_gravadas, 'erros': erros}
+
+
+# --- Exclusão em lote ---
+def excluir_em_lote(tabela: str, coluna_chave: str, ids: list, dependentes=(), tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> dict:
+    """
+    Exclui as linhas de 'tabela' com os 'ids' e, antes delas, as linhas que dependem delas: 'dependentes'
+    é uma sequência de (nome, sql) com um DELETE cujo único bind posicional (:1) é o id, executados na
+    ordem dada (filhos antes dos pais). Cada DELETE vai com executemany e array binding, uma ida ao banco
+    por lote de 'tamanho_lote' ids, e tudo roda em uma única transação: se uma etapa falhar (ex.: ainda
+    há linhas dependentes), nada é excluído e o oracledb.Error é relançado.
+    Retorna {'excluidos': n, 'chaves_excluidas': [...], 'nao_encontrados': [...], 'dependentes': {nome: linhas}}.
+    """
+    ids = list(dict.fromkeys(ids))
+    sql = f"DELETE FROM {tabela} WHERE {coluna_chave} = :1"
+    contagens = {nome: 0 for nome, _ in dependentes}
+    excluidas, nao_encontrados = [], []
+    with getConnection() as conn:
+        with conn.cursor() as cursor:
+            try:
+                for nome, sql_dependente in dependentes:
+                    for inicio in range(0, len(ids), tamanho_lote):
+                        cursor.executemany(sql_dependente, [(valor,) for valor in ids[inicio:inicio + tamanho_lote]])
+                        contagens[nome] += cursor.rowcount
+                for inicio in range(0, len(ids), tamanho_lote):
+                    lote = ids[inicio:inicio + tamanho_lote]
+                    cursor.executemany(sql, [(valor,) for valor in lote], arraydmlrowcounts=True)
+                    linhas = cursor.getarraydmlrowcounts()
+                    for valor, quantidade in zip(lote, linhas):
+                        (excluidas if quantidade else nao_encontrados).append(valor)
+                conn.commit()
+            except oracledb.Error:
+                conn.rollback()
+                raise
+    return {'excluidos': len(excluidas), 'chaves_excluidas': excluidas, 'nao_encontrados': nao_encontrados,
+            'dependentes': contagens}
+
+# --- Texto ---
+_ACENTOS = re.compile('[\u0300-\u036f]')  # marcas combinantes que sobram da decomposição NFKD
+
+def normalizar_texto(texto) -> str:
+    """Converte para minúsculas e tira os acentos ('Introdução' -> 'introducao'); None vira ''."""
+    texto = str(texto) if texto is not None else ''
+    if texto.isascii():
+        return texto.lower()
+    return _ACENTOS.sub('', unicodedata.normalize('NFKD', texto)).lower()
 
+def tokenizar(texto) -> list:
+    """Separa o texto normalizado (normalizar_texto) em palavras."""
+    return re.findall(r'\w+', normalizar_texto(texto))
 
 # --- Valida Números Inteiros ---
 def validar_inteiro(entrada: str, default=None) -> int: